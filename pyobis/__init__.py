@@ -17,6 +17,8 @@ from pyobis import taxa
 from pyobis import dataset
 ## checklist
 from pyobis import checklist
+## statistics
+from pyobis import statistics
 
 ## use advanced logging
 ### setup first
@@ -46,8 +48,21 @@ __license__ = "MIT"
 from .cache import cache
 from .checklist import checklist
 from .dataset import dataset
+from .indicators import indicators
 from .nodes import nodes
 from .occurrences import occurrences
+from .spatial import spatial
+from .statistics import statistics
 from .taxa import taxa
 
-__all__ = ["checklist", "dataset", "nodes", "occurrences", "taxa", "cache"]
+__all__ = [
+    "checklist",
+    "dataset",
+    "nodes",
+    "occurrences",
+    "taxa",
+    "cache",
+    "indicators",
+    "spatial",
+    "statistics",
+]
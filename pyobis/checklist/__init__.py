@@ -1,8 +1,11 @@
 from .checklist import ChecklistResponse, list, newest, redlist
+from .local import ChecklistBuilder, build
 
 __all__ = [
     "list",
     "redlist",
     "newest",
+    "build",
     "ChecklistResponse",
+    "ChecklistBuilder",
 ]
@@ -2,17 +2,56 @@
 /checklist/ API endpoints as documented on https://api.obis.org/.
 """
 
-import sys
-
 import pandas as pd
 
 from ..obisutils import (
     build_api_url,
+    chunk_args,
     handle_arrint,
     handle_arrstr,
+    integer_series,
     logger,
     obis_baseurl,
     obis_GET,
+    obis_imap,
+    obis_map,
+)
+
+# number of taxa fetched per checklist page after the first one
+PAGE_SIZE = 5000
+
+# low-cardinality columns stored as categoricals in checklist DataFrames
+CATEGORICAL_COLUMNS = ("taxonRank", "taxonomicStatus", "category")
+
+# taxon ids and counts stored as integers in checklist DataFrames
+INTEGER_COLUMNS = (
+    "taxonID",
+    "records",
+    "acceptedNameUsageID",
+    "kingdomid",
+    "subkingdomid",
+    "infrakingdomid",
+    "phylumid",
+    "subphylumid",
+    "infraphylumid",
+    "superclassid",
+    "classid",
+    "subclassid",
+    "infraclassid",
+    "superorderid",
+    "orderid",
+    "suborderid",
+    "infraorderid",
+    "superfamilyid",
+    "familyid",
+    "subfamilyid",
+    "tribeid",
+    "genusid",
+    "subgenusid",
+    "speciesid",
+    "subspeciesid",
+    "ncbi_id",
+    "bold_id",
 )
 
 
@@ -21,24 +60,67 @@ class ChecklistResponse:
     An OBIS Checklist Response Object
     """
 
-    def __init__(self, url, args, paginate, cache=True):
+    def __init__(
+        self,
+        url,
+        args,
+        paginate,
+        cache=True,
+        subqueries=None,
+        max_workers=None,
+    ):
         """
         Initialise the object parameters
         """
         self.api_url = build_api_url(url, args)
         self.mapper_url = None
-        self.data = None
 
         # private members
+        self.__data = None
+        self.__frame = None
+        self.__total = None
         self.__url = url
         self.__args = args
         self.__paginate = paginate
         self.__cache = cache
+        self.__subqueries = subqueries
+        self.__max_workers = max_workers
+
+    @property
+    def data(self):
+        """
+        The response as a dictionary, with the taxa as records in `results`.
+
+        Paginated checklists are kept as a typed DataFrame (see `to_pandas`),
+        which is only converted to records on the first access, with plain
+        Python values and None where a value is missing.
+        """
+        if self.__data is None and self.__frame is not None:
+            frame = self.__frame.astype(object)
+            self.__data = {
+                "total": self.__total,
+                "results": frame.where(self.__frame.notna(), None).to_dict(
+                    orient="records",
+                ),
+            }
+        return self.__data
+
+    @data.setter
+    def data(self, value):
+        self.__data, self.__frame = value, None
+
+    def __store(self, frame, total):
+        """
+        Keep the taxa of a paginated checklist as a typed DataFrame
+        """
+        self.__data, self.__frame, self.__total = None, frame, total
 
     def execute(self):
         """
         Execute or fetch the data based on the query
         """
+        if self.__subqueries:
+            return self.__execute_subqueries()
         if self.__paginate:
             out = obis_GET(
                 self.__url,
@@ -46,9 +128,6 @@ class ChecklistResponse:
                 "application/json; charset=utf-8",
                 cache=self.__cache,
             )
-            self.__args["skip"] += 10
-            self.__args["size"] = 5000
-            i = 10
 
             # an error check is necessary, otherwise print statement throws "division by zero" error
             try:
@@ -59,43 +138,20 @@ class ChecklistResponse:
 
             # fetch first 10 records, and print number of estimated records
             logger.info(f"Estimated records: {out['total']}")
-            logger.info(
-                "{}[{}{}] {}".format(
-                    "Fetching: ",
-                    "█" * int(len(out["results"]) * 100 / out["total"]),
-                    "." * (100 - int(len(out["results"]) * 100 / out["total"])),
-                    len(out["results"]),
-                ),
-            )
-            # now paginate until the response is null
-            while True:
-                res = obis_GET(
-                    self.__url,
-                    self.__args,
-                    "application/json; charset=utf-8",
-                    cache=self.__cache,
-                )
-                # when we find that no records are there, we break out of loop
-                if len(res["results"]) == 0:
-                    break
-                out["results"] += res["results"]
-                # print the progress bar
-                logger.info(
-                    "{}[{}{}] {}".format(
-                        "Fetching: ",
-                        "█" * int(len(out["results"]) * 100 / out["total"]),
-                        "." * (100 - int(len(out["results"]) * 100 / out["total"])),
-                        len(out["results"]),
-                    ),
-                    end="\r",
-                    file=sys.stdout,
-                    flush=True,
-                )
-                self.__args["skip"] = len(out["results"])
-                # continue to fetch next 5000 records
-                i += 5000
+            fetched = len(out["results"])
+            self.__log_progress(fetched, out["total"])
+
+            # pages are converted as they arrive, so that the records of the
+            # whole checklist are never held next to its DataFrame
+            frames = [_typed_frame(out["results"])]
+            for page in self.__remaining_pages(out):
+                frames.append(_typed_frame(page))
+                fetched += len(page)
+                self.__log_progress(fetched, out["total"])
             # print actual number of fetched records
-            logger.info(f"\nFetched {len(out['results'])} records.")
+            logger.info(f"Fetched {fetched} records.")
+            self.__store(_concat_frames(frames), out["total"])
+            return
         else:
             out = obis_GET(
                 self.__url,
@@ -105,11 +161,163 @@ class ChecklistResponse:
             )
         self.data = out
 
+    def iter_pages(self):
+        """
+        Fetch the checklist page by page, yielding typed pandas DataFrames
+        (see `to_pandas`) as they arrive, without keeping the results.
+
+        Usage::
+
+            from pyobis import checklist
+            query = checklist.list(scientificname="Mola")
+            for page in query.iter_pages():
+                print(len(page))
+        """
+        if self.__subqueries:
+            # the chunks are merged by taxonID, so they can only be
+            # yielded once all of them have been fetched
+            self.execute()
+            yield self.__frame
+            return
+        out = obis_GET(
+            self.__url,
+            self.__args,
+            "application/json; charset=utf-8",
+            cache=self.__cache,
+        )
+        if "error" in out:
+            raise ValueError(out["error"])
+        yield _typed_frame(out["results"])
+        if self.__paginate:
+            for page in self.__remaining_pages(out):
+                yield _typed_frame(page)
+
+    def __remaining_pages(self, out):
+        """
+        Yield the result lists of the pages following the first response.
+        The total is known from the first page, so the remaining pages are
+        fetched concurrently, and yielded in order.
+        """
+        if not out["results"]:
+            return
+        first = self.__args["skip"] + len(out["results"])
+        yield from obis_imap(
+            lambda skip: obis_GET(
+                self.__url,
+                {**self.__args, "skip": skip, "size": PAGE_SIZE},
+                "application/json; charset=utf-8",
+                cache=self.__cache,
+            )["results"],
+            range(first, out["total"], PAGE_SIZE),
+            max_workers=self.__max_workers,
+        )
+
+    @staticmethod
+    def __log_progress(fetched, total):
+        """
+        Log a progress bar of the fetched records
+        """
+        logger.info(
+            "{}[{}{}] {}".format(
+                "Fetching: ",
+                "█" * int(fetched * 100 / total),
+                "." * (100 - int(fetched * 100 / total)),
+                fetched,
+            ),
+        )
+
+    def __execute_subqueries(self):
+        """
+        Run the sub-queries concurrently and merge their checklists by taxonID
+        """
+
+        def run(overrides):
+            # the pages of a sub-query are fetched one after the other, so that
+            # at most max_workers requests run at once
+            subquery = ChecklistResponse(
+                self.__url,
+                {**self.__args, **overrides},
+                self.__paginate,
+                cache=self.__cache,
+                max_workers=1,
+            )
+            return _concat_frames(subquery.iter_pages())
+
+        # taxa found by sub-queries holding disjoint chunks of a single list
+        # add up their counts, but a list sent along with every chunk of
+        # another one is counted in full by each of them
+        lists = {k for q in self.__subqueries for k, v in q.items() if v is not None}
+        add_up = len(lists) == 1
+
+        logger.info(f"Running {len(self.__subqueries)} sub-queries.")
+        df = _concat_frames(
+            obis_map(run, self.__subqueries, max_workers=self.__max_workers),
+        )
+        if len(df):
+            taxa = df.drop_duplicates("taxonID", ignore_index=True)
+            if "records" in df.columns:
+                # higher taxa shared by several chunks are counted in each
+                records = df.groupby("taxonID")["records"].agg(
+                    "sum" if add_up else "max",
+                )
+                taxa["records"] = (
+                    taxa["taxonID"].map(records).astype(df["records"].dtype)
+                )
+                taxa = taxa.sort_values(
+                    "records",
+                    ascending=False,
+                    kind="stable",
+                    ignore_index=True,
+                )
+            df = taxa
+        logger.info(f"Fetched {len(df)} records.")
+        self.__store(df, len(df))
+
     def to_pandas(self):
         """
-        Convert the results into a pandas DataFrame
+        Convert the results into a pandas DataFrame, with categorical ranks,
+        statuses and Red List categories, and integer taxon ids and record
+        counts. If the query has not been executed, the pages are fetched and
+        converted as they arrive instead of being kept as records.
         """
-        return pd.DataFrame(self.data["results"])
+        if self.__frame is not None:
+            return self.__frame
+        if self.__data is None:
+            return _concat_frames(self.iter_pages())
+        return _typed_frame(self.__data["results"])
+
+
+def _typed_frame(results):
+    """
+    Convert a page of checklist results into a typed pandas DataFrame
+    """
+    df = pd.DataFrame(results)
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype("category")
+        elif column in INTEGER_COLUMNS:
+            try:
+                df[column] = integer_series(pd.to_numeric(df[column]))
+            except (TypeError, ValueError):
+                continue
+    return df
+
+
+def _concat_frames(frames):
+    """
+    Concatenate typed checklist pages, merging the categories of every page
+    """
+    frames = [*frames]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and not isinstance(
+            df[column].dtype,
+            pd.CategoricalDtype,
+        ):
+            df[column] = df[column].astype("category")
+    return df
 
 
 def list(
@@ -123,6 +331,7 @@ def list(
     geometry=None,
     flags=None,
     cache=True,
+    max_workers=None,
     **kwargs,
 ):
     """
@@ -147,9 +356,18 @@ def list(
     :param flags: [String] Comma separated list of quality flags which need
         to be set
     :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :param max_workers: [Fixnum] Maximum number of pages (or sub-queries of
+        long lists) fetched concurrently. Default: obisutils.DEFAULT_MAX_WORKERS
 
     :return: A dictionary
 
+    Long lists of `scientificname` or `taxonid` are split into chunks which are
+    fetched as concurrent sub-queries. Their checklists are merged by `taxonID`,
+    adding up the record counts of taxa found by several chunks, which assumes
+    that the listed taxa do not include one another. When both lists are
+    given, the one which is not split is sent with every chunk, and taxa found
+    by several chunks keep their largest record count instead.
+
     Usage::
 
         from pyobis import checklist
@@ -159,6 +377,7 @@ def list(
         checklist.list(taxonid = 3013).execute()
     """  # noqa: E501
     url = obis_baseurl + "checklist"
+    subqueries = chunk_args(scientificname=scientificname, taxonid=taxonid)
     scientificname = handle_arrstr(scientificname)
     taxonid = handle_arrint(taxonid)
     args = {
@@ -175,7 +394,14 @@ def list(
         "size": 10,
     }
 
-    return ChecklistResponse(url, {**args, **kwargs}, paginate=True, cache=cache)
+    return ChecklistResponse(
+        url,
+        {**args, **kwargs},
+        paginate=True,
+        cache=cache,
+        subqueries=subqueries,
+        max_workers=max_workers,
+    )
 
 
 def redlist(
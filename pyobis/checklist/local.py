@@ -0,0 +1,163 @@
+"""
+Checklists built locally from occurrence records, with the schema of
+`checklist.list`.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .checklist import _typed_frame
+
+# taxon columns copied from the occurrence records, in checklist order
+# (the classification columns, e.g. `family` and `familyid`, follow them)
+TAXON_COLUMNS = (
+    "scientificName",
+    "scientificNameAuthorship",
+    "taxonID",
+    "taxonRank",
+    "taxonomicStatus",
+    "acceptedNameUsage",
+    "acceptedNameUsageID",
+)
+
+# rows read at a time from occurrence files
+CSV_CHUNK_SIZE = 100000
+
+
+class ChecklistBuilder:
+    """
+    Incremental checklist of occurrence records.
+
+    Pages of occurrence records are added with `update`. Taxa are coded as
+    integers, and only their record counts and the taxon columns of their first
+    record are kept, so the memory use depends on the number of taxa rather
+    than on the number of records.
+
+    Usage::
+
+        from pyobis import occurrences
+        from pyobis.checklist.local import ChecklistBuilder
+
+        builder = ChecklistBuilder()
+        query = occurrences.search(geometry="POLYGON((0 50, 5 50, 5 55, 0 55, 0 50))")
+        for page in query.iter_pages():
+            builder.update(page)
+        builder.to_pandas()
+    """
+
+    def __init__(self, taxon="aphiaID"):
+        """
+        Initialise the checklist.
+
+        :param taxon: [String] Column holding the integer taxon ids, records
+            without a value are skipped. Default: `aphiaID`
+        """
+        self.taxon = taxon
+
+        # private members
+        self.__taxa = pd.Index([], dtype="int64")
+        self.__counts = np.empty(0, dtype=np.int64)
+        self.__attributes = []
+
+    def update(self, df):
+        """
+        Add a page of occurrence records.
+
+        :param df: [DataFrame] Occurrence records
+        :return: The ChecklistBuilder itself
+        """
+        if not len(df) or self.taxon not in df.columns:
+            return self
+        df = df[df[self.taxon].notna()]
+        taxa = pd.to_numeric(df[self.taxon]).to_numpy(dtype=np.int64)
+
+        unseen = pd.Index(pd.unique(taxa)).difference(self.__taxa)
+        if len(unseen):
+            # keep the taxon columns of the first record of every new taxon
+            first = df[pd.Index(taxa).isin(unseen)].drop_duplicates(self.taxon)
+            self.__attributes.append(first[_taxon_columns(df.columns, self.taxon)])
+            self.__taxa = self.__taxa.append(unseen)
+
+        codes = self.__taxa.get_indexer(taxa)
+        self.__counts = np.bincount(codes, minlength=len(self.__taxa)) + np.pad(
+            self.__counts,
+            (0, len(self.__taxa) - len(self.__counts)),
+        )
+        return self
+
+    def to_pandas(self):
+        """
+        Build the checklist.
+
+        :return: A pandas DataFrame with one row per taxon, holding the columns
+            of `checklist.list` which are available in the occurrence records,
+            and the number of records, sorted by decreasing number of records
+        """
+        if not self.__attributes:
+            return _typed_frame([])
+        df = pd.concat(self.__attributes, ignore_index=True)
+        taxa = pd.to_numeric(df[self.taxon]).to_numpy(dtype=np.int64)
+        df = df.drop(columns=[c for c in ("taxonID", self.taxon) if c in df.columns])
+        df.insert(0, "taxonID", taxa)
+        df["records"] = self.__counts[self.__taxa.get_indexer(taxa)]
+        columns = [c for c in TAXON_COLUMNS if c in df.columns]
+        df = df[columns + [c for c in df.columns if c not in columns]]
+        df = df.sort_values("records", ascending=False, kind="stable")
+        return _typed_frame(df.reset_index(drop=True))
+
+
+def _taxon_columns(columns, taxon):
+    """
+    The taxon and classification columns among the occurrence columns
+    """
+    columns = [*columns]
+    names = {c for c in columns if c in TAXON_COLUMNS or c == taxon}
+    # classification columns come in pairs, e.g. `family` and `familyid`
+    names |= {c for c in columns if c + "id" in columns}
+    names |= {c for c in columns if c.endswith("id") and c[:-2] in columns}
+    return [c for c in columns if c in names]
+
+
+def build(data, taxon="aphiaID"):
+    """
+    Build a checklist from occurrence records, without querying the checklist API.
+
+    :param data: An occurrences.search query (its results if it has been
+        executed, otherwise it is fetched page by page without keeping the
+        records), a DataFrame, an iterable of DataFrames, or the path to a CSV
+        or Parquet file of occurrence records.
+    :param taxon: [String] Column holding the integer taxon ids. Default: `aphiaID`
+
+    :return: A pandas DataFrame with the schema of `checklist.list`
+
+    Usage::
+
+        from pyobis import occurrences
+        from pyobis.checklist.local import build
+
+        query = occurrences.search(geometry="POLYGON((0 50, 5 50, 5 55, 0 55, 0 50))")
+        query.execute()
+        build(query)  # or query.checklist()
+
+        # or from records saved to disk
+        build("occurrences.csv")
+    """
+    builder = ChecklistBuilder(taxon=taxon)
+    if isinstance(data, pd.DataFrame):
+        pages = [data]
+    elif isinstance(data, (str, Path)):
+        if str(data).endswith(".parquet"):
+            pages = [pd.read_parquet(data)]
+        else:
+            pages = pd.read_csv(data, chunksize=CSV_CHUNK_SIZE)
+    elif getattr(data, "data", None) is not None:
+        pages = [data.data["results"]]
+    elif hasattr(data, "iter_pages"):
+        pages = data.iter_pages()
+    else:
+        pages = data
+    for page in pages:
+        builder.update(page)
+    return builder.to_pandas()
@@ -1,5 +1,10 @@
 """Tests for checklist module"""
 
+import json
+import threading
+import time
+
+import pandas as pd
 import pytest
 import requests
 
@@ -76,3 +81,127 @@ def test_cache_parameter_functionality():
     assert query_without_cache.data is not None
     assert "dict" == query_with_cache.data.__class__.__name__
     assert "dict" == query_without_cache.data.__class__.__name__
+
+
+def test_checklist_long_name_list(monkeypatch, obis_api):
+    """
+    checklist.list - long lists of names are fetched as chunked sub-queries,
+    merged by taxonID
+    """
+    from pyobis import obisutils
+    from pyobis.checklist import checklist as checklist_module
+
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def respond(url, args):
+        """Parent taxon, the names and listed taxa, and a long tail."""
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        names = args["scientificname"].split(",")
+        results = [{"taxonID": 1, "scientificName": "Animalia", "records": len(names)}]
+        results += [
+            {
+                "taxonID": 100 + int(name.split()[-1]),
+                "scientificName": name,
+                "records": 1,
+            }
+            for name in names
+        ]
+        if args["taxonid"]:
+            results.append({"taxonID": 5, "scientificName": "Listed", "records": 7})
+        # a long tail of taxa, for several pages per sub-query
+        results += [{"taxonID": 10**6 + i, "records": 1} for i in range(30)]
+        skip, size = args["skip"], args["size"]
+        with lock:
+            running[0] -= 1
+        return {"total": len(results), "results": results[skip:][:size]}
+
+    obis_api.serve(checklist_module, respond)
+    monkeypatch.setattr(checklist_module, "PAGE_SIZE", 10)
+    monkeypatch.setattr(obisutils, "MAX_PARAM_LENGTH", 50)
+
+    names = [f"Species {i}" for i in range(20)]
+    query = checklist.list(scientificname=names, max_workers=3)
+    query.execute()
+    df = query.to_pandas()
+    assert query.data["total"] == 51 == len(df)
+    assert df["taxonID"].is_unique
+    assert df.set_index("taxonID").loc[1, "records"] == 20
+    # the pages of every sub-query are fetched serially
+    assert peak[0] <= 3
+
+    # a short taxon list is sent with every chunk, and counted once
+    query = checklist.list(scientificname=names, taxonid=[5])
+    query.execute()
+    df = query.to_pandas().set_index("taxonID")
+    assert df.loc[5, "records"] == 7
+
+
+def test_checklist_concurrent_pages(obis_api):
+    """
+    checklist.list - pages after the first one are fetched concurrently from
+    the known total and reassembled in order, without a final empty request
+    """
+    from pyobis.checklist import checklist as checklist_module
+
+    taxa = [{"taxonID": i, "records": 1} for i in range(10025)]
+    obis_api.serve_records(checklist_module, taxa)
+
+    query = checklist.list(scientificname="Animalia", max_workers=2)
+    query.execute()
+    assert [t["taxonID"] for t in query.data["results"]] == list(range(10025))
+    requested = sorted((a["skip"], a["size"]) for a in obis_api.args)
+    assert requested == [(0, 10), (10, 5000), (5010, 5000), (10010, 5000)]
+
+
+def test_checklist_typed_pages(obis_api):
+    """
+    checklist.list - pages are streamed as typed DataFrames
+    """
+    from pyobis.checklist import checklist as checklist_module
+
+    ranks = ["Species", "Genus", "Family"]
+    taxa = [
+        {
+            "taxonID": i,
+            "taxonRank": ranks[i % 3] if i < 5010 else "Order",
+            "familyid": None if i % 2 else 125609,
+            "records": i,
+            "scientificNameID": f"{i}",
+        }
+        for i in range(6000)
+    ]
+
+    obis_api.serve_records(checklist_module, taxa)
+
+    query = checklist.list(scientificname="Animalia")
+    pages = [*query.iter_pages()]
+    assert [len(page) for page in pages] == [10, 5000, 990]
+    assert query.data is None
+
+    df = query.to_pandas()
+    assert len(df) == 6000
+    assert df["taxonID"].dtype == "int64"
+    assert df["records"].dtype == "int64"
+    assert df["familyid"].dtype == "Int64"
+    assert isinstance(df["taxonRank"].dtype, pd.CategoricalDtype)
+    assert set(df["taxonRank"].cat.categories) == {
+        "Species",
+        "Genus",
+        "Family",
+        "Order",
+    }
+
+    assert not pd.api.types.is_numeric_dtype(df["scientificNameID"])
+
+    # execute keeps the typed pages, the records are only built on request
+    query.execute()
+    assert query.to_pandas() is query.to_pandas()
+    assert query.to_pandas().equals(df)
+    assert query.data["results"][1]["taxonRank"] == "Genus"
+    assert query.data["results"][1]["familyid"] is None
+    assert query.data["results"][2]["familyid"] == 125609
+    json.dumps(query.data)
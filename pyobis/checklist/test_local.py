@@ -0,0 +1,75 @@
+"""Tests for local checklists"""
+
+import pandas as pd
+
+from pyobis.checklist.local import ChecklistBuilder, build
+
+
+def occurrence_records():
+    """
+    Occurrence records of two species and one genus, in two pages
+    """
+    mola = {
+        "scientificName": "Mola mola",
+        "aphiaID": 127405,
+        "taxonRank": "Species",
+        "genus": "Mola",
+        "genusid": 126233,
+        "species": "Mola mola",
+        "speciesid": 127405,
+    }
+    abra = {
+        "scientificName": "Abra alba",
+        "aphiaID": 141433,
+        "taxonRank": "Species",
+        "genus": "Abra",
+        "genusid": 138474,
+        "species": "Abra alba",
+        "speciesid": 141433,
+    }
+    genus = {
+        "scientificName": "Abra",
+        "aphiaID": 138474,
+        "taxonRank": "Genus",
+        "genus": "Abra",
+        "genusid": 138474,
+    }
+    records = [mola] * 3 + [abra] * 5 + [genus] * 2 + [{"scientificName": "?"}]
+    return [
+        pd.DataFrame(
+            [
+                {"id": f"{i:02d}", "decimalLongitude": 0, **r}
+                for i, r in enumerate(page)
+            ],
+        )
+        for page in (records[:4], records[4:])
+    ]
+
+
+def test_checklist_build():
+    """
+    checklist.build - taxa are counted across pages, with their classification
+    """
+    pages = occurrence_records()
+    df = build(pages)
+    assert list(df["taxonID"]) == [141433, 127405, 138474]
+    assert list(df["records"]) == [5, 3, 2]
+    assert list(df.columns[:3]) == ["scientificName", "taxonID", "taxonRank"]
+    assert "decimalLongitude" not in df.columns
+    assert df["taxonID"].dtype == "int64"
+    assert df["speciesid"].dtype == "Int64"
+    assert isinstance(df["taxonRank"].dtype, pd.CategoricalDtype)
+    assert df.set_index("taxonID").loc[138474, "genus"] == "Abra"
+
+    assert df.equals(build(pd.concat(pages, ignore_index=True)))
+
+
+def test_checklist_build_file(tmp_path):
+    """
+    checklist.build - occurrence records are read from CSV files in chunks
+    """
+    path = tmp_path / "occurrences.csv"
+    pd.concat(occurrence_records(), ignore_index=True).to_csv(path, index=False)
+    df = build(path)
+    assert list(df["records"]) == [5, 3, 2]
+    assert build(ChecklistBuilder().to_pandas()).empty
@@ -0,0 +1,82 @@
+"""Shared fixtures of the tests"""
+
+import pytest
+import requests
+
+
+class FakeAPI:
+    """
+    Serves the `obis_GET` requests of pyobis modules from Python functions
+    instead of the OBIS API, and records the requests.
+    """
+
+    def __init__(self, monkeypatch):
+        """Start without any served module or request."""
+        self.monkeypatch = monkeypatch
+        self.requests = []
+        self.caches = []
+
+    @property
+    def args(self):
+        """Query parameters of the requests, in order."""
+        return [args for _, args in self.requests]
+
+    def args_of(self, endpoint):
+        """Query parameters of the requests to an endpoint, e.g. 'occurrence'."""
+        return [args for url, args in self.requests if url.endswith(endpoint)]
+
+    def serve(self, module, respond, cached=None):
+        """
+        Answer the requests of a module with `respond(url, args)`.
+
+        Args:
+            module: Module whose `obis_GET` is replaced, e.g. `occurrences.occurrences`
+            respond (callable): Response of a request, from its url and parameters
+            cached (callable, optional): Whether a request is in the cache, as
+                `cached(url, args)`. Cached requests are answered without being
+                recorded, the others fail for `only_if_cached`. Defaults to an
+                empty cache.
+        """
+
+        def fake_GET(url, args, ctype, cache=True, **kwargs):
+            """Record the request and answer it."""
+            if cache and cached is not None and cached(url, args):
+                return respond(url, args)
+            if kwargs.get("only_if_cached"):
+                raise requests.HTTPError("504 Not Cached")
+            self.requests.append((url, args))
+            self.caches.append(cache)
+            return respond(url, args)
+
+        self.monkeypatch.setattr(module, "obis_GET", fake_GET)
+
+    def serve_records(self, module, records, match=None):
+        """
+        Answer searches from in-memory records, paged with `after` (or
+        `offset`, `skip`) and `size` like the occurrence and checklist endpoints.
+
+        Args:
+            module: Module whose `obis_GET` is replaced
+            records (list): The records, sorted by id
+            match (callable, optional): Whether a record matches the parameters
+                of a request, as `match(record, args)`. Defaults to all records.
+        """
+
+        def respond(url, args):
+            """Page of the matching records."""
+            results = [r for r in records if match is None or match(r, args)]
+            if args.get("after"):
+                results = [r for r in results if r["id"] > args["after"]]
+            total = len(results)
+            start = args.get("offset") or args.get("skip") or 0
+            results = results[start:]
+            size = args.get("size") or len(results)
+            return {"total": total, "results": results[:size]}
+
+        self.serve(module, respond)
+
+
+@pytest.fixture
+def obis_api(monkeypatch):
+    """A FakeAPI, whose served modules are restored after the test."""
+    return FakeAPI(monkeypatch)
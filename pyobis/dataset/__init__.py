@@ -1,3 +1,11 @@
-from .dataset import DatasetResponse, get, search
+from .catalog import DatasetCatalog, get_default_catalog
+from .dataset import DatasetResponse, get, get_many, search
 
-__all__ = ["search", "get", "DatasetResponse"]
+__all__ = [
+    "search",
+    "get",
+    "get_many",
+    "DatasetResponse",
+    "DatasetCatalog",
+    "get_default_catalog",
+]
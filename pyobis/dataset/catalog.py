@@ -0,0 +1,429 @@
+"""
+Local dataset catalog backed by SQLite, for offline keyword search.
+
+Dataset metadata (titles, abstracts, keywords and extents) is synced in bulk
+from `dataset.search`, and keyword queries are answered from an in-memory
+inverted index instead of the API.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from time import time
+
+import pandas as pd
+
+from ..cache.cache import _DEFAULT_CACHE_DIR
+from .dataset import search as search_datasets
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    abstract TEXT,
+    keywords TEXT,
+    extent TEXT,
+    updated TEXT,
+    record TEXT NOT NULL,
+    synced REAL NOT NULL
+);
+"""
+
+# indexed fields, positions of consecutive fields are kept apart so that
+# phrases do not match across fields
+_FIELDS = ("title", "abstract", "keywords")
+_FIELD_GAP = 100
+
+_WORD = re.compile(r"\w+")
+_QUERY_TOKEN = re.compile(r'\s*(?:(")([^"]*)"?|([()|+])|(-)(?=[^\s|+)])|([^\s()|+"]+))')
+
+_default_catalog = None
+_default_catalog_lock = threading.Lock()
+
+
+def get_default_catalog():
+    """
+    Get the shared dataset catalog in the pyobis cache directory.
+
+    Returns:
+        DatasetCatalog: The default dataset catalog.
+    """
+    global _default_catalog
+    with _default_catalog_lock:
+        if _default_catalog is None:
+            _default_catalog = DatasetCatalog()
+        return _default_catalog
+
+
+def _words(text):
+    """Lowercase words of a text, like the standard Elasticsearch analyzer."""
+    return _WORD.findall(text.lower()) if text else []
+
+
+class _Index:
+    """
+    Positional inverted index over the indexed fields of the datasets.
+    """
+
+    def __init__(self, rows):
+        """Index the rows holding the id and the indexed fields of datasets."""
+        self.ids = []
+        self.postings = {}
+        for doc, row in enumerate(rows):
+            self.ids.append(row["id"])
+            position = 0
+            for field in _FIELDS:
+                text = row[field]
+                if field == "keywords":
+                    text = " ".join(json.loads(text or "[]"))
+                for word in _words(text):
+                    positions = self.postings.setdefault(word, {}).setdefault(doc, [])
+                    positions.append(position)
+                    position += 1
+                position += _FIELD_GAP
+        self.vocabulary = sorted(self.postings)
+        self.all = set(range(len(self.ids)))
+
+    def term(self, word):
+        """Documents holding a word."""
+        return set(self.postings.get(word, ()))
+
+    def prefix(self, prefix):
+        """Documents holding a word starting with the prefix."""
+        docs = set()
+        for i in range(bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            if not self.vocabulary[i].startswith(prefix):
+                break
+            docs.update(self.postings[self.vocabulary[i]])
+        return docs
+
+    def phrase(self, words):
+        """Documents holding the words in sequence."""
+        if not words:
+            return set()
+        docs = set.intersection(*(self.term(w) for w in words))
+        found = set()
+        for doc in docs:
+            starts = set(self.postings[words[0]][doc])
+            for offset, word in enumerate(words[1:], 1):
+                starts &= {p - offset for p in self.postings[word][doc]}
+            if starts:
+                found.add(doc)
+        return found
+
+
+class _QueryParser:
+    """
+    Parser of the Elasticsearch `simple_query_string` subset used by
+    `dataset.search(keyword=...)`, evaluated against an _Index.
+
+    Grammar (`|` binds loosest, then `+`, then `-`)::
+
+        query  := clause ("|" clause)*
+        clause := unary (["+"] unary)*
+        unary  := "-" unary | "(" query ")" | '"phrase"' | word["*"]
+    """
+
+    def __init__(self, query, index, default_operator):
+        """Split the query into tokens."""
+        self.tokens = []
+        for m in _QUERY_TOKEN.finditer(query):
+            if m.group(1):
+                self.tokens.append(("phrase", m.group(2)))
+            elif m.group(3):
+                self.tokens.append((m.group(3), None))
+            elif m.group(4):
+                self.tokens.append(("-", None))
+            elif m.group(5):
+                self.tokens.append(("word", m.group(5)))
+        self.index = index
+        self.default_operator = default_operator
+        self.pos = 0
+
+    def peek(self):
+        """Kind of the next token, None at the end of the query."""
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        """Consume the next token, as a (kind, value) pair."""
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+    def parse(self):
+        """Documents matching the whole query."""
+        docs = self.query()
+        # unbalanced closing parentheses are ignored, like Elasticsearch does
+        while self.pos < len(self.tokens):
+            self.take()
+            docs |= self.query()
+        return docs
+
+    def query(self):
+        """Documents matching any of the clauses joined with `|`."""
+        docs = self.clause()
+        while self.peek() == "|":
+            self.take()
+            docs |= self.clause()
+        return docs
+
+    def clause(self):
+        """
+        Terms joined with `+` are required. Others are combined with the
+        default operator, and negated terms are excluded from the result.
+        """
+        groups, excluded = [], set()
+        required = False
+        while self.peek() not in (None, "|", ")"):
+            if self.peek() == "+":
+                self.take()
+                required = True
+                continue
+            negated, docs = self.unary()
+            if negated:
+                excluded |= docs
+            elif required and groups:
+                groups[-1] &= docs
+            else:
+                groups.append(docs)
+            required = False
+        if not groups:
+            docs = set(self.index.all) if excluded else set()
+        elif self.default_operator == "and":
+            docs = set.intersection(*groups)
+        else:
+            docs = set.union(*groups)
+        return docs - excluded
+
+    def unary(self):
+        """
+        Documents of a term, group, phrase or word, as a (negated, documents)
+        pair, where negated terms are to be excluded.
+        """
+        kind, value = self.take()
+        if kind == "-":
+            if self.peek() in (None, "|", ")", "+"):
+                return False, set()
+            negated, docs = self.unary()
+            return not negated, docs
+        if kind == "(":
+            docs = self.query()
+            if self.peek() == ")":
+                self.take()
+            return False, docs
+        if kind == "phrase":
+            return False, self.index.phrase(_words(value))
+        if kind == "word":
+            words = _words(value)
+            if not value.endswith("*") or not words:
+                # words split by the analyzer (e.g. `coral-reef`) are a phrase
+                return False, self.index.phrase(words)
+            docs = self.index.prefix(words[-1])
+            if len(words) > 1:
+                docs &= self.index.phrase(words[:-1])
+            return False, docs
+        # stray operators
+        return False, set()
+
+
+class DatasetCatalog:
+    """
+    Local catalog of dataset metadata, stored in SQLite and searchable offline
+    with the keyword syntax of `dataset.search`.
+    """
+
+    def __init__(self, path=None):
+        """
+        Open (or create) the catalog.
+
+        Args:
+            path (str, optional): Path of the SQLite file.
+                Defaults to datasets.sqlite in the pyobis cache directory.
+        """
+        self.path = Path(path) if path else _DEFAULT_CACHE_DIR / "datasets.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.__conn.row_factory = sqlite3.Row
+        self.__index = None
+        with self.__lock, self.__conn:
+            self.__conn.executescript(_SCHEMA)
+
+    def sync(self, prune=None, max_workers=None, cache=False, **kwargs):
+        """
+        Sync the catalog with `dataset.search`.
+
+        The API has no filter on `updated`, so every sync downloads the full
+        listing of `dataset.search`, which holds the complete records. Only
+        the datasets whose `updated` timestamp changed since the last sync are
+        then written and re-indexed.
+
+        Args:
+            prune (bool, optional): Remove datasets which are no longer listed.
+                Defaults to True when syncing all datasets (no filters).
+            max_workers (int, optional): Maximum number of pages fetched concurrently.
+            cache (bool, optional): Whether to use the HTTP cache for the
+                listing. Defaults to False, to see the latest updates.
+            **kwargs: Filters passed to `dataset.search`, e.g. `nodeid`
+
+        Returns:
+            dict: Number of datasets added, updated, removed and unchanged
+        """
+        records = search_datasets(
+            max_workers=max_workers,
+            cache=cache,
+            **kwargs,
+        ).execute()["results"]
+        return self.add(records, prune=not kwargs if prune is None else prune)
+
+    def add(self, records, prune=False):
+        """
+        Add or update dataset records, skipping those whose `updated`
+        timestamp did not change.
+
+        Args:
+            records (list): Dataset records as dictionaries
+            prune (bool): Remove the stored datasets missing from `records`.
+                Defaults to False.
+
+        Returns:
+            dict: Number of datasets added, updated, removed and unchanged
+        """
+        with self.__lock:
+            stored = dict(
+                self.__conn.execute("SELECT id, updated FROM datasets").fetchall(),
+            )
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        rows = []
+        for record in records:
+            if record["id"] in stored and stored[record["id"]] == record.get("updated"):
+                counts["unchanged"] += 1
+                continue
+            counts["updated" if record["id"] in stored else "added"] += 1
+            keywords = [
+                k["keyword"] for k in record.get("keywords") or [] if k.get("keyword")
+            ]
+            rows.append(
+                (
+                    record["id"],
+                    record.get("title"),
+                    record.get("abstract"),
+                    json.dumps(keywords),
+                    record.get("extent"),
+                    record.get("updated"),
+                    json.dumps(record),
+                ),
+            )
+        removed = []
+        if prune:
+            listed = {record["id"] for record in records}
+            removed = [(i,) for i in stored if i not in listed]
+            counts["removed"] = len(removed)
+
+        now = time()
+        with self.__lock, self.__conn:
+            self.__conn.executemany(
+                "INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*row, now) for row in rows],
+            )
+            self.__conn.executemany("DELETE FROM datasets WHERE id = ?", removed)
+            if rows or removed:
+                self.__index = None
+        return counts
+
+    def search(self, keyword, limit=None, default_operator="or"):
+        """
+        Search the catalog with the keyword syntax of `dataset.search`.
+
+        Supports `+` (AND), `|` (OR), `-` (NOT), quoted phrases, trailing
+        wildcards and grouping with parentheses, on the titles, abstracts and
+        keywords of the datasets. Words are matched case insensitively.
+        Whitespace-separated terms are combined with `default_operator`, like
+        in Elasticsearch, while negated terms always exclude datasets.
+
+        Args:
+            keyword (str): Query, e.g. `(coral | kelp) -fish`
+            limit (int, optional): Maximum number of datasets to return.
+            default_operator (str): Either "or" or "and". Defaults to "or".
+
+        Returns:
+            pandas.DataFrame: The matching datasets, ordered by title
+        """
+        with self.__lock:
+            if self.__index is None:
+                rows = self.__conn.execute(
+                    "SELECT id, title, abstract, keywords FROM datasets ORDER BY id",
+                ).fetchall()
+                self.__index = _Index(rows)
+            index = self.__index
+        docs = _QueryParser(keyword, index, default_operator.lower()).parse()
+        return self.__select(
+            [index.ids[doc] for doc in docs],
+            order="title IS NULL, title, id",
+            limit=limit,
+        )
+
+    def get(self, id):
+        """
+        Get a full dataset record by id.
+
+        Returns:
+            dict: The dataset record, or None if the dataset is not in the catalog
+        """
+        with self.__lock:
+            row = self.__conn.execute(
+                "SELECT record FROM datasets WHERE id = ?",
+                (id,),
+            ).fetchone()
+        return json.loads(row["record"]) if row else None
+
+    def to_pandas(self, ids=None):
+        """
+        Get the catalog (or the given datasets) as a pandas DataFrame with the
+        id, title, abstract, keywords (as lists), extent and updated columns.
+        """
+        return self.__select(ids)
+
+    def __select(self, ids=None, order="id", limit=None):
+        """
+        Read the datasets (all of them, or the given ids) into a DataFrame.
+        """
+        sql = "SELECT id, title, abstract, keywords, extent, updated FROM datasets"
+        params = []
+        if ids is not None:
+            # the ids are sent as a single JSON parameter, whatever their number
+            sql += " WHERE id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps([*ids]))
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.__lock:
+            df = pd.read_sql_query(sql, self.__conn, params=params)
+        df["keywords"] = df["keywords"].map(json.loads)
+        return df
+
+    def clear(self):
+        """Remove all datasets from the catalog."""
+        with self.__lock, self.__conn:
+            self.__conn.execute("DELETE FROM datasets")
+            self.__index = None
+
+    def close(self):
+        """Close the database connection."""
+        self.__conn.close()
+
+    def __len__(self):
+        """Number of datasets in the catalog."""
+        with self.__lock:
+            return self.__conn.execute("SELECT COUNT(*) FROM datasets").fetchone()[0]
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
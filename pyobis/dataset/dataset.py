@@ -3,8 +3,19 @@
 """
 
 import pandas as pd
+import requests
 
-from ..obisutils import build_api_url, handle_arrstr, obis_baseurl, obis_GET
+from ..obisutils import (
+    build_api_url,
+    chunk_args,
+    handle_arrint,
+    handle_arrstr,
+    logger,
+    obis_baseurl,
+    obis_GET,
+    obis_imap,
+    obis_map,
+)
 
 
 def search(
@@ -21,6 +32,7 @@ def search(
     offset=0,
     cache=True,
     keyword=None,
+    max_workers=None,
     **kwargs,
 ):
     """
@@ -58,11 +70,26 @@ def search(
           - trailing wildcards `*`, e.g., `star*`
           - grouping with parentheses, e.g., `(coral | kelp) -fish`
         Leading or mid-word wildcards (e.g., `*star` or `*star*`) are not supported.
+    :param limit: [Fixnum] Number of datasets to return. Default: All datasets
     :param offset: [Fixnum] Start at record. Default: 0
     :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :param max_workers: [Fixnum] Maximum number of pages fetched concurrently.
+        Default: obisutils.DEFAULT_MAX_WORKERS
 
     :return: A DatasetResponse object
 
+    When the API caps the number of datasets returned below `limit` (or below
+    the total), the remaining pages are fetched concurrently, with the page
+    size of the first response, until a page is shorter than requested or the
+    total is reached. `iter_pages()` yields the pages as DataFrames as they arrive.
+    Without a `limit`, every matching dataset is therefore fetched, and not
+    only the first page returned by the API.
+
+    Long lists of `scientificname` or `taxonid` are split into chunks which are
+    fetched as concurrent sub-queries, and their datasets merged by `id`. Every
+    sub-query is limited to `limit` datasets, of which the first `limit` merged
+    datasets are kept.
+
     Usage::
 
         from pyobis import dataset
@@ -104,6 +131,10 @@ def search(
 
         # Get resources for a particular eventDate
         data = dataset.search(taxonid=res['worms_id']).execute()
+
+        # Stream all the datasets matching a keyword
+        for page in dataset.search(keyword="coral").iter_pages():
+            print(len(page))
     """  # noqa: E501
     LOCALS = locals()
     url = obis_baseurl + "dataset"
@@ -113,7 +144,7 @@ def search(
     # =================================================================================
     if keyword is not None:
         # === check for other kwargs not compatible with keyword
-        allowed_with_keyword = {"limit", "offset", "cache"}
+        allowed_with_keyword = {"limit", "offset", "cache", "max_workers"}
         __validate_keyword_constraints(keyword, allowed_with_keyword, LOCALS, kwargs)
         args = {
             "q": keyword,
@@ -121,11 +152,20 @@ def search(
             "size": limit,
         }
         mapper = False
-        return DatasetResponse(url, {**args, **kwargs}, mapper, cache=cache)
+        return DatasetResponse(
+            url,
+            {**args, **kwargs},
+            mapper,
+            cache=cache,
+            paginate=True,
+            max_workers=max_workers,
+        )
     # =================================================================================
     # === non-keyword-based search
     # =================================================================================
+    subqueries = chunk_args(scientificname=scientificname, taxonid=taxonid)
     scientificname = handle_arrstr(scientificname)
+    taxonid = handle_arrint(taxonid)
     args = {
         "taxonid": taxonid,
         "nodeid": nodeid,
@@ -141,7 +181,15 @@ def search(
     }
 
     mapper = False
-    return DatasetResponse(url, {**args, **kwargs}, mapper, cache=cache)
+    return DatasetResponse(
+        url,
+        {**args, **kwargs},
+        mapper,
+        cache=cache,
+        subqueries=subqueries,
+        paginate=True,
+        max_workers=max_workers,
+    )
     # =================================================================================
 
 
@@ -169,12 +217,111 @@ def get(id, cache=True, **kwargs):
     return DatasetResponse(url, {**args, **kwargs}, mapper, cache=cache)
 
 
+def get_many(ids, max_workers=None, cache=True):
+    """
+    Get many datasets by ID at once.
+
+    IDs are deduplicated and looked up in the cache first, the remaining
+    datasets are then fetched concurrently. Failing IDs are logged and left out.
+
+    Nested fields become side tables with a `dataset_id` column: one row per
+    item for lists (e.g. `institutes`, `contacts`, `nodes`, `keywords`,
+    `downloads`, `extensions`), and one row per dataset for `statistics`.
+    Other objects (e.g. `feed`) are flattened into the datasets table, as
+    `feed_id` and `feed_url`.
+
+    :param ids: [Array] OBIS dataset identifiers
+    :param max_workers: [Fixnum] Maximum number of concurrent requests.
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :return: A dictionary of pandas DataFrames, the `datasets` table with one
+        row per dataset found, and the side tables keyed by field name
+
+    Usage::
+
+        from pyobis import dataset
+        tables = dataset.get_many([
+            'ec9df3b9-3b2b-4d83-881b-27bcbcd57b95',
+            '2ae2a2bd-6d4c-4f4e-9f4a-9a5b4d6e2e3c',
+        ])
+        tables['datasets']
+        tables['contacts']
+    """
+    ids = [*dict.fromkeys(str(i) for i in ids)]
+
+    def fetch(id, **kwargs):
+        return obis_GET(
+            obis_baseurl + "dataset/" + id,
+            {},
+            "application/json; charset=utf-8",
+            cache=cache,
+            **kwargs,
+        )["results"]
+
+    found = {}
+    if cache:
+        for id in ids:
+            try:
+                found[id] = fetch(id, only_if_cached=True)
+            except requests.HTTPError:
+                pass
+    missing = [i for i in ids if i not in found]
+    for id, res in zip(
+        missing,
+        obis_map(fetch, missing, max_workers=max_workers, return_exceptions=True),
+    ):
+        if isinstance(res, Exception):
+            logger.warning(f"Request failed for {id}: {res}")
+        else:
+            found[id] = res
+    return _dataset_tables([found[i][0] for i in ids if found.get(i)])
+
+
+def _dataset_tables(records):
+    """
+    Split dataset records into the datasets table and side tables of their
+    nested fields
+    """
+    rows, side = [], {}
+    for record in records:
+        row = {}
+        for key, value in record.items():
+            if isinstance(value, list):
+                items = side.setdefault(key, [])
+                for item in value:
+                    if isinstance(item, dict):
+                        items.append({"dataset_id": record["id"], **item})
+                    else:
+                        items.append({"dataset_id": record["id"], key: item})
+            elif key == "statistics" and isinstance(value, dict):
+                side.setdefault(key, []).append({"dataset_id": record["id"], **value})
+            elif isinstance(value, dict):
+                row.update({f"{key}_{k}": v for k, v in value.items()})
+            else:
+                row[key] = value
+        rows.append(row)
+    tables = {"datasets": pd.DataFrame(rows)}
+    for key, items in side.items():
+        tables[key] = (
+            pd.DataFrame(items) if items else pd.DataFrame(columns=["dataset_id"])
+        )
+    return tables
+
+
 class DatasetResponse:
     """
     An OBIS Dataset Response Object
     """
 
-    def __init__(self, url, args, mapper, cache=True):
+    def __init__(
+        self,
+        url,
+        args,
+        mapper,
+        cache=True,
+        subqueries=None,
+        paginate=False,
+        max_workers=None,
+    ):
         """
         Initialise the object parameters
         """
@@ -189,11 +336,60 @@ class DatasetResponse:
         self.__args = args
         self.__url = url
         self.__cache = cache
+        self.__subqueries = subqueries
+        self.__paginate = paginate
+        self.__max_workers = max_workers
+        self.__total = None
 
     def execute(self, **kwargs):
         """
         Execute or fetch the data based on the query
         """
+        if self.__subqueries:
+            return self.__execute_subqueries(**kwargs)
+        if not self.__paginate:
+            out = obis_GET(
+                self.__url,
+                self.__args,
+                "application/json; charset=utf-8",
+                cache=self.__cache,
+                **kwargs,
+            )
+            self.data = out
+            return self.data
+        results = []
+        for page in self.__pages(**kwargs):
+            results += page
+        self.data = {"total": self.__total, "results": results}
+        return self.data
+
+    def iter_pages(self, **kwargs):
+        """
+        Fetch the datasets page by page, yielding pandas DataFrames as they
+        arrive, without keeping the results.
+
+        Usage::
+
+            from pyobis import dataset
+            for page in dataset.search(keyword="coral").iter_pages():
+                print(len(page))
+        """
+        if not self.__paginate:
+            raise ValueError("iter_pages is only available for dataset.search queries.")
+        if self.__subqueries:
+            # the chunks are merged by id, so they can only be
+            # yielded once all of them have been fetched
+            yield pd.DataFrame(self.execute(**kwargs)["results"])
+            return
+        for page in self.__pages(**kwargs):
+            yield pd.DataFrame(page)
+
+    def __pages(self, **kwargs):
+        """
+        Yield the result lists of every page. The first request is sent as
+        given, the remaining pages are then fetched concurrently, since the
+        total is known, and yielded in order.
+        """
         out = obis_GET(
             self.__url,
             self.__args,
@@ -201,7 +397,65 @@ class DatasetResponse:
             cache=self.__cache,
             **kwargs,
         )
-        self.data = out
+        if "error" in out:
+            raise ValueError(out["error"])
+        self.__total = out.get("total", len(out["results"]))
+        yield out["results"]
+
+        page_size = len(out["results"])
+        offset = self.__args.get("offset") or 0
+        end = self.__total
+        if self.__args.get("size"):
+            end = min(end, offset + self.__args["size"])
+        if not page_size or offset + page_size >= end:
+            return
+        logger.info(f"Fetching {end - offset} datasets in pages of {page_size}.")
+        skips = range(offset + page_size, end, page_size)
+        pages = obis_imap(
+            lambda skip: obis_GET(
+                self.__url,
+                {**self.__args, "offset": skip, "size": min(page_size, end - skip)},
+                "application/json; charset=utf-8",
+                cache=self.__cache,
+                **kwargs,
+            )["results"],
+            skips,
+            max_workers=self.__max_workers,
+        )
+        for skip, page in zip(skips, pages):
+            yield page
+            # a page shorter than requested is the last one, as the totals may
+            # count datasets without available metadata, which are not returned
+            if len(page) < min(page_size, end - skip):
+                pages.close()
+                return
+
+    def __execute_subqueries(self, **kwargs):
+        """
+        Run the sub-queries concurrently and merge their datasets by id
+        """
+
+        def run(overrides):
+            # the pages of a sub-query are fetched one after the other, so that
+            # at most max_workers requests run at once
+            return DatasetResponse(
+                self.__url,
+                {**self.__args, **overrides},
+                mapper=False,
+                cache=self.__cache,
+                paginate=True,
+                max_workers=1,
+            ).execute(**kwargs)["results"]
+
+        logger.info(f"Running {len(self.__subqueries)} sub-queries.")
+        merged = {}
+        for results in obis_map(run, self.__subqueries, max_workers=self.__max_workers):
+            for dataset in results:
+                merged.setdefault(dataset["id"], dataset)
+        results = [*merged.values()]
+        if self.__args.get("size"):
+            results = results[: self.__args["size"]]
+        self.data = {"total": len(results), "results": results}
         return self.data
 
     def to_pandas(self):
@@ -0,0 +1,97 @@
+"""Tests for the local dataset catalog"""
+
+from pyobis.dataset import dataset as dataset_module
+from pyobis.dataset.catalog import DatasetCatalog
+
+DATASETS = [
+    {
+        "id": "a",
+        "title": "Cold water corals",
+        "abstract": "Dataset of cold water corals from seamounts.",
+        "keywords": [{"keyword": "Coral reef", "thesaurus": None}],
+        "extent": "POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))",
+        "updated": "2025-01-01",
+    },
+    {
+        "id": "b",
+        "title": "Kelp forest fish survey",
+        "abstract": "Reef fish counted in kelp forests.",
+        "keywords": [],
+        "extent": None,
+        "updated": "2025-01-01",
+    },
+    {
+        "id": "c",
+        "title": "Starfish of the North Sea",
+        "abstract": "Coral and starfish observations.",
+        "keywords": [{"keyword": "Echinodermata"}],
+        "extent": None,
+        "updated": "2025-01-01",
+    },
+]
+
+
+def ids(df):
+    return sorted(df["id"])
+
+
+def test_catalog_search(tmp_path):
+    """
+    DatasetCatalog.search - simple_query_string operators on the local index
+    """
+    with DatasetCatalog(tmp_path / "datasets.sqlite") as catalog:
+        catalog.add(DATASETS)
+        assert len(catalog) == 3
+        assert ids(catalog.search("coral")) == ["a", "c"]
+        assert ids(catalog.search("CORALS")) == ["a"]
+        assert ids(catalog.search("coral kelp")) == ["a", "b", "c"]
+        assert ids(catalog.search("coral+reef")) == ["a"]
+        assert ids(catalog.search("coral | kelp")) == ["a", "b", "c"]
+        assert ids(catalog.search("coral -starfish")) == ["a"]
+        assert ids(catalog.search('"coral reef"')) == ["a"]
+        assert ids(catalog.search('"reef fish"')) == ["b"]
+        assert ids(catalog.search('"corals coral"')) == []
+        assert ids(catalog.search("star*")) == ["c"]
+        assert ids(catalog.search("(coral | kelp) -fish")) == ["a", "c"]
+        assert ids(catalog.search("-coral")) == ["b"]
+        assert ids(catalog.search("coral kelp", default_operator="and")) == []
+        assert catalog.search("coral")["keywords"].iloc[0] == ["Coral reef"]
+        assert len(catalog.search("coral", limit=1)) == 1
+        # ordered by title, datasets without a title last
+        catalog.add([{"id": "0", "title": None, "abstract": "Coral"}])
+        assert list(catalog.search("coral")["id"]) == ["a", "c", "0"]
+        assert list(catalog.search("coral", limit=2)["id"]) == ["a", "c"]
+        assert catalog.get("a")["extent"] == DATASETS[0]["extent"]
+
+
+def test_catalog_sync(tmp_path, obis_api):
+    """
+    DatasetCatalog.sync - only datasets whose `updated` changed are written
+    """
+    listing = [dict(d) for d in DATASETS]
+    obis_api.serve(
+        dataset_module,
+        lambda url, args: {"total": len(listing), "results": listing},
+    )
+
+    with DatasetCatalog(tmp_path / "datasets.sqlite") as catalog:
+        assert catalog.sync() == {
+            "added": 3,
+            "updated": 0,
+            "removed": 0,
+            "unchanged": 0,
+        }
+        assert ids(catalog.search("kelp")) == ["b"]
+
+        listing[1] = {**listing[1], "title": "Seagrass survey", "updated": "2025-02-01"}
+        del listing[2]
+        assert catalog.sync(nodeid="x") == {
+            "added": 0,
+            "updated": 1,
+            "removed": 0,
+            "unchanged": 1,
+        }
+        assert ids(catalog.search("kelp")) == ["b"]
+        assert ids(catalog.search("seagrass")) == ["b"]
+        assert catalog.sync()["removed"] == 1
+        assert ids(catalog.search("star*")) == []
@@ -68,13 +68,13 @@ def test_cache_parameter_functionality():
     assert not res_with_cache.data
     assert not res_without_cache.data
 
-    # post-execution state
-    res_with_cache.execute()
-    res_without_cache.execute()
-    assert res_with_cache.data is not None
-    assert res_without_cache.data is not None
-    assert "dict" == res_with_cache.data.__class__.__name__
-    assert "dict" == res_without_cache.data.__class__.__name__
+    # the recorded first page, the paging of the remaining datasets is
+    # tested in test_dataset_search_pages
+    page_with_cache = next(res_with_cache.iter_pages())
+    page_without_cache = next(res_without_cache.iter_pages())
+    assert "DataFrame" == page_with_cache.__class__.__name__
+    assert "DataFrame" == page_without_cache.__class__.__name__
+    assert len(page_without_cache) == 244
 
     dataset_id = "ec9df3b9-3b2b-4d83-881b-27bcbcd57b95"
     get_with_cache = dataset.get(dataset_id, cache=True)
@@ -92,3 +92,83 @@ def test_cache_parameter_functionality():
     assert get_without_cache.data is not None
     assert "dict" == get_with_cache.data.__class__.__name__
     assert "dict" == get_without_cache.data.__class__.__name__
+
+
+def test_dataset_search_pages(obis_api):
+    """
+    dataset.search - pages capped by the API are fetched concurrently
+    """
+    from pyobis.dataset import dataset as dataset_module
+
+    datasets = [{"id": f"{i:04d}"} for i in range(1234)]
+
+    def respond(url, args):
+        """Pages of at most 100 datasets."""
+        offset = args["offset"]
+        size = min(args.get("size") or 100, 100)
+        return {"total": len(datasets), "results": datasets[offset:][:size]}
+
+    obis_api.serve(dataset_module, respond)
+
+    data = dataset.search(keyword="coral", max_workers=3).execute()
+    assert [d["id"] for d in data["results"]] == [d["id"] for d in datasets]
+    assert len(obis_api.requests) == 13
+    assert obis_api.args[-1]["size"] == 34
+
+    obis_api.requests.clear()
+    pages = [*dataset.search(nodeid="x", offset=10, limit=250).iter_pages()]
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert pages[-1]["id"].iloc[-1] == "0259"
+    assert len(obis_api.requests) == 3
+
+    # totals counting datasets which are not returned end at the first short page
+    obis_api.serve(
+        dataset_module,
+        lambda url, args: {**respond(url, args), "total": len(datasets) + 300},
+    )
+    obis_api.requests.clear()
+    pages = [*dataset.search(keyword="coral", max_workers=2).iter_pages()]
+    assert [len(page) for page in pages] == [100] * 12 + [34]
+    assert len(obis_api.requests) <= 13 + 2
+
+
+def test_dataset_get_many(obis_api):
+    """
+    dataset.get_many - datasets are deduplicated, cached ones are not fetched
+    again, and nested fields become side tables
+    """
+    from pyobis.dataset import dataset as dataset_module
+
+    def record(id):
+        return {
+            "id": id,
+            "title": f"Dataset {id}",
+            "extensions": ["measurementorfact"] if id == "a" else [],
+            "statistics": {"Occurrence": 10, "MeasurementOrFact": 5},
+            "feed": {"id": "f", "url": "http://ipt/rss.do"},
+            "institutes": [{"name": "VLIZ", "oceanexpert_id": 6223}],
+            "contacts": [{"type": "creator", "surname": "A"}, {"type": "metadata"}],
+        }
+
+    def respond(url, args):
+        """Dataset `id`, except for `missing` and `error`."""
+        id = url.split("/")[-1]
+        if id == "missing":
+            return {"total": 0, "results": []}
+        if id == "error":
+            raise requests.HTTPError("500 Server Error")
+        return {"total": 1, "results": [record(id)]}
+
+    obis_api.serve(dataset_module, respond, cached=lambda url, args: url.endswith("/a"))
+
+    tables = dataset.get_many(["b", "a", "b", "missing", "error"])
+    fetched = sorted(url.split("/")[-1] for url, _ in obis_api.requests)
+    assert fetched == ["b", "error", "missing"]
+    datasets = tables["datasets"]
+    assert list(datasets["id"]) == ["b", "a"]
+    assert list(datasets["feed_url"]) == ["http://ipt/rss.do"] * 2
+    assert "contacts" not in datasets.columns
+    assert list(tables["contacts"]["dataset_id"]) == ["b", "b", "a", "a"]
+    assert list(tables["extensions"]["extensions"]) == ["measurementorfact"]
+    assert list(tables["statistics"]["Occurrence"]) == [10, 10]
+    assert tables["institutes"]["oceanexpert_id"].tolist() == [6223, 6223]
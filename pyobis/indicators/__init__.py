@@ -0,0 +1,3 @@
+from .indicators import DiversityGrid, calculate
+
+__all__ = ["DiversityGrid", "calculate"]
@@ -0,0 +1,263 @@
+"""
+Biodiversity indicators (species richness, Shannon index and ES(n)) per grid
+cell, computed from occurrence records.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+
+
+def _geohash_codes(x, y, precision):
+    """
+    Vectorized geohash encoding of coordinates into integers of 5 * precision bits.
+    """
+    bits = 5 * precision
+    lon_bits, lat_bits = (bits + 1) // 2, bits // 2
+    lon = np.clip(((x + 180) / 360 * 2**lon_bits).astype(np.int64), 0, 2**lon_bits - 1)
+    lat = np.clip(((y + 90) / 180 * 2**lat_bits).astype(np.int64), 0, 2**lat_bits - 1)
+    codes = np.zeros(len(lon), dtype=np.int64)
+    # bits are interleaved starting with longitude at the most significant bit
+    for b in range(bits):
+        if b % 2 == 0:
+            bit = (lon >> (lon_bits - 1 - b // 2)) & 1
+        else:
+            bit = (lat >> (lat_bits - 1 - b // 2)) & 1
+        codes = (codes << 1) | bit
+    return codes
+
+
+def _geohash_centers(codes, precision):
+    """
+    Centers (longitude, latitude) of geohash cells given as integer codes.
+    """
+    bits = 5 * precision
+    lon_bits, lat_bits = (bits + 1) // 2, bits // 2
+    lon = np.zeros(len(codes), dtype=np.int64)
+    lat = np.zeros(len(codes), dtype=np.int64)
+    for b in range(bits):
+        bit = (codes >> (bits - 1 - b)) & 1
+        if b % 2 == 0:
+            lon = (lon << 1) | bit
+        else:
+            lat = (lat << 1) | bit
+    return (
+        (lon + 0.5) * 360 / 2**lon_bits - 180,
+        (lat + 0.5) * 180 / 2**lat_bits - 90,
+    )
+
+
+def _geohash_strings(codes, precision):
+    """
+    Geohash strings of integer codes.
+    """
+    return [
+        "".join(
+            _GEOHASH_ALPHABET[(code >> (5 * (precision - 1 - i))) & 31]
+            for i in range(precision)
+        )
+        for code in codes.tolist()
+    ]
+
+
+class DiversityGrid:
+    """
+    Incremental calculation of biodiversity indicators per grid cell.
+
+    Pages of occurrence records are added with `update`. Only the number of
+    records per (cell, taxon) pair is kept, with cells and taxa coded as integers,
+    so the memory use depends on the number of distinct pairs rather than on the
+    number of records.
+
+    Usage::
+
+        from pyobis import indicators, occurrences
+
+        grid = indicators.DiversityGrid(cell_size=5, n=50)
+        query = occurrences.search(taxonid=1363, startdepth=0, enddepth=30)
+        for page in query.iter_pages():
+            grid.update(page)
+        grid.to_pandas()
+    """
+
+    def __init__(
+        self,
+        cell_size=1.0,
+        geohash_precision=None,
+        n=50,
+        taxon="speciesid",
+        x="decimalLongitude",
+        y="decimalLatitude",
+    ):
+        """
+        Initialise the grid.
+
+        :param cell_size: [float] Size of the regular grid cells in degrees. Default: 1
+        :param geohash_precision: [integer] Use geohash cells of this precision
+            instead of a regular grid. Default: None
+        :param n: [integer] Sample size for the ES(n) indicator. Default: 50
+        :param taxon: [String] Column identifying the taxa, records without
+            a value are skipped. Default: `speciesid` (species level records)
+        :param x: [String] Longitude column. Default: `decimalLongitude`
+        :param y: [String] Latitude column. Default: `decimalLatitude`
+        """
+        self.cell_size = cell_size
+        self.geohash_precision = geohash_precision
+        self.n = n
+        self.taxon = taxon
+        self.x = x
+        self.y = y
+
+        # private members
+        self.__ncols = int(np.ceil(360 / cell_size)) + 1
+        self.__cells = pd.Index([], dtype="int64")
+        self.__taxa = pd.Index([])
+        self.__keys = np.empty(0, dtype=np.int64)
+        self.__counts = np.empty(0, dtype=np.int64)
+
+    def __cell_ids(self, x, y):
+        """Raw identifiers of the cells holding the coordinates."""
+        if self.geohash_precision:
+            return _geohash_codes(x, y, self.geohash_precision)
+        cols = ((x + 180) // self.cell_size).astype(np.int64)
+        rows = ((y + 90) // self.cell_size).astype(np.int64)
+        return rows * self.__ncols + cols
+
+    @staticmethod
+    def __codes(index, values):
+        """Extend an index with unseen values, and code the values against it."""
+        unseen = pd.Index(pd.unique(values)).difference(index)
+        if len(unseen):
+            index = index.append(unseen)
+        return index, index.get_indexer(values)
+
+    def update(self, df):
+        """
+        Add a page of occurrence records.
+
+        :param df: [DataFrame] Occurrence records
+        :return: The DiversityGrid itself
+        """
+        if not len(df) or self.taxon not in df.columns:
+            return self
+        df = df[[self.x, self.y, self.taxon]].dropna()
+        cells = self.__cell_ids(
+            df[self.x].to_numpy(dtype=float),
+            df[self.y].to_numpy(dtype=float),
+        )
+        self.__cells, cell_codes = self.__codes(self.__cells, cells)
+        self.__taxa, taxon_codes = self.__codes(self.__taxa, df[self.taxon].to_numpy())
+
+        keys = (cell_codes.astype(np.int64) << 32) | taxon_codes.astype(np.int64)
+        keys, inverse = np.unique(
+            np.concatenate([self.__keys, keys]),
+            return_inverse=True,
+        )
+        self.__counts = np.bincount(
+            inverse,
+            weights=np.concatenate([self.__counts, np.ones(len(df), dtype=np.int64)]),
+        ).astype(np.int64)
+        self.__keys = keys
+        return self
+
+    def to_pandas(self):
+        """
+        Calculate the indicators per cell.
+
+        :return: A pandas DataFrame with one row per cell, holding the cell id
+            (geohash or regular grid index), the cell center, the number of
+            records, the species richness, the Shannon index and ES(n). ES(n) is
+            missing for cells with fewer than n records.
+        """
+        cells = (self.__keys >> 32).astype(np.int64)
+        counts = self.__counts.astype(float)
+        ncells = len(self.__cells)
+
+        records = np.bincount(cells, weights=counts, minlength=ncells)
+        richness = np.bincount(cells, minlength=ncells)
+        p = counts / records[cells]
+        shannon = -np.bincount(cells, weights=p * np.log(p), minlength=ncells)
+
+        # Hurlbert's ES(n) = sum over taxa of 1 - C(N - Ni, n) / C(N, n)
+        n = self.n
+        total = records[cells]
+        rest = total - counts
+        valid = rest >= n
+        log_ratio = np.zeros(len(counts))
+        if valid.any():
+            log_ratio[valid] = (
+                _lgamma(rest[valid] + 1)
+                - _lgamma(rest[valid] - n + 1)
+                - _lgamma(total[valid] + 1)
+                + _lgamma(total[valid] - n + 1)
+            ).astype(float)
+        terms = np.where(valid, 1 - np.exp(log_ratio), 1.0)
+        es = np.bincount(cells, weights=terms, minlength=ncells)
+        es[records < n] = np.nan
+
+        ids = self.__cells.to_numpy(dtype=np.int64)
+        if self.geohash_precision:
+            x, y = _geohash_centers(ids, self.geohash_precision)
+            cell = _geohash_strings(ids, self.geohash_precision)
+        else:
+            x = (ids % self.__ncols + 0.5) * self.cell_size - 180
+            y = (ids // self.__ncols + 0.5) * self.cell_size - 90
+            cell = ids
+
+        return (
+            pd.DataFrame(
+                {
+                    "cell": cell,
+                    "x": x,
+                    "y": y,
+                    "records": records.astype(np.int64),
+                    "richness": richness,
+                    "shannon": shannon,
+                    f"es{n}": es,
+                },
+            )
+            .sort_values("cell")
+            .reset_index(drop=True)
+        )
+
+
+def calculate(data, cell_size=1.0, geohash_precision=None, n=50, **kwargs):
+    """
+    Calculate species richness, the Shannon index and ES(n) per grid cell.
+
+    :param data: An occurrences.search query (fetched page by page, without
+        keeping the records), a DataFrame, or an iterable of DataFrames.
+    :param cell_size: [float] Size of the regular grid cells in degrees. Default: 1
+    :param geohash_precision: [integer] Use geohash cells of this precision
+        instead of a regular grid. Default: None
+    :param n: [integer] Sample size for the ES(n) indicator. Default: 50
+    :param kwargs: Column names, see DiversityGrid.
+
+    :return: A pandas DataFrame with one row per cell
+
+    Usage::
+
+        from pyobis import indicators, occurrences
+
+        query = occurrences.search(taxonid=1363, startdepth=0, enddepth=30)
+        indicators.calculate(query, geohash_precision=3)
+    """
+    grid = DiversityGrid(
+        cell_size=cell_size,
+        geohash_precision=geohash_precision,
+        n=n,
+        **kwargs,
+    )
+    if isinstance(data, pd.DataFrame):
+        pages = [data]
+    elif hasattr(data, "iter_pages"):
+        pages = data.iter_pages()
+    else:
+        pages = data
+    for page in pages:
+        grid.update(page)
+    return grid.to_pandas()
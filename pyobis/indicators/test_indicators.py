@@ -0,0 +1,69 @@
+"""Tests for indicators module"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from pyobis import indicators
+
+
+def es(counts, n):
+    """Hurlbert's ES(n), computed directly."""
+    total = sum(counts)
+    if total < n:
+        return np.nan
+    return sum(1 - math.comb(total - c, n) / math.comb(total, n) for c in counts)
+
+
+def test_indicators_calculate():
+    """
+    indicators.calculate - pages added one by one match a group-by over all records
+    """
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(
+        {
+            "decimalLongitude": rng.uniform(-20, 20, 3000),
+            "decimalLatitude": rng.uniform(-10, 10, 3000),
+            "speciesid": rng.integers(0, 40, 3000).astype(float),
+        },
+    )
+    df.loc[::50, "speciesid"] = np.nan
+
+    pages = [page for _, page in df.groupby(df.index // 700)]
+    result = indicators.calculate(pages, cell_size=10, n=50)
+
+    species = df.dropna()
+    expected = species.groupby(
+        [
+            ((species.decimalLatitude + 90) // 10).astype(int),
+            ((species.decimalLongitude + 180) // 10).astype(int),
+        ],
+    ).speciesid
+    assert result.records.sum() == len(species)
+    assert sorted(result.richness) == sorted(expected.nunique())
+    for (row, col), taxa in expected:
+        cell = result.set_index("cell").loc[row * 37 + col]
+        counts = taxa.value_counts().to_numpy()
+        p = counts / counts.sum()
+        assert cell.x == col * 10 - 175 and cell.y == row * 10 - 85
+        assert np.isclose(cell.shannon, -(p * np.log(p)).sum())
+        assert np.isclose(cell.es50, es(counts, 50))
+
+
+def test_indicators_geohash():
+    """
+    indicators.DiversityGrid - geohash cells and ES(n) for small cells
+    """
+    df = pd.DataFrame(
+        {
+            "decimalLongitude": [-5.6, -5.6, -5.6, 120.0],
+            "decimalLatitude": [42.6, 42.6, 42.6, -30.0],
+            "speciesid": [1, 1, 2, 3],
+        },
+    )
+    result = indicators.DiversityGrid(geohash_precision=5, n=2).update(df).to_pandas()
+    cell = result.set_index("cell").loc["ezs42"]
+    assert cell.records == 3 and cell.richness == 2
+    assert np.isclose(cell.es2, es([2, 1], 2))
+    assert result.es2.isna().sum() == 1
@@ -1,3 +1,3 @@
-from .nodes import NodesResponse, activities, search
+from .nodes import NodesResponse, activities, activities_many, search, search_many
 
-__all__ = ["search", "activities", "NodesResponse"]
+__all__ = ["search", "activities", "search_many", "activities_many", "NodesResponse"]
@@ -4,14 +4,18 @@
 
 import pandas as pd
 
-from ..obisutils import build_api_url, obis_baseurl, obis_GET
+from ..obisutils import build_api_url, logger, obis_baseurl, obis_GET, obis_map
+
+# nested lists of the node and activity records, normalized into long tables
+# keyed by the id of their parent record
+_NESTED = {"contacts": "node_id", "contributions": "activity_id"}
 
 
 def search(id=None, cache=True, **kwargs):
     """
     Get OBIS nodes records
 
-    :param id: [String] Node UUID.
+    :param id: [String] Node UUID. Default: all nodes
     :param cache: [bool, optional] Whether to use caching. Defaults to True.
     :return: A NodesQuery Object
 
@@ -19,9 +23,13 @@ def search(id=None, cache=True, **kwargs):
 
         from pyobis import nodes
         data = nodes.search(id="4bf79a01-65a9-4db6-b37b-18434f26ddfc").execute()
+
+        # all nodes
+        nodes.search().execute()
     """
-    url = obis_baseurl + "node/" + id
-    mapper = True
+    url = obis_baseurl + ("node/" + id if id else "node")
+    # the mapper shows a single node
+    mapper = bool(id)
     args = {}
 
     # return NodesQuery Object
@@ -55,6 +63,101 @@ def activities(id=None, cache=True, **kwargs):
     return NodesResponse(url, {**args, **kwargs}, mapper, cache=cache)
 
 
+def search_many(ids=None, max_workers=None, cache=True):
+    """
+    Get many OBIS node records at once.
+
+    :param ids: [Array] Node UUIDs. Default: all nodes (a single request)
+    :param max_workers: [Fixnum] Maximum number of concurrent requests.
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :return: A dictionary of pandas DataFrames, `nodes` with one row per node
+        and `contacts` with one row per contact and a `node_id` column
+
+    Usage::
+
+        from pyobis import nodes
+        tables = nodes.search_many()
+        tables["nodes"]
+        tables["contacts"]
+    """
+    if ids is None:
+        return _tables(search(cache=cache).execute()["results"], "nodes")
+    results = _run_many(lambda id: search(id, cache=cache), ids, max_workers)
+    return _tables(results, "nodes")
+
+
+def activities_many(ids=None, max_workers=None, cache=True):
+    """
+    Get the activities of many OBIS nodes at once.
+
+    Activities shared by several nodes are listed once, with one contribution
+    per node.
+
+    :param ids: [Array] Node UUIDs. Default: all nodes
+    :param max_workers: [Fixnum] Maximum number of concurrent requests.
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :return: A dictionary of pandas DataFrames, `activities` with one row per
+        activity and `contributions` with one row per contribution, with the
+        `activity_id` and `node_id` columns
+
+    Usage::
+
+        from pyobis import nodes
+        tables = nodes.activities_many()
+        tables["contributions"].groupby("node").size()
+    """
+    if ids is None:
+        ids = [node["id"] for node in search(cache=cache).execute()["results"]]
+    results = _run_many(lambda id: activities(id, cache=cache), ids, max_workers)
+    return _tables(results, "activities")
+
+
+def _run_many(query, ids, max_workers=None):
+    """
+    Execute one query per node concurrently, returning the records of all of
+    them without duplicates. Failing nodes are logged and left out.
+    """
+    ids = [*dict.fromkeys(ids)]
+    responses = obis_map(
+        lambda id: query(id).execute()["results"],
+        ids,
+        max_workers=max_workers,
+        return_exceptions=True,
+    )
+    records = {}
+    for id, res in zip(ids, responses):
+        if isinstance(res, Exception):
+            logger.warning(f"Request failed for node {id}: {res}")
+            continue
+        for record in res:
+            records.setdefault(record["id"], record)
+    return [*records.values()]
+
+
+def _tables(results, name):
+    """
+    Normalize node or activity records in a single pass, into a table of the
+    records and long tables of their nested contacts and contributions.
+    """
+    rows, nested = [], {}
+    for record in results:
+        row = {}
+        for key, value in record.items():
+            if key in _NESTED:
+                nested.setdefault(key, []).extend(
+                    {_NESTED[key]: record["id"], **item} for item in value or []
+                )
+            else:
+                row[key] = value
+        rows.append(row)
+    tables = {name: pd.DataFrame(rows)}
+    for key, items in nested.items():
+        tables[key] = (
+            pd.DataFrame(items) if items else pd.DataFrame(columns=[_NESTED[key]])
+        )
+    return tables
+
+
 class NodesResponse:
     """
     An OBIS Nodes Response Class
@@ -91,21 +194,31 @@ class NodesResponse:
         self.data = out
         return self.data
 
-    def to_pandas(self):
+    def to_tables(self):
         """
-        Convert fetched data to a pandas DataFrame
+        Normalize the fetched data into a dictionary of pandas DataFrames: the
+        `nodes` (or `activities`) table, and the long `contacts` (or
+        `contributions`) table keyed by `node_id` (or `activity_id`).
         """
-        if "contacts" in self.data["results"][0].keys():
-            return pd.merge(
-                pd.DataFrame(self.data["results"]),
-                pd.json_normalize(self.data["results"], "contacts", "id"),
-                on="id",
-                how="inner",
-            ).drop("contacts", axis=1)
+        name = "activities" if self.__url.endswith("/activities") else "nodes"
+        return _tables(self.data["results"], name)
 
+    def to_pandas(self):
+        """
+        Convert fetched data to a pandas DataFrame, with one row per contact
+        (or contribution). Nodes without contacts are kept, with missing
+        contact columns.
+        """
+        tables = self.to_tables()
+        records = tables.pop("activities", None)
+        if records is None:
+            records = tables.pop("nodes")
+        if not tables:
+            return records
+        (key, long), *_ = tables.items()
         return pd.merge(
-            pd.DataFrame(self.data["results"]),
-            pd.json_normalize(self.data["results"], "contributions", "id"),
+            records,
+            long.rename(columns={_NESTED[key]: "id"}),
             on="id",
-            how="inner",
-        ).drop("contributions", axis=1)
+            how="left",
+        )
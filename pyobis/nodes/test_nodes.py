@@ -109,3 +109,59 @@ def test_cache_parameter_functionality():
     assert query_activities_no_cache.data is not None
     assert "dict" == query_activities_cache.data.__class__.__name__
     assert "dict" == query_activities_no_cache.data.__class__.__name__
+
+
+def test_nodes_many(obis_api):
+    """
+    nodes.search_many, nodes.activities_many - concurrent requests normalized
+    into long tables, keeping nodes without contacts
+    """
+    from pyobis.nodes import nodes as nodes_module
+
+    all_nodes = [
+        {"id": "a", "name": "A", "contacts": [{"surname": "X"}, {"surname": "Y"}]},
+        {"id": "b", "name": "B", "contacts": []},
+    ]
+    shared = {
+        "id": "act1",
+        "title": "Shared",
+        "contributions": [
+            {"node_id": "a", "node": "A"},
+            {"node_id": "b", "node": "B"},
+        ],
+    }
+    own = {
+        "id": "act2",
+        "title": "Own",
+        "contributions": [{"node_id": "a", "node": "A"}],
+    }
+
+    def respond(url, args):
+        """Nodes, and the activities of nodes a and b."""
+        if url.endswith("/node"):
+            return {"total": 2, "results": all_nodes}
+        if url.endswith("a/activities"):
+            return {"total": 2, "results": [shared, own]}
+        if url.endswith("b/activities"):
+            return {"total": 1, "results": [shared]}
+        node = [n for n in all_nodes if url.endswith(n["id"])]
+        return {"total": len(node), "results": node}
+
+    obis_api.serve(nodes_module, respond)
+
+    tables = nodes.search_many(["a", "b", "a"])
+    assert list(tables["nodes"]["id"]) == ["a", "b"]
+    assert "contacts" not in tables["nodes"].columns
+    assert list(tables["contacts"]["node_id"]) == ["a", "a"]
+    assert nodes.search_many()["nodes"].equals(tables["nodes"])
+    assert nodes.search().mapper_url is None
+
+    query = nodes.search("b")
+    query.execute()
+    assert list(query.to_pandas()["id"]) == ["b"]
+    assert query.mapper_url == "https://mapper.obis.org/?nodeid=b"
+
+    tables = nodes.activities_many()
+    assert list(tables["activities"]["id"]) == ["act1", "act2"]
+    assert list(tables["contributions"]["activity_id"]) == ["act1", "act1", "act2"]
+    assert list(tables["contributions"]["node_id"]) == ["a", "b", "a"]
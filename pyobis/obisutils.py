@@ -3,12 +3,22 @@ Utility functions for internal use across various modules.
 """
 
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice, product
 from urllib.parse import urlencode
 
 from .cache import get_default_cache
 
 obis_baseurl = "https://api.obis.org/v3/"
 
+# upper bound on the number of requests sent to the API at the same time
+DEFAULT_MAX_WORKERS = 8
+
+# longest comma separated list sent in a single query parameter, longer lists
+# are split into chunks which are fetched as separate queries
+MAX_PARAM_LENGTH = 1500
+
 # export logger, and setup basic configurations
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -77,6 +87,59 @@ def obis_write_disk(url, path, ctype, cache=True, **kwargs):
     return path
 
 
+def obis_map(func, items, max_workers=None, return_exceptions=False):
+    """
+    Apply a function to each item concurrently, preserving the input order.
+
+    Args:
+        func (callable): Function called once per item, typically wrapping obis_GET
+        items (iterable): Items to be passed to `func`
+        max_workers (int, optional): Maximum number of concurrent requests.
+            Defaults to DEFAULT_MAX_WORKERS.
+        return_exceptions (bool, optional): If True, exceptions raised by `func`
+            are returned in place of the result instead of being raised.
+            Defaults to False.
+    """
+    items = list(items)
+    if not items:
+        return []
+    max_workers = min(max_workers or DEFAULT_MAX_WORKERS, len(items))
+
+    def call(item):
+        try:
+            return func(item)
+        except Exception as e:
+            if return_exceptions:
+                return e
+            raise
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(call, items))
+
+
+def obis_imap(func, items, max_workers=None):
+    """
+    Lazy variant of obis_map, yielding the results in the input order as they
+    become available, with at most `max_workers` calls pending at any time.
+
+    Args:
+        func (callable): Function called once per item, typically wrapping obis_GET
+        items (iterable): Items to be passed to `func`
+        max_workers (int, optional): Maximum number of concurrent requests.
+            Defaults to DEFAULT_MAX_WORKERS.
+    """
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque(
+            executor.submit(func, item) for item in islice(items, max_workers)
+        )
+        while pending:
+            result = pending.popleft().result()
+            pending.extend(executor.submit(func, item) for item in islice(items, 1))
+            yield result
+
+
 def stopifnot(x, ctype):
     """Check if content type matches expected type."""
     if x != ctype:
@@ -109,3 +172,47 @@ def handle_arrint(x):
         else:
             x = list(map(str, x))
             return ",".join(x)
+
+
+def chunk_arr(x, max_length=None):
+    """
+    Splits array arguments into comma-separated strings of at most `max_length`
+    (default: MAX_PARAM_LENGTH) characters. Returns a single-item list if no
+    split is needed.
+    """
+    max_length = max_length or MAX_PARAM_LENGTH
+    if x is None or isinstance(x, int):
+        return [x]
+    items = x.split(",") if isinstance(x, str) else [str(i) for i in x]
+    chunks, current, length = [], [], -1
+    for item in items:
+        if current and length + 1 + len(item) > max_length:
+            chunks.append(",".join(current))
+            current, length = [], -1
+        current.append(item)
+        length += 1 + len(item)
+    chunks.append(",".join(current))
+    return chunks
+
+
+def chunk_args(max_length=None, **params):
+    """
+    Splits long list arguments into chunks, returning the query parameters of
+    every sub-query (all combinations of the chunks), or None if all of the
+    arguments fit in a single query.
+    """
+    chunks = {k: chunk_arr(v, max_length=max_length) for k, v in params.items()}
+    if all(len(c) == 1 for c in chunks.values()):
+        return None
+    return [dict(zip(chunks, combination)) for combination in product(*chunks.values())]
+
+
+def integer_series(values):
+    """
+    Converts a numeric pandas Series into integers (nullable where values are
+    missing) if all of its values are whole numbers, else returns it unchanged.
+    """
+    whole = values.dropna()
+    if not (whole % 1 == 0).all():
+        return values
+    return values.astype("Int64" if len(whole) < len(values) else "int64")
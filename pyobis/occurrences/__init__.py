@@ -1,14 +1,22 @@
+from .dedup import IdSet
+from .exporter import export
+from .mirror import OccurrenceMirror
 from .occurrences import (
     OccResponse,
     centroid,
+    centroids,
     get,
     getpoints,
     grid,
     lookup_taxon,
     point,
+    query,
     search,
     tile,
 )
+from .planner import ExtractionPlan, plan
+from .pushdown import OccurrenceQuery, col, within
+from .shard import ShardedExtraction
 
 __all__ = [
     "search",
@@ -19,5 +27,16 @@ __all__ = [
     "lookup_taxon",
     "point",
     "centroid",
+    "centroids",
+    "export",
+    "plan",
     "OccResponse",
+    "ExtractionPlan",
+    "ShardedExtraction",
+    "IdSet",
+    "query",
+    "col",
+    "within",
+    "OccurrenceQuery",
+    "OccurrenceMirror",
 ]
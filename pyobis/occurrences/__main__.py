@@ -0,0 +1,8 @@
+"""
+Command line of sharded extractions, e.g.
+`python -m pyobis.occurrences work /shared/extraction`.
+"""
+
+from .shard import main
+
+main()
@@ -0,0 +1,28 @@
+"""Shared fixtures of the occurrence tests"""
+
+import pytest
+
+from pyobis.dataset import dataset as dataset_module
+from pyobis.occurrences import occurrences as occ_module
+
+
+@pytest.fixture
+def serve_datasets(obis_api):
+    """
+    Serve dataset listings and the occurrence searches of every dataset from
+    in-memory records, as `serve_datasets(datasets, records)`.
+    """
+
+    def serve(datasets, records):
+        """Serve the datasets and their records (by `dataset_id`)."""
+        obis_api.serve(
+            dataset_module,
+            lambda url, args: {"total": len(datasets), "results": datasets},
+        )
+        obis_api.serve_records(
+            occ_module,
+            records,
+            match=lambda record, args: record["dataset_id"] == args["datasetid"],
+        )
+
+    return serve
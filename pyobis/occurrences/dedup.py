@@ -0,0 +1,222 @@
+"""
+Compact sets of occurrence ids, to drop the records returned more than once
+when merging overlapping queries (chunked name lists, geometry tiles, or the
+partitions of an extraction plan).
+"""
+
+import hashlib
+import math
+import uuid
+
+import numpy as np
+import pandas as pd
+
+
+def _keys(ids):
+    """
+    Convert ids to 128-bit keys, as two uint64 arrays (high and low halves).
+
+    UUIDs are converted to their 128-bit value. Other ids are hashed to 128
+    bits, which makes collisions practically impossible.
+    """
+    ids = [str(i) for i in ids]
+    if not ids:
+        empty = np.empty(0, dtype=np.uint64)
+        return empty, empty
+    try:
+        # fast path, for canonical UUIDs only
+        if not all(len(i) == 36 for i in ids):
+            raise ValueError
+        data = bytes.fromhex("".join(ids).replace("-", ""))
+        if len(data) != 16 * len(ids):
+            raise ValueError
+    except ValueError:
+        data = b"".join(_key(i) for i in ids)
+    keys = np.frombuffer(data, dtype=">u8").astype(np.uint64).reshape(-1, 2)
+    return keys[:, 0], keys[:, 1]
+
+
+def _key(id):
+    """128-bit key of a single id."""
+    try:
+        return uuid.UUID(id).bytes
+    except ValueError:
+        return hashlib.blake2b(id.encode(), digest_size=16).digest()
+
+
+def _first(hi, lo):
+    """
+    Mask of the first occurrence of every key, in the original order.
+    """
+    order = np.lexsort((lo, hi))
+    hi, lo = hi[order], lo[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (hi[1:] != hi[:-1]) | (lo[1:] != lo[:-1])
+    mask = np.empty(len(order), dtype=bool)
+    # the sort is stable, so the first key of a run comes first in the ids too
+    mask[order] = first
+    return mask
+
+
+def _isin(hi, lo, run_hi, run_lo):
+    """
+    Mask of the keys found in a run of keys sorted by (high, low) halves.
+    """
+    left = np.searchsorted(run_hi, hi, "left")
+    right = np.searchsorted(run_hi, hi, "right")
+    found = np.zeros(len(hi), dtype=bool)
+    single = right - left == 1
+    found[single] = run_lo[left[single]] == lo[single]
+    # keys sharing their high half, which hardly ever happens with UUIDs
+    for i in np.flatnonzero(right - left > 1):
+        found[i] = lo[i] in run_lo[slice(left[i], right[i])]
+    return found
+
+
+class IdSet:
+    """
+    A set of occurrence ids, using 16 bytes of memory per id instead of the
+    100 bytes or so of a Python set of UUID strings.
+
+    Ids are stored as 128-bit integers in sorted NumPy arrays. New ids are
+    added as a sorted run, and runs of similar sizes are merged, so that
+    lookups only search a few runs.
+
+    With a `capacity`, ids are instead recorded in a Bloom filter of
+    about 1.8 bytes per id (for an `error_rate` of 0.001), whatever their
+    number. Duplicates are then always dropped, but a fraction `error_rate`
+    of the new ids is wrongly taken for duplicates (and dropped too) once the
+    filter holds `capacity` ids.
+
+    Usage::
+
+        from pyobis.occurrences import IdSet
+
+        seen = IdSet()
+        for page in query.iter_pages():
+            page = seen.drop_seen(page)
+    """
+
+    def __init__(self, capacity=None, error_rate=0.001):
+        """
+        Initialise an empty set.
+
+        :param capacity: [Fixnum] Expected number of ids, to use a Bloom filter.
+            Default: None (exact set)
+        :param error_rate: [Float] False positive rate of the Bloom filter at
+            `capacity` ids. Default: 0.001
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.__count = 0
+        if capacity:
+            bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+            self.__bits = np.zeros((bits + 7) // 8, dtype=np.uint8)
+            self.__size = np.uint64(bits)
+            self.__hashes = max(1, round(bits / capacity * math.log(2)))
+        else:
+            self.__runs = []
+
+    def __len__(self):
+        """Number of ids added (estimated for Bloom filters)."""
+        return self.__count
+
+    def __contains__(self, id):
+        """Whether an id was added."""
+        hi, lo = _keys([id])
+        return bool(self.__found(hi, lo)[0])
+
+    @property
+    def nbytes(self):
+        """Memory used by the ids, in bytes."""
+        if self.capacity:
+            return self.__bits.nbytes
+        return sum(hi.nbytes + lo.nbytes for hi, lo in self.__runs)
+
+    def __positions(self, hi, lo):
+        """Bit positions of keys in the Bloom filter, by double hashing."""
+        step = lo | np.uint64(1)
+        return [(hi + np.uint64(i) * step) % self.__size for i in range(self.__hashes)]
+
+    def __found(self, hi, lo):
+        """Mask of the keys already in the set."""
+        if self.capacity:
+            found = np.ones(len(hi), dtype=bool)
+            for position in self.__positions(hi, lo):
+                found &= (
+                    self.__bits[position >> np.uint64(3)] >> (position & 7)
+                ) & 1 == 1
+            return found
+        found = np.zeros(len(hi), dtype=bool)
+        for run_hi, run_lo in self.__runs:
+            found |= _isin(hi, lo, run_hi, run_lo)
+        return found
+
+    def __insert(self, hi, lo):
+        """Add keys which are not in the set yet."""
+        self.__count += len(hi)
+        if self.capacity:
+            for position in self.__positions(hi, lo):
+                np.bitwise_or.at(
+                    self.__bits,
+                    position >> np.uint64(3),
+                    (1 << (position & 7)).astype(np.uint8),
+                )
+            return
+        runs = self.__runs
+        runs.append((hi, lo))
+        # merge the last runs while they have similar sizes, which keeps
+        # the number of runs logarithmic in the number of ids
+        while len(runs) > 1 and len(runs[-2][0]) <= 2 * len(runs[-1][0]):
+            (hi1, lo1), (hi2, lo2) = runs.pop(), runs.pop()
+            runs.append((np.concatenate([hi2, hi1]), np.concatenate([lo2, lo1])))
+        order = np.lexsort((runs[-1][1], runs[-1][0]))
+        runs[-1] = (runs[-1][0][order], runs[-1][1][order])
+
+    def add(self, ids):
+        """
+        Add ids to the set.
+
+        :param ids: [Array] Ids, e.g. the `id` column of a page of records
+        :return: A boolean NumPy array, True for the ids which were not in
+            the set yet (only the first of repeated ids counts as new)
+        """
+        hi, lo = _keys(ids)
+        new = _first(hi, lo)
+        new[new] = ~self.__found(hi[new], lo[new])
+        self.__insert(hi[new], lo[new])
+        return new
+
+    def drop_seen(self, df, column="id"):
+        """
+        Drop the records whose id was already added, and add the others.
+
+        Records without an id are always kept.
+
+        :param df: [DataFrame] Records
+        :param column: [String] Column of the ids. Default: `id`
+        :return: The records seen for the first time, as a pandas DataFrame
+        """
+        if column not in df.columns:
+            return df
+        ids = df[column]
+        keep = ids.isna().to_numpy(copy=True)
+        keep[~keep] = self.add(ids[~keep])
+        return df[keep] if not keep.all() else df
+
+
+def drop_duplicates(frames, column="id", **kwargs):
+    """
+    Concatenate frames of records, dropping the records whose id was already
+    returned by a previous frame.
+
+    :param frames: [Iterable] pandas DataFrames
+    :param column: [String] Column of the ids. Default: `id`
+    :param kwargs: Arguments of IdSet, e.g. `capacity` for a Bloom filter
+    :return: A pandas DataFrame
+    """
+    seen = IdSet(**kwargs)
+    kept = [seen.drop_seen(frame, column=column) for frame in frames]
+    if not kept:
+        return pd.DataFrame()
+    return pd.concat(kept, ignore_index=True)
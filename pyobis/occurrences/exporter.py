@@ -0,0 +1,160 @@
+"""
+Bulk export of occurrence records, partitioned by dataset.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from ..obisutils import handle_arrstr, logger, obis_map
+from ..statistics.statistics import facet, summary
+from .mirror import MANIFEST, _default_format, _write_atomic, write_partition
+from .occurrences import search as search_occurrences
+
+# seconds to wait before the first retry of a failed partition, doubled
+# for every following retry
+RETRY_DELAY = 2
+
+
+def export(
+    path,
+    max_workers=None,
+    retries=2,
+    format=None,
+    fields=None,
+    cache=True,
+    datasetid=None,
+    **kwargs,
+):
+    """
+    Export the occurrences matching the filters to a directory, as one file
+    per dataset.
+
+    The contributing datasets and their number of records under the filters
+    are counted with `statistics.facet`, and their records are fetched in
+    parallel, one `occurrences.search(datasetid=...)` per dataset, largest
+    datasets first.
+    Failing partitions are retried on their own, and a manifest records the
+    state of every partition. Running the export again into the same directory
+    only fetches the partitions which are not complete.
+
+    :param path: [String] Directory of the export
+    :param max_workers: [Fixnum] Maximum number of datasets fetched in parallel.
+        Default: obisutils.DEFAULT_MAX_WORKERS
+    :param retries: [Fixnum] Number of retries of a failing partition. Default: 2
+    :param format: [String] Partition format, either 'parquet' or 'csv.gz'.
+        Default: 'parquet' if pyarrow is installed, otherwise 'csv.gz'
+    :param fields: [String] Occurrence fields to export. Default: all fields
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :param datasetid: [String, Array] Only export these datasets. Default: all
+        the datasets with matching records
+    :param kwargs: Filters of `occurrences.search`, e.g. `nodeid` or `geometry`
+
+    :return: A pandas DataFrame with one row per partition, holding the
+        dataset id, the number of matching and fetched records, the file,
+        the status ('done' or 'failed'), the number of attempts and the error
+
+    Usage::
+
+        from pyobis.occurrences import export
+        export(
+            "export",
+            geometry="POLYGON((0 50, 5 50, 5 55, 0 55, 0 50))",
+            max_workers=8,
+        )
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    format = format or _default_format()
+    manifest_path = path / MANIFEST
+    filters = {**kwargs, "datasetid": handle_arrstr(datasetid)} if datasetid else kwargs
+    manifest = {"filters": filters, "partitions": {}}
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous.get("filters") == json.loads(json.dumps(filters)):
+            manifest = previous
+    lock = threading.Lock()
+
+    def write_manifest():
+        def write(tmp):
+            with open(tmp, "w") as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+
+        _write_atomic(manifest_path, write)
+
+    datasets = _dataset_counts(cache=cache, **kwargs)
+    if datasetid:
+        selected = handle_arrstr(datasetid).split(",")
+        datasets = [d for d in datasets if d["id"] in selected]
+    pending = [
+        d
+        for d in datasets
+        if manifest["partitions"].get(d["id"], {}).get("status") != "done"
+        or not (path / manifest["partitions"][d["id"]]["file"]).exists()
+    ]
+    logger.info(
+        f"Exporting {len(pending)} of {len(datasets)} datasets "
+        f"({sum(d['records'] for d in pending)} records).",
+    )
+
+    def run(dataset):
+        file = f"{dataset['id']}.{format}"
+        entry = {"records": dataset["records"], "file": file}
+        for attempt in range(retries + 1):
+            try:
+                df = search_occurrences(
+                    datasetid=dataset["id"],
+                    fields=fields,
+                    cache=cache,
+                    **kwargs,
+                ).execute()
+                write_partition(df, path / file)
+                entry.update(status="done", fetched=len(df), error=None)
+                break
+            except Exception as e:
+                logger.warning(
+                    f"Attempt {attempt + 1} failed for dataset {dataset['id']}: {e}",
+                )
+                entry.update(status="failed", fetched=None, error=str(e))
+                if attempt < retries:
+                    time.sleep(RETRY_DELAY * 2**attempt)
+        entry["attempts"] = attempt + 1
+        with lock:
+            manifest["partitions"][dataset["id"]] = entry
+            write_manifest()
+        return entry
+
+    obis_map(run, pending, max_workers=max_workers)
+    with lock:
+        write_manifest()
+    return pd.DataFrame(
+        [{"dataset_id": id, **entry} for id, entry in manifest["partitions"].items()],
+        columns=[
+            "dataset_id",
+            "records",
+            "fetched",
+            "file",
+            "status",
+            "attempts",
+            "error",
+        ],
+    )
+
+
+def _dataset_counts(cache=True, **kwargs):
+    """
+    Datasets with records matching the filters, as {"id", "records"} dicts
+    of their number of matching records, largest first
+    """
+    datasets = summary(cache=cache, **kwargs).execute()["datasets"] or 0
+    if not datasets:
+        return []
+    counts = facet("datasetid", top=datasets, cache=cache, **kwargs).to_pandas()
+    counts = [
+        {"id": row.key, "records": int(row.records)} for row in counts.itertuples()
+    ]
+    return sorted(counts, key=lambda d: -d["records"])
@@ -0,0 +1,230 @@
+"""
+Local mirror of occurrence records, partitioned by dataset and kept up to date
+incrementally.
+"""
+
+import importlib.util
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from ..dataset.dataset import search as search_datasets
+from ..obisutils import logger, obis_map
+from .occurrences import search as search_occurrences
+
+MANIFEST = "manifest.json"
+
+
+def _default_format():
+    """Parquet if pyarrow is installed, otherwise gzipped CSV."""
+    return "parquet" if importlib.util.find_spec("pyarrow") else "csv.gz"
+
+
+def _write_atomic(path, write):
+    """
+    Write a file through a temporary file in the same directory, replacing the
+    existing file only once it is complete.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def write_partition(df, path):
+    """
+    Atomically write a partition of occurrence records, as Parquet or
+    (gzipped) CSV depending on the file extension.
+    """
+    if str(path).endswith(".parquet"):
+        _write_atomic(path, lambda tmp: df.to_parquet(tmp, index=False))
+    else:
+        # the compression is not inferred from the name of the temporary file
+        compression = "gzip" if str(path).endswith(".gz") else None
+        _write_atomic(
+            path,
+            lambda tmp: df.to_csv(tmp, index=False, compression=compression),
+        )
+
+
+def read_partition(path):
+    """Read a partition written by `write_partition`."""
+    if str(path).endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, low_memory=False)
+
+
+class OccurrenceMirror:
+    """
+    Local mirror of the occurrence records of a node (or of any set of
+    datasets), stored as one file per dataset.
+
+    A manifest keeps the `updated` timestamp and record count of every
+    mirrored dataset. `sync` lists the datasets with `dataset.search`, and only
+    re-fetches the datasets which changed since the last sync, replacing their
+    partitions atomically.
+
+    Usage::
+
+        from pyobis.occurrences.mirror import OccurrenceMirror
+
+        mirror = OccurrenceMirror("eurobis", nodeid="4bf79a01-65a9-4db6-b37b-18434f26ddfc")
+        mirror.sync()
+        mirror.to_pandas()
+    """
+
+    def __init__(self, path, format=None, fields=None, **filters):
+        """
+        Open (or create) a mirror.
+
+        :param path: [String] Directory of the mirror
+        :param format: [String] Partition format, either 'parquet' or 'csv.gz'.
+            Default: 'parquet' if pyarrow is installed, otherwise 'csv.gz'
+        :param fields: [String] Occurrence fields to mirror. Default: all fields
+        :param filters: Filters passed to both `dataset.search` and
+            `occurrences.search`, e.g. `nodeid`
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.format = format or _default_format()
+        self.fields = fields
+        self.filters = filters
+
+        # private members
+        self.__lock = threading.Lock()
+        self.__manifest = self.__read_manifest()
+
+    def __read_manifest(self):
+        """Read the manifest, or start an empty one."""
+        path = self.path / MANIFEST
+        if not path.exists():
+            return {"datasets": {}}
+        with open(path) as f:
+            return json.load(f)
+
+    def __write_manifest(self):
+        """Atomically write the manifest (the lock must be held)."""
+
+        def write(tmp):
+            with open(tmp, "w") as f:
+                json.dump(self.__manifest, f, indent=1, sort_keys=True)
+
+        _write_atomic(self.path / MANIFEST, write)
+
+    @property
+    def manifest(self):
+        """The mirrored datasets, with their `updated`, `records` and `file`."""
+        with self.__lock:
+            return json.loads(json.dumps(self.__manifest["datasets"]))
+
+    def sync(self, max_workers=None, cache=False):
+        """
+        Bring the mirror up to date.
+
+        Datasets whose `updated` timestamp or record count changed are
+        re-fetched, concurrently, and their partitions replaced. Datasets which
+        are no longer listed are removed. The manifest is written after every
+        dataset, so an interrupted sync resumes where it stopped.
+
+        :param max_workers: [Fixnum] Maximum number of datasets fetched concurrently.
+        :param cache: [bool, optional] Whether to use the HTTP cache. Defaults to
+            False, to see the latest updates.
+        :return: A dictionary with the number of datasets added, updated,
+            removed, unchanged and failed
+        """
+        listing = search_datasets(cache=cache, **self.filters).execute()["results"]
+        stored = self.manifest
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+
+        changed = []
+        for dataset in listing:
+            entry = stored.get(dataset["id"])
+            if entry and (entry["updated"], entry["records"]) == (
+                dataset.get("updated"),
+                dataset.get("records"),
+            ):
+                counts["unchanged"] += 1
+            else:
+                changed.append((dataset, "updated" if entry else "added"))
+
+        listed = {dataset["id"] for dataset in listing}
+        for id in stored:
+            if id not in listed:
+                self.__remove(id)
+                counts["removed"] += 1
+
+        logger.info(f"Fetching {len(changed)} changed datasets.")
+        results = obis_map(
+            lambda item: self.__fetch(item[0], cache=cache),
+            changed,
+            max_workers=max_workers,
+            return_exceptions=True,
+        )
+        for (dataset, status), res in zip(changed, results):
+            if isinstance(res, Exception):
+                logger.warning(f"Failed to mirror dataset {dataset['id']}: {res}")
+                counts["failed"] += 1
+            else:
+                counts[status] += 1
+        return counts
+
+    def __fetch(self, dataset, cache=False):
+        """Fetch the records of a dataset and replace its partition."""
+        df = search_occurrences(
+            datasetid=dataset["id"],
+            fields=self.fields,
+            cache=cache,
+            **self.filters,
+        ).execute()
+        file = f"{dataset['id']}.{self.format}"
+        write_partition(df, self.path / file)
+        with self.__lock:
+            previous = self.__manifest["datasets"].get(dataset["id"], {}).get("file")
+            self.__manifest["datasets"][dataset["id"]] = {
+                "updated": dataset.get("updated"),
+                "records": dataset.get("records"),
+                "fetched": len(df),
+                "file": file,
+                "synced": datetime.now(timezone.utc).isoformat(),
+            }
+            self.__write_manifest()
+        if previous and previous != file:
+            (self.path / previous).unlink(missing_ok=True)
+        return len(df)
+
+    def __remove(self, id):
+        """Remove a dataset from the mirror."""
+        with self.__lock:
+            entry = self.__manifest["datasets"].pop(id)
+            self.__write_manifest()
+        (self.path / entry["file"]).unlink(missing_ok=True)
+
+    def partitions(self):
+        """
+        Get the partition files of the mirrored datasets.
+
+        :return: A dictionary of file paths by dataset id
+        """
+        return {id: self.path / entry["file"] for id, entry in self.manifest.items()}
+
+    def iter_partitions(self):
+        """
+        Read the mirrored datasets one at a time, yielding pandas DataFrames.
+        """
+        for path in self.partitions().values():
+            yield read_partition(path)
+
+    def to_pandas(self):
+        """
+        Read all the mirrored records into a single pandas DataFrame.
+        """
+        frames = [*self.iter_partitions()]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -7,17 +7,35 @@ import warnings
 from time import time
 from urllib.parse import urlencode
 
+import numpy as np
 import pandas as pd
 import requests
 
+from ..checklist.local import build as build_checklist
 from ..obisutils import (
     build_api_url,
+    chunk_args,
     handle_arrint,
     handle_arrstr,
     logger,
     obis_baseurl,
     obis_GET,
+    obis_map,
 )
+from ..spatial import GridIndex, contains, cover_wkt, parse_wkt, split_wkt
+from ..spatial.spatial import _box_wkt, _clip_wkt
+from ..statistics.statistics import facet, summary, years
+from ..taxa.autocomplete import get_default_prefix_index
+from ..taxa.taxa import resolve_taxonids
+from .dedup import IdSet, drop_duplicates
+
+# geohash precision of the strata of `search(stratify_by="geohash")`
+SAMPLE_GEOHASH_PRECISION = 2
+# the API only pages with `offset` within the first 10,000 records
+MAX_SAMPLE_OFFSET = 10000
+# maximum number of records of the pages of a sample, several pages at random
+# positions spread the sample of a stratum across its records
+SAMPLE_PAGE_SIZE = 500
 
 
 class OccResponse:
@@ -25,7 +43,18 @@ class OccResponse:
     An OBIS Occurrence response class
     """
 
-    def __init__(self, url, args, isSearch, hasMapper, isKML, cache=True):
+    def __init__(
+        self,
+        url,
+        args,
+        isSearch,
+        hasMapper,
+        isKML,
+        cache=True,
+        geometry_filter=None,
+        subqueries=None,
+        total_records=None,
+    ):
         """
         Initialise the object parameters
         """
@@ -36,6 +65,7 @@ class OccResponse:
             if not args["taxonid"] and args["scientificname"]:
                 args["taxonid"] = get_taxonids_for_scientific_names(
                     args["scientificname"],
+                    cache=cache,
                 )
 
             self.mapper_url = (
@@ -52,9 +82,15 @@ class OccResponse:
         self.__isSearch = isSearch
         self.__isKML = isKML
         self.__cache = cache
+        self.__geometry_filter = geometry_filter
+        self.__subqueries = subqueries
 
         # fetch the total length of records
-        if not self.__isKML:
+        # (sub-queries fetch their own totals once executed, unless known)
+        if total_records is not None:
+            self.__total_records = total_records
+            self.__out_head_record = {"results": []}
+        elif not self.__isKML and not self.__subqueries:
             starting_time = time()
             self.__out_head_record = obis_GET(
                 self.__url,
@@ -102,77 +138,19 @@ class OccResponse:
             out = out.content
             self.data = out
 
+        elif self.__isSearch and self.__subqueries:
+            return self.__execute_subqueries(**kwargs)
+
         elif self.__isSearch:
-            # setting default parameters from arguments list
             mof = self.__args["mof"]
-            size = self.__args["size"]
-
-            size = (
-                self.__total_records if not size else size
-            )  # if the user has set some size or else we fetch all the records
-
-            outdf = pd.DataFrame(
-                columns=pd.DataFrame(self.__out_head_record["results"]).columns,
-            )
-
-            for i in range(10000, size + 1, 10000):
-                # if there is no 'id' then there should be no pagination
-                if "id" not in outdf.columns:
-                    break
-                self.__args["size"] = 10000
-                logger.info(
-                    "{}[{}{}] {}/{}".format(
-                        "Fetching: ",
-                        "█" * int((i - 1) * 100 / size),
-                        "." * (100 - int((i + 1) * 100 / size)),
-                        i,
-                        size,
-                    ),
-                )
-                res = obis_GET(
-                    self.__url,
-                    self.__args,
-                    "application/json; charset=utf-8",
-                    cache=self.__cache,
-                    **kwargs,
-                )
-                outdf = pd.concat(
-                    [
-                        outdf if len(outdf) else None,
-                        pd.DataFrame(res["results"]).infer_objects(),
-                    ],
-                    ignore_index=True,
+            pages = [*self.iter_pages(**kwargs)]
+            if pages:
+                outdf = pd.concat(pages, ignore_index=True)
+            else:
+                outdf = pd.DataFrame(
+                    columns=pd.DataFrame(self.__out_head_record["results"]).columns,
                 )
-                # make sure that we set the `after` parameter when fetching subsequent records
-                self.__args["after"] = outdf["id"].iloc[-1]
-
-            self.__args["size"] = size % 10000
-            # we have already fetched records as a set of 5000 records each time,
-            # now we need to get remaining records from the total
-            logger.info(
-                "{}[{}{}] {}/{}".format(
-                    "Fetching: ",
-                    "\u2588" * 100,
-                    "." * 0,
-                    size,
-                    size,
-                ),
-            )
-            res = obis_GET(
-                self.__url,
-                self.__args,
-                "application/json; charset=utf-8",
-                cache=self.__cache,
-                **kwargs,
-            )
-            outdf = pd.concat(
-                [
-                    outdf if len(outdf) else None,
-                    pd.DataFrame(res["results"]).infer_objects(),
-                ],
-                ignore_index=True,
-            )
-            logger.info(f"Fetched {size} records.")
+            logger.info(f"Fetched {len(outdf)} records.")
 
             if mof and self.__total_records > 0:
                 mofNormalized = pd.json_normalize(
@@ -199,6 +177,167 @@ class OccResponse:
 
         return self.data
 
+    def iter_pages(self, **kwargs):
+        """
+        Fetch the records of a search query page by page.
+
+        Yields one pandas DataFrame per page of (at most) 10,000 records, so the
+        results can be processed as they arrive without holding all of them
+        in memory. The data attribute is not set, and MeasurementOrFact
+        records are not normalized.
+
+        Usage::
+
+            from pyobis import occurrences
+            query = occurrences.search(scientificname="Mola mola")
+            for page in query.iter_pages():
+                print(len(page))
+        """
+        if not self.__isSearch:
+            raise ValueError("iter_pages is only available for search queries.")
+
+        if self.__subqueries:
+            seen = IdSet()
+            for overrides in self.__subqueries:
+                for page in self.__subquery(overrides).iter_pages(**kwargs):
+                    yield seen.drop_seen(page)
+            return
+
+        # if the user has set some size or else we fetch all the records
+        size = self.__args["size"] or self.__total_records
+        args = {**self.__args}
+        fetched = 0
+        while fetched < size:
+            args["size"] = min(10000, size - fetched)
+            res = obis_GET(
+                self.__url,
+                args,
+                "application/json; charset=utf-8",
+                cache=self.__cache,
+                **kwargs,
+            )
+            page = pd.DataFrame(res["results"]).infer_objects()
+            fetched += len(page)
+            logger.info(
+                "{}[{}{}] {}/{}".format(
+                    "Fetching: ",
+                    "\u2588" * int(fetched * 100 / size),
+                    "." * (100 - int(fetched * 100 / size)),
+                    fetched,
+                    size,
+                ),
+            )
+            # stop once a page comes back short, or if there is no 'id'
+            # to continue from, since then there should be no pagination
+            last_page = len(page) < args["size"] or "id" not in page.columns
+            if len(page):
+                # make sure that we set the `after` parameter when fetching
+                # subsequent records, before filtering the page
+                args["after"] = page["id"].iloc[-1] if "id" in page.columns else None
+                yield self.__filter_geometry(page)
+            if last_page:
+                break
+
+    def __filter_geometry(self, df):
+        """
+        Apply the exact geometry on the returned coordinates, for queries
+        which were sent with a cover of the geometry
+        """
+        if not self.__geometry_filter or not len(df):
+            return df
+        return df[
+            contains(
+                self.__geometry_filter,
+                df["decimalLongitude"],
+                df["decimalLatitude"],
+            )
+        ].reset_index(drop=True)
+
+    def __subquery(self, overrides):
+        """
+        Query of a sub-query. The pages of samples set their size, which is
+        then fetched without requesting the total first.
+        """
+        return OccResponse(
+            self.__url,
+            {**self.__args, **overrides},
+            isSearch=True,
+            hasMapper=False,
+            isKML=False,
+            cache=self.__cache,
+            geometry_filter=self.__geometry_filter,
+            total_records=overrides.get("size"),
+        )
+
+    def __execute_subqueries(self, **kwargs):
+        """
+        Run the sub-queries concurrently and merge their results, dropping
+        records returned by more than one sub-query
+        """
+        size = self.__args["size"]
+
+        def run(overrides):
+            """Execute a sub-query."""
+            return self.__subquery(overrides).execute(**kwargs)
+
+        logger.info(f"Running {len(self.__subqueries)} sub-queries.")
+        outdf = drop_duplicates(obis_map(run, self.__subqueries))
+        if size:
+            # every sub-query was limited to `size` records, so keep
+            # the first `size` records of the merged results
+            if "id" in outdf.columns:
+                outdf = outdf[
+                    outdf["id"].isin(outdf["id"].drop_duplicates().iloc[:size])
+                ].reset_index(drop=True)
+            else:
+                outdf = outdf.iloc[:size]
+        logger.info(f"Fetched {len(outdf)} records.")
+
+        self.data = {"total": len(outdf), "results": outdf}
+        return self.data["results"]
+
+    def spatial_index(self, cell_size=1.0):
+        """
+        Build a spatial index over the coordinates of the fetched records.
+
+        The index answers bulk `within(polygons)` and `nearest(x, y)` queries
+        with row positions into the results, e.g. `df.iloc[index.within(wkt)]`.
+
+        :param cell_size: [float] Size of the grid cells in degrees. Default: 1
+        :return: A pyobis.spatial.GridIndex
+        """
+        if not self.__isSearch or self.data is None:
+            raise ValueError(
+                "spatial_index is only available for executed occurrences.search queries.",
+            )
+        return GridIndex.from_frame(self.data["results"], cell_size=cell_size)
+
+    def checklist(self, taxon="aphiaID"):
+        """
+        Build a checklist from the occurrence records of the query, with the
+        schema of `checklist.list`, instead of fetching it from the checklist API.
+
+        Uses the fetched records if the query has been executed, otherwise the
+        records are fetched page by page without being kept.
+
+        :param taxon: [String] Column holding the integer taxon ids. Default: `aphiaID`
+        :return: A pandas DataFrame with one row per taxon
+
+        Usage::
+
+            from pyobis import occurrences
+            query = occurrences.search(
+                geometry="POLYGON((0 50, 5 50, 5 55, 0 55, 0 50))",
+            )
+            query.execute()
+            query.checklist()
+        """
+        if not self.__isSearch:
+            raise ValueError(
+                "checklist is only available for occurrences.search queries.",
+            )
+        return build_checklist(self, taxon=taxon)
+
     def to_pandas(self):
         """
         Convert the results into a pandas DataFrame
@@ -214,6 +353,108 @@ class OccResponse:
         return pd.DataFrame(self.data["results"])
 
 
+def _strata(stratify_by, filters, cache=True):
+    """
+    Strata of the records of a query, as (filters, number of records) pairs
+    """
+    if stratify_by is None:
+        return [({}, summary(cache=cache, **filters).execute()["records"] or 0)]
+    if stratify_by == "year":
+        strata = []
+        for item in years(cache=cache, **filters).execute():
+            # the strata stay within the dates of the query
+            start = max(f"{item['year']}-01-01", filters["startdate"] or "")
+            end = min(f"{item['year']}-12-31", filters["enddate"] or "9999")
+            strata.append(({"startdate": start, "enddate": end}, item["records"]))
+        return strata
+    if stratify_by == "dataset":
+        # counts of the datasets under the filters, not their total records
+        datasets = summary(cache=cache, **filters).execute()["datasets"] or 0
+        if not datasets:
+            return []
+        counts = facet("datasetid", top=datasets, cache=cache, **filters).to_pandas()
+        return [
+            ({"datasetid": row.key}, int(row.records)) for row in counts.itertuples()
+        ]
+    if stratify_by == "geohash":
+        url = obis_baseurl + f"occurrence/grid/{SAMPLE_GEOHASH_PRECISION}"
+        grid = obis_GET(url, filters, "application/json; charset=utf-8", cache=cache)
+        strata = []
+        for cell in grid["features"]:
+            points = np.asarray(cell["geometry"]["coordinates"][0], dtype=float)
+            box = (*points.min(axis=0), *points.max(axis=0))
+            # the cells are counted within the query geometry, so they are
+            # fetched within it too
+            if filters["geometry"]:
+                geometry = _clip_wkt(filters["geometry"], box)
+            else:
+                geometry = _box_wkt(box)
+            if geometry:
+                strata.append(({"geometry": geometry}, cell["properties"]["n"]))
+        return strata
+    raise ValueError("stratify_by must be one of 'year', 'dataset' or 'geohash'")
+
+
+def _allocate(counts, sample):
+    """
+    Split a sample across strata in proportion to their number of records
+    (largest remainder method)
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.sum() <= sample:
+        return counts
+    quotas = counts * sample / counts.sum()
+    sizes = np.floor(quotas).astype(np.int64)
+    remainder = sample - sizes.sum()
+    sizes[np.argsort(sizes - quotas, kind="stable")[:remainder]] += 1
+    return sizes
+
+
+def _sample_pages(size, records, rng):
+    """
+    Pages (offset, size) of a sample of `size` records of a stratum: pages of at
+    most SAMPLE_PAGE_SIZE records at distinct random positions, which the API
+    only supports within the first 10,000 records of the stratum
+    """
+    window = min(records, MAX_SAMPLE_OFFSET)
+    if not size or not window:
+        return []
+    count = -(-size // SAMPLE_PAGE_SIZE)
+    page_size = -(-size // count)
+    slots = window // page_size
+    if size >= window or slots < count:
+        # (nearly) the whole window is sampled
+        size = min(size, window)
+        return [
+            (offset, min(SAMPLE_PAGE_SIZE, size - offset))
+            for offset in range(0, size, SAMPLE_PAGE_SIZE)
+        ]
+    # the slots of the window do not overlap, so neither do the pages
+    offsets = np.sort(rng.choice(slots, count, replace=False)) * page_size
+    sizes = np.full(count, page_size)
+    sizes[: count * page_size - size] -= 1
+    return [(int(o), int(n)) for o, n in zip(offsets, sizes)]
+
+
+def _sample_subqueries(sample, stratify_by, filters, cache=True, seed=0):
+    """
+    Sub-queries fetching a stratified sample of the records of a query, one
+    per page of the sample
+    """
+    strata = _strata(stratify_by, filters, cache=cache)
+    sizes = _allocate([records for _, records in strata], sample)
+    rng = np.random.default_rng(seed)
+    subqueries = []
+    for (overrides, records), size in zip(strata, sizes):
+        for offset, page_size in _sample_pages(int(size), int(records), rng):
+            subqueries.append({**overrides, "size": page_size, "offset": offset})
+    logger.info(
+        f"Sampling {sum(sizes)} records from {len(strata)} strata "
+        f"in {len(subqueries)} pages.",
+    )
+    return subqueries
+
+
 def get(id, cache=True, **kwargs):
     """
     Get an OBIS occurrence
@@ -263,6 +504,11 @@ def search(
     mof=False,
     hasextensions=None,
     cache=True,
+    geometry_cover=None,
+    split_geometry=None,
+    sample=None,
+    stratify_by=None,
+    seed=0,
     **kwargs,
 ):
     """
@@ -300,8 +546,46 @@ def search(
     :param hasextensions: [String] Extensions that need to be present
         (e.g. MeasurementOrFact, DNADerivedData).
     :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :param geometry_cover: [String] Send a simplified cover of `geometry` to the
+        API instead of the geometry itself, and apply the exact geometry locally
+        on the returned coordinates. Either 'bbox' (bounding box, snapped outwards
+        to 0.1 degrees) or 'hull' (convex hull). Useful for detailed polygons,
+        which are slow to query and hardly ever cached. A WKT polygon can also
+        be given, e.g. a tile of an extraction plan, to fetch only the part of
+        `geometry` within it. When `size` is set, it limits the records fetched
+        with the cover, before the exact filtering.
+        Default: None (send the geometry as is)
+    :param split_geometry: [Boolean, Fixnum] Split `geometry` into tiles of
+        roughly equal area, fetched as concurrent sub-queries and merged
+        without duplicates. Polygons crossing the antimeridian (e.g.
+        POLYGON((170 -10, -170 -10, -170 10, 170 10, 170 -10))) are split
+        at 180 degrees. Set to True for 16 tiles, or to the number of tiles.
+        When `size` is set, every sub-query is limited to `size` records and
+        the first `size` merged records are kept. Cannot be combined with
+        `geometry_cover`.
+        Default: None (single query)
+    :param sample: [Fixnum] Fetch a sample of about `sample` records instead of
+        all the records. The sample is allocated across the strata of
+        `stratify_by` in proportion to their number of records under the
+        filters. The sample of every stratum is fetched as pages of at most
+        500 records at random positions among its first 10,000 records (the
+        API does not page further with an offset), concurrently. A stratum
+        sampled with 10,000 records or more is therefore fetched in full up to
+        that limit, so large samples need strata. The positions are drawn with
+        `seed`, so the same query returns the same (cached) sample.
+        Cannot be combined with `size` or `split_geometry`.
+        Default: None (all records)
+    :param stratify_by: [String] Strata of the sample: 'year', 'dataset' or
+        'geohash' (cells of geohash precision 2, within `geometry`).
+        Default: None (a single stratum)
+    :param seed: [Fixnum] Seed of the random positions of the sample pages, or
+        None for a different sample every time. Default: 0
     :return: A dictionary
 
+    Long lists of `scientificname` or `taxonid` are split into chunks of at most
+    `obisutils.MAX_PARAM_LENGTH` characters, which are fetched as concurrent
+    sub-queries and merged without duplicate records.
+
     Usage::
 
         from pyobis import occurrences
@@ -336,12 +620,31 @@ def search(
             size=20
         ).execute()
 
+        # Query a detailed polygon through its bounding box
+        occurrences.search(
+            geometry='POLYGON((30.1 10.1, 10 20, 20 40, 40 40, 30.1 10.1))',
+            geometry_cover='bbox',
+        ).execute()
+
+        # Split a Pacific-spanning polygon into parallel sub-queries
+        occurrences.search(
+            geometry='POLYGON((150 -40, -120 -40, -120 40, 150 40, 150 -40))',
+            split_geometry=8,
+        ).execute()
+
+        # 10,000 records spread over the years, fetched in one round of small pages
+        occurrences.search(taxonid=1363, sample=10000, stratify_by="year").execute()
+
         # Get mof response as a pandas dataframe
         occurrences.search(
             scientificname="Abra", mof=True, hasextensions="MeasurementOrFact", size=100
             ).execute()
     """  # noqa: E501
     url = obis_baseurl + "occurrence"
+    # long name and taxon lists are split into sub-queries, which always set
+    # both parameters so that the taxonids resolved for the mapper url are
+    # not sent along with every chunk
+    list_subqueries = chunk_args(scientificname=scientificname, taxonid=taxonid)
     scientificname = handle_arrstr(scientificname)
     taxonid = handle_arrint(taxonid)
     if fields and "id" not in fields:
@@ -349,6 +652,62 @@ def search(
             "You have specified custom fields but 'id' is not included. \
             Include 'id' explicitly in the fields or else only upto 10,000 records will be fetched.",
         )
+    geometry_filter, subqueries = None, None
+    if geometry_cover and split_geometry:
+        raise ValueError("geometry_cover cannot be combined with split_geometry")
+    if geometry and split_geometry:
+        geometry_filter = geometry
+        tiles = 16 if split_geometry is True else split_geometry
+        subqueries = [{"geometry": tile} for tile in split_wkt(geometry, tiles=tiles)]
+    elif geometry and geometry_cover:
+        geometry_filter = geometry
+        if geometry_cover in ("bbox", "hull"):
+            geometry = cover_wkt(geometry, method=geometry_cover)
+        else:
+            # raises for anything else than a WKT polygon
+            parse_wkt(geometry_cover)
+            geometry = geometry_cover
+    if list_subqueries:
+        subqueries = [
+            {**tile, **chunk}
+            for tile in subqueries or [{}]
+            for chunk in list_subqueries
+        ]
+    if sample:
+        if size or subqueries:
+            raise ValueError(
+                "sample cannot be combined with size, split_geometry or long name lists",
+            )
+        if stratify_by == "geohash" and geometry and not geometry_filter:
+            # the strata are sent as the parts of the geometry in every cell
+            # (without the holes they cut), the exact geometry is applied locally
+            geometry_filter = geometry
+        filters = {
+            "taxonid": taxonid,
+            "nodeid": nodeid,
+            "datasetid": datasetid,
+            "scientificname": scientificname,
+            "startdate": startdate,
+            "enddate": enddate,
+            "startdepth": startdepth,
+            "enddepth": enddepth,
+            "geometry": geometry,
+            "flags": flags,
+            "hasextensions": hasextensions,
+            **kwargs,
+        }
+        subqueries = _sample_subqueries(sample, stratify_by, filters, cache, seed)
+    # coordinates are needed to apply the exact geometry locally
+    if geometry_filter and fields:
+        fields = ",".join(
+            dict.fromkeys(
+                [
+                    *handle_arrstr(fields).split(","),
+                    "decimalLongitude",
+                    "decimalLatitude",
+                ],
+            ),
+        )
     args = {
         "taxonid": taxonid,
         "nodeid": nodeid,
@@ -374,6 +733,8 @@ def search(
         hasMapper=True,
         isKML=False,
         cache=cache,
+        geometry_filter=geometry_filter,
+        subqueries=subqueries,
     )
 
 
@@ -819,11 +1180,112 @@ def centroid(
     )
 
 
-def lookup_taxon(scientificname):
+def centroids(by="taxonid", values=None, max_workers=None, cache=True, **kwargs):
+    """
+    Determine the centroids for many taxa, datasets or nodes at once.
+
+    One centroid request is sent per distinct key, and the requests are run
+    concurrently. Scientific names resolving to the same taxon share a single
+    request. A failing key does not abort the batch; its error message is
+    reported in the `error` column instead.
+
+    :param by: [string] Field the values refer to, one of `taxonid`,
+        `scientificname`, `datasetid` or `nodeid`. Default: `taxonid`
+    :param values: [Array] Keys to compute the centroids for.
+    :param max_workers: [integer] Maximum number of concurrent requests.
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :param kwargs: Any other filter accepted by `occurrences.centroid`,
+        applied to every key.
+
+    :return: A pandas DataFrame indexed by key with `lat`, `lon` and `error` columns
+
+    Usage::
+
+        from pyobis import occurrences
+        occurrences.centroids(by="taxonid", values=[127405, 141433])
+        occurrences.centroids(
+            by="scientificname",
+            values=["Mola mola", "Abra alba"],
+            startdate="2000-01-01",
+        )
+    """
+    if by not in ("taxonid", "scientificname", "datasetid", "nodeid"):
+        raise ValueError(
+            "by must be one of 'taxonid', 'scientificname', 'datasetid' or 'nodeid'",
+        )
+    if values is None:
+        raise ValueError("values must contain at least one key")
+    if isinstance(values, (str, int)):
+        values = [values]
+
+    url = obis_baseurl + "occurrence/centroid"
+    keys = [*dict.fromkeys(values)]
+
+    # map every key onto the query parameter actually sent to the API, so that
+    # synonyms or duplicate spellings of a taxon are only requested once
+    if by == "scientificname":
+        resolved = resolve_taxonids(keys, max_workers=max_workers, cache=cache)
+        # names which cannot be resolved are queried by name instead
+        queries = {
+            key: (
+                ("taxonid", resolved[key])
+                if resolved.get(key) is not None
+                else (by, key)
+            )
+            for key in keys
+        }
+    else:
+        queries = {key: (by, key) for key in keys}
+
+    def fetch(query):
+        field, value = query
+        return obis_GET(
+            url,
+            {**kwargs, field: value},
+            "application/json; charset=utf-8",
+            cache=cache,
+        )
+
+    unique_queries = [*dict.fromkeys(queries.values())]
+    results = dict(
+        zip(
+            unique_queries,
+            obis_map(
+                fetch,
+                unique_queries,
+                max_workers=max_workers,
+                return_exceptions=True,
+            ),
+        ),
+    )
+
+    rows = []
+    for key in keys:
+        field, value = queries[key]
+        res = results[(field, value)]
+        row = {by: key, "lat": None, "lon": None, "error": None}
+        if by == "scientificname":
+            row["taxonid"] = value if field == "taxonid" else None
+        if isinstance(res, Exception):
+            logger.warning(f"Centroid request failed for {by}={key}: {res}")
+            row["error"] = str(res)
+        else:
+            row.update({"lat": res.get("lat"), "lon": res.get("lon")})
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index(by)
+
+
+def lookup_taxon(scientificname, cache=True):
     """
     Lookup for taxon metadata with scientificname
 
-    :param scientificname: [String] Scientific Name
+    Completions are answered by the OBIS API, except for the longer prefixes
+    of a name whose matches were all returned by an earlier completion, which
+    are answered from that answer, kept in the local taxon store.
+
+    :param scientificname: [String] Scientific Name, or the start of it
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
 
     :return: A dictionary of taxon metadata for the best matches to the input
 
@@ -833,15 +1295,45 @@ def lookup_taxon(scientificname):
         lookup_data = occurrences.lookup_taxon(scientificname="Mola mola")
         print(lookup_data)
     """
-    res = requests.get(f"https://api.obis.org/v3/taxon/complete/{scientificname}")
-    return res.json()
+    return get_default_prefix_index().complete(scientificname, cache=cache)
+
+
+def get_taxonids_for_scientific_names(scientific_names: str, cache=True) -> str:
+    taxonids = resolve_taxonids(scientific_names, cache=cache)
+    return handle_arrint([i for i in taxonids.values() if i is not None])
 
 
-def get_taxonids_for_scientific_names(scientific_names: str) -> str:
-    taxons = []
-    for scientificName in scientific_names.split(","):
-        taxon_lookup_result = lookup_taxon(scientificName)
-        if len(taxon_lookup_result) > 0:
-            taxons.append(taxon_lookup_result[0]["id"])
+def query(fields=None, max_workers=None, cache=True, **kwargs):
+    """
+    Start an occurrence query, to be filtered with `where`.
+
+    Filters the API supports are sent as query parameters, and the others are
+    evaluated on every page of records as it arrives (see `OccurrenceQuery`).
 
-    return handle_arrint(taxons)
+    :param fields: [String] Comma separated list of fields to return.
+        Default: all fields
+    :param max_workers: [Fixnum] Maximum number of concurrent searches, when
+        the query is split by dataset.
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :param kwargs: Filters of `occurrences.search`, e.g. `taxonid`
+
+    :return: An OccurrenceQuery object
+
+    Usage::
+
+        from pyobis import occurrences
+        from pyobis.occurrences import col, within
+
+        occurrences.query(scientificname="Mola mola").where(
+            (col("depth") > 200) & within("POLYGON((0 50, 5 50, 5 55, 0 55, 0 50))")
+        ).execute()
+    """
+    # imported here, as queries are built on `search`
+    from .pushdown import OccurrenceQuery
+
+    return OccurrenceQuery(
+        fields=fields,
+        max_workers=max_workers,
+        cache=cache,
+        **kwargs,
+    )
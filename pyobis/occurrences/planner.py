@@ -0,0 +1,375 @@
+"""
+Extraction plans: large occurrence queries split into balanced partitions,
+using the record counts of the statistics endpoint.
+"""
+
+import json
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..obisutils import logger, obis_map
+from ..spatial.spatial import _area, _box_wkt, _unwrap, parse_wkt
+from ..statistics.statistics import summary, years
+from .mirror import _write_atomic
+from .occurrences import search as search_occurrences
+
+DIMENSIONS = ("date", "depth", "geometry")
+
+# depth range split when the query has no depth filter, in meters
+DEPTH_RANGE = (0, 11000)
+
+# partitions are not split further below these sizes
+MIN_DEPTH_STEP = 1
+MIN_TILE_SIZE = 0.01
+
+
+def _day(value):
+    """Parse a YYYY-MM-DD date (or the date part of a timestamp)."""
+    return date.fromisoformat(str(value)[:10])
+
+
+def _tile_wkt(box):
+    """
+    Format a tile as WKT, with longitudes within [-180, 180] (tiles of
+    geometries crossing the antimeridian may extend beyond 180 degrees).
+    """
+    minx, miny, maxx, maxy = box
+    if minx < 180 < maxx:
+        parts = (
+            _box_wkt(b).replace("POLYGON", "", 1)
+            for b in ((minx, miny, 180, maxy), (-180, miny, maxx - 360, maxy))
+        )
+        return "MULTIPOLYGON(" + ", ".join(parts) + ")"
+    if minx >= 180:
+        return _box_wkt((minx - 360, miny, maxx - 360, maxy))
+    return _box_wkt(box)
+
+
+class ExtractionPlan:
+    """
+    A large occurrence query split into partitions of bounded size.
+
+    Every partition is a set of `occurrences.search` filters, holding its
+    estimated number of records. The plan is plain JSON, so that it can be
+    saved once and run by any executor: threads, processes or machines.
+
+    Partitions are disjoint, except for records lying exactly on the depth or
+    tile boundaries, which are found in both partitions. Merge the results on
+    the record `id` to drop them.
+    """
+
+    def __init__(self, filters, max_records, partitions, dimensions=None):
+        """
+        Initialise the plan.
+
+        :param filters: [dict] Filters of the whole query
+        :param max_records: [Fixnum] Target number of records per partition
+        :param partitions: [list] Partitions, as dictionaries with the
+            `filters` of the partition and its estimated number of `records`
+        :param dimensions: [list] Dimensions the partitions were split on.
+            Default: None (unknown)
+        """
+        self.filters = filters
+        self.max_records = max_records
+        self.partitions = partitions
+        self.dimensions = dimensions
+
+    def __len__(self):
+        """Number of partitions."""
+        return len(self.partitions)
+
+    def queries(self, **kwargs):
+        """
+        Get the `occurrences.search` arguments of every partition.
+
+        :param kwargs: Extra arguments for every partition, e.g. `fields`
+        :return: A list of dictionaries
+        """
+        return [
+            {**self.filters, **partition["filters"], **kwargs}
+            for partition in self.partitions
+        ]
+
+    def search(self, index, **kwargs):
+        """
+        Build the query of a partition.
+
+        :param index: [Fixnum] Position of the partition in the plan
+        :param kwargs: Extra arguments of `occurrences.search`, e.g. `fields`
+        :return: An OccResponse object
+        """
+        query = {**self.filters, **self.partitions[index]["filters"], **kwargs}
+        return search_occurrences(**query)
+
+    def to_pandas(self):
+        """
+        Get the partitions as a pandas DataFrame, with one column per filter
+        and the estimated number of records.
+        """
+        return pd.DataFrame(
+            [{**p["filters"], "records": p["records"]} for p in self.partitions],
+        )
+
+    def to_dict(self):
+        """The plan as a JSON-serializable dictionary."""
+        return {
+            "filters": self.filters,
+            "max_records": self.max_records,
+            "dimensions": self.dimensions,
+            "partitions": self.partitions,
+        }
+
+    def save(self, path):
+        """
+        Atomically write the plan to a JSON file.
+
+        :param path: [String] Path of the file
+        """
+
+        def write(tmp):
+            """Dump the plan to the temporary file."""
+            with open(tmp, "w") as f:
+                json.dump(self.to_dict(), f, indent=1)
+
+        _write_atomic(path, write)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a plan saved with `save`.
+
+        :param path: [String] Path of the file
+        :return: An ExtractionPlan object
+        """
+        with open(path) as f:
+            return cls(**json.load(f))
+
+
+def plan(
+    max_records=100000,
+    dimensions=DIMENSIONS,
+    path=None,
+    max_workers=None,
+    cache=True,
+    **kwargs,
+):
+    """
+    Split an occurrence query into partitions of at most `max_records` records.
+
+    Partitions holding too many records are bisected recursively on their date
+    range, depth range or geometry (bounding box), counting the records of
+    every candidate half with the statistics endpoint. The most balanced split
+    is kept. Splits losing records are rejected, e.g. date splits of queries
+    with undated records, or depth splits of records without depth, so that
+    the partitions always cover the whole query. Partitions which cannot be
+    split are kept whatever their size, with a warning.
+
+    Counts are cached, and the candidate splits are counted concurrently.
+
+    :param max_records: [Fixnum] Target number of records per partition.
+        Default: 100000
+    :param dimensions: [Array] Dimensions to split, among 'date', 'depth' and
+        'geometry'. Default: all three
+    :param path: [String] JSON file of the plan. If it holds a plan of the same
+        query, `max_records` and `dimensions`, it is reused without any request,
+        otherwise the new plan is saved to it. Default: None (not saved)
+    :param max_workers: [Fixnum] Maximum number of concurrent count requests.
+        Default: obisutils.DEFAULT_MAX_WORKERS
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :param kwargs: Filters of `occurrences.search`, e.g. `taxonid` or `geometry`
+
+    :return: An ExtractionPlan object
+
+    Usage::
+
+        from pyobis import occurrences
+        from pyobis.obisutils import obis_map
+        from pyobis.occurrences import plan
+
+        extraction = plan(max_records=200000, taxonid=1363, path="plan.json")
+        extraction.to_pandas()
+        frames = obis_map(
+            lambda query: occurrences.search(**query).execute(),
+            extraction.queries(fields="id,scientificName,eventDate"),
+        )
+
+        # or run a single partition, e.g. on another machine
+        from pyobis.occurrences import ExtractionPlan
+        ExtractionPlan.load("plan.json").search(3).execute()
+    """
+    unknown = set(dimensions) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown dimensions: {sorted(unknown)}")
+    dimensions = list(dimensions)
+    filters = json.loads(json.dumps(kwargs))
+    if path and Path(path).exists():
+        previous = ExtractionPlan.load(path)
+        if (
+            previous.filters == filters
+            and previous.max_records == max_records
+            and previous.dimensions == dimensions
+        ):
+            logger.info(f"Reusing the extraction plan in {path}.")
+            return previous
+
+    splitter = _Splitter(filters, dimensions, cache)
+    partitions = [{"filters": {}, "records": splitter.count({})}]
+    final = []
+    while partitions:
+        large = [p for p in partitions if p["records"] > max_records]
+        final += [p for p in partitions if p["records"] <= max_records]
+        candidates = [(p, c) for p in large for c in splitter.candidates(p)]
+        counts = obis_map(
+            lambda item: [splitter.count(child) for child in item[1][1]],
+            candidates,
+            max_workers=max_workers,
+        )
+        best = {}
+        for (partition, (dimension, children)), records in zip(candidates, counts):
+            # date and depth halves holding fewer records than the whole lost
+            # the records without a date or depth (while geometry tiles only
+            # drop the records of the tiles outside the geometry)
+            if dimension != "geometry" and sum(records) < partition["records"]:
+                continue
+            key = id(partition)
+            if key not in best or max(records) < max(best[key][1]):
+                best[key] = (children, records)
+        partitions = []
+        for partition in large:
+            if id(partition) not in best:
+                logger.warning(
+                    f"Partition {partition['filters']} holds {partition['records']} "
+                    "records but cannot be split further.",
+                )
+                final.append(partition)
+                continue
+            children, records = best[id(partition)]
+            partitions += [
+                {**partition, **child, "records": n}
+                for child, n in zip(children, records)
+                if n
+            ]
+    # largest partitions first, so that executors start with the slowest ones
+    final.sort(key=lambda p: -p["records"])
+    result = ExtractionPlan(filters, max_records, final, dimensions)
+    logger.info(
+        f"Planned {len(final)} partitions of "
+        f"{sum(p['records'] for p in final)} records.",
+    )
+    if path:
+        result.save(path)
+    return result
+
+
+class _Splitter:
+    """
+    Candidate bisections of partitions, and their record counts.
+    """
+
+    def __init__(self, filters, dimensions, cache):
+        """
+        Prepare the splits of a query on the given dimensions.
+
+        :param filters: [dict] Filters of the whole query
+        :param dimensions: [list] Dimensions to split, as in `plan`
+        :param cache: [bool] Whether to cache the counts
+        """
+        self.filters = filters
+        self.dimensions = dimensions
+        self.cache = cache
+        self.__years = None
+        geometry = filters.get("geometry")
+        self.polygons = _unwrap(parse_wkt(geometry)) if geometry else None
+        if self.polygons:
+            points = np.concatenate([p[0] for p in self.polygons])
+            self.box = (*points.min(axis=0), *points.max(axis=0))
+        else:
+            self.box = (-180, -90, 180, 90)
+
+    def count(self, partition):
+        """
+        Number of records of a partition (of a partition of the tile holding
+        them for geometries, as the counts use the tile).
+        """
+        args = {**self.filters, **partition.get("filters", {})}
+        if "geometry_cover" in args:
+            args["geometry"] = args.pop("geometry_cover")
+        return summary(cache=self.cache, **args).execute()["records"] or 0
+
+    def candidates(self, partition):
+        """
+        Candidate bisections of a partition, as the split dimension and a list
+        of (at most two) partitions.
+        """
+        filters = {**self.filters, **partition["filters"]}
+        result = []
+        for dimension in self.dimensions:
+            halves = getattr(self, f"_{dimension}")(filters, partition)
+            if not halves:
+                continue
+            base = {k: v for k, v in partition.items() if k != "records"}
+            children = [
+                {**base, **extra, "filters": {**partition["filters"], **half}}
+                for half, extra in halves
+            ]
+            result.append((dimension, children))
+        return result
+
+    def _date(self, filters, partition):
+        """Halves of the date range, within the years holding records."""
+        if self.__years is None:
+            found = years(cache=self.cache, **self.filters).execute()
+            found = [y["year"] for y in found if y.get("records")]
+            self.__years = (min(found), max(found)) if found else ()
+        if not self.__years:
+            return None
+        start = _day(filters.get("startdate") or f"{self.__years[0]}-01-01")
+        end = _day(filters.get("enddate") or f"{self.__years[1]}-12-31")
+        if start >= end:
+            return None
+        middle = start + (end - start) // 2
+        return [
+            ({"startdate": str(start), "enddate": str(middle)}, {}),
+            ({"startdate": str(middle + timedelta(days=1)), "enddate": str(end)}, {}),
+        ]
+
+    def _depth(self, filters, partition):
+        """Halves of the depth range, by default the whole ocean depth."""
+        start = filters.get("startdepth")
+        end = filters.get("enddepth")
+        start = DEPTH_RANGE[0] if start is None else start
+        end = DEPTH_RANGE[1] if end is None else end
+        if end - start <= MIN_DEPTH_STEP:
+            return None
+        middle = round((start + end) / 2, 2)
+        return [
+            ({"startdepth": start, "enddepth": middle}, {}),
+            ({"startdepth": middle, "enddepth": end}, {}),
+        ]
+
+    def _geometry(self, filters, partition):
+        """Halves of the tile along its longest side, dropping the empty ones."""
+        minx, miny, maxx, maxy = box = partition.get("box", self.box)
+        axis = 0 if maxx - minx >= maxy - miny else 1
+        low, high = box[axis], box[axis + 2]
+        if high - low <= MIN_TILE_SIZE:
+            return None
+        cut = round((low + high) / 2, 2)
+        if not low < cut < high:
+            cut = (low + high) / 2
+        if axis == 0:
+            boxes = [(minx, miny, cut, maxy), (cut, miny, maxx, maxy)]
+        else:
+            boxes = [(minx, miny, maxx, cut), (minx, cut, maxx, maxy)]
+        if self.polygons is None:
+            return [({"geometry": _tile_wkt(b)}, {"box": list(b)}) for b in boxes]
+        # the geometry itself is applied locally on the records of the tiles,
+        # and tiles missing the geometry are dropped
+        return [
+            ({"geometry_cover": _tile_wkt(b)}, {"box": list(b)})
+            for b in boxes
+            if _area(self.polygons, b) > 0
+        ]
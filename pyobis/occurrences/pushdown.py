@@ -0,0 +1,540 @@
+"""
+Occurrence queries with pandas-style filters.
+
+The filters the API supports are pushed down as query parameters, and the
+others are evaluated on every page of records as it arrives, so that only
+the pages of matching records are kept.
+"""
+
+import operator
+
+import pandas as pd
+
+from ..obisutils import obis_map
+from ..spatial import contains
+from .dedup import drop_duplicates
+from .occurrences import search as search_occurrences
+
+_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# record fields whose filters are pushed down to the API
+_DEPTH = ("depth",)
+_YEAR = ("date_year",)
+_DATASET = ("datasetID", "dataset_id")
+_FLAGS = ("flags",)
+
+
+def _false(df):
+    """A mask selecting no record."""
+    return pd.Series(False, index=df.index)
+
+
+def _combine(params, name, value):
+    """
+    Combine a pushed down parameter with the same parameter of other filters,
+    keeping the most restrictive bound (or the records matching both).
+    """
+    if name not in params or params[name] is None:
+        params[name] = value
+    elif name in ("startdepth", "startdate", "enddepth", "enddate"):
+        bound = max if name.startswith("start") else min
+        try:
+            if name.endswith("depth"):
+                # depths may be given as strings, e.g. `startdepth="100"`
+                params[name] = bound(params[name], value, key=float)
+            else:
+                params[name] = bound(params[name], value)
+        except (TypeError, ValueError):
+            # bounds which cannot be compared are checked locally
+            return False
+    elif name == "datasetid":
+        params[name] = set(params[name]) & set(value)
+    elif name in ("flags", "exclude"):
+        params[name] = set(params[name]) | set(value)
+    else:
+        return False
+    return True
+
+
+class Predicate:
+    """
+    A filter on occurrence records, combined with `&`, `|` and `~`.
+
+    Filters implement `evaluate(df)`, which returns a boolean pandas Series
+    over a DataFrame of records, and `columns()`, the record fields they use.
+    """
+
+    def __and__(self, other):
+        """Filter the records matching both filters."""
+        return _And(self, other)
+
+    def __or__(self, other):
+        """Filter the records matching either filter."""
+        return _Or(self, other)
+
+    def __invert__(self):
+        """Filter the records not matching the filter."""
+        return _Not(self)
+
+    def translate(self):
+        """
+        Translate the filter into API parameters.
+
+        :return: A (parameters, exact) pair, where `exact` tells whether the
+            parameters select the same records as the filter, or None if the
+            filter cannot be pushed down
+        """
+        return None
+
+
+class Column:
+    """
+    A field of the occurrence records, compared into filters.
+
+    Usage::
+
+        from pyobis.occurrences import col
+
+        (col("depth") > 200) & col("datasetID").isin(ids)
+    """
+
+    def __init__(self, name):
+        """Refer to the field `name`."""
+        self.name = name
+
+    def __gt__(self, value):
+        """Filter the records whose field is greater than the value."""
+        return _Compare(self.name, ">", value)
+
+    def __ge__(self, value):
+        """Filter the records whose field is at least the value."""
+        return _Compare(self.name, ">=", value)
+
+    def __lt__(self, value):
+        """Filter the records whose field is less than the value."""
+        return _Compare(self.name, "<", value)
+
+    def __le__(self, value):
+        """Filter the records whose field is at most the value."""
+        return _Compare(self.name, "<=", value)
+
+    def __eq__(self, value):
+        """Filter the records whose field equals the value."""
+        return _Compare(self.name, "==", value)
+
+    def __ne__(self, value):
+        """Filter the records whose field differs from the value."""
+        return _Compare(self.name, "!=", value)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def isin(self, values):
+        """Filter the records whose field is one of the values."""
+        return _IsIn(self.name, values)
+
+    def contains(self, value):
+        """Filter the records whose field (a list, e.g. `flags`) holds the value."""
+        return _Contains(self.name, value)
+
+
+def col(name):
+    """
+    Refer to a field of the occurrence records, e.g. `col("depth") > 200`.
+    """
+    return Column(name)
+
+
+def within(geometry):
+    """
+    Filter the records within a WKT polygon (pushed down as `geometry`).
+    """
+    return _Within(geometry)
+
+
+class _Compare(Predicate):
+    """A comparison of a field with a value."""
+
+    def __init__(self, name, op, value):
+        """Compare the field `name` with `op`, one of `_OPERATORS`."""
+        self.name, self.op, self.value = name, op, value
+
+    def __repr__(self):
+        """The comparison, e.g. `(depth > 200)`."""
+        return f"({self.name} {self.op} {self.value!r})"
+
+    def evaluate(self, df):
+        """Mask of the records matching the comparison."""
+        if self.name not in df.columns:
+            return _false(df)
+        return _OPERATORS[self.op](df[self.name], self.value)
+
+    def columns(self):
+        """The compared field."""
+        return [self.name]
+
+    def translate(self):
+        """Depth and year bounds, and dataset equalities, as API parameters."""
+        value = self.value
+        if self.name in _DEPTH and self.op != "!=":
+            # the API bounds are inclusive, strict bounds are checked locally
+            exact = self.op in (">=", "<=", "==")
+            params = {}
+            if self.op in (">", ">=", "=="):
+                params["startdepth"] = value
+            if self.op in ("<", "<=", "=="):
+                params["enddepth"] = value
+            return params, exact
+        if (
+            self.name in _YEAR
+            and self.op != "!="
+            and isinstance(value, (int, float))
+            and float(value).is_integer()
+        ):
+            # years are bounds on the event dates, so the records are checked
+            # locally too, on `date_year` itself
+            year = int(value)
+            params = {}
+            if self.op in (">", ">=", "=="):
+                params["startdate"] = f"{year + (self.op == '>')}-01-01"
+            if self.op in ("<", "<=", "=="):
+                params["enddate"] = f"{year - (self.op == '<')}-12-31"
+            return params, False
+        if self.name in _DATASET and self.op == "==":
+            return {"datasetid": {value}}, True
+        return None
+
+
+class _IsIn(Predicate):
+    """A field holding one of several values."""
+
+    def __init__(self, name, values):
+        """Match the field `name` against the values."""
+        self.name, self.values = name, list(values)
+
+    def __repr__(self):
+        """The filter, e.g. `(datasetID in [...])`."""
+        return f"({self.name} in {self.values!r})"
+
+    def evaluate(self, df):
+        """Mask of the records whose field is one of the values."""
+        if self.name not in df.columns:
+            return _false(df)
+        return df[self.name].isin(self.values)
+
+    def columns(self):
+        """The matched field."""
+        return [self.name]
+
+    def translate(self):
+        """Dataset lists as the `datasetid` parameter."""
+        if self.name in _DATASET:
+            return {"datasetid": set(self.values)}, True
+        return None
+
+
+class _Contains(Predicate):
+    """A list field holding a value."""
+
+    def __init__(self, name, value):
+        """Look for the value in the field `name`."""
+        self.name, self.value = name, value
+
+    def __repr__(self):
+        """The filter, e.g. `('ON_LAND' in flags)`."""
+        return f"({self.value!r} in {self.name})"
+
+    def evaluate(self, df):
+        """Mask of the records whose field holds the value."""
+        if self.name not in df.columns:
+            return _false(df)
+
+        def holds(values):
+            """Whether a list (or comma separated string) holds the value."""
+            if isinstance(values, str):
+                values = values.split(",")
+            return isinstance(values, (list, tuple)) and self.value in values
+
+        return df[self.name].map(holds).astype(bool)
+
+    def columns(self):
+        """The searched field."""
+        return [self.name]
+
+    def translate(self):
+        """Flags as the `flags` parameter."""
+        if self.name in _FLAGS:
+            return {"flags": {self.value}}, True
+        return None
+
+
+class _Within(Predicate):
+    """Records within a WKT polygon."""
+
+    def __init__(self, geometry):
+        """Keep the records within the WKT `geometry`."""
+        self.geometry = geometry
+
+    def __repr__(self):
+        """The filter, e.g. `(within 'POLYGON(...)')`."""
+        return f"(within {self.geometry!r})"
+
+    def evaluate(self, df):
+        """Mask of the records within the geometry."""
+        if "decimalLongitude" not in df.columns:
+            return _false(df)
+        mask = contains(self.geometry, df["decimalLongitude"], df["decimalLatitude"])
+        return pd.Series(mask, index=df.index)
+
+    def columns(self):
+        """The coordinate fields."""
+        return ["decimalLongitude", "decimalLatitude"]
+
+    def translate(self):
+        """The geometry as the `geometry` parameter."""
+        return {"geometry": self.geometry}, True
+
+
+class _And(Predicate):
+    """Records matching both filters."""
+
+    def __init__(self, left, right):
+        """Join two filters."""
+        self.left, self.right = left, right
+
+    def __repr__(self):
+        """The filters joined by `&`."""
+        return f"({self.left!r} & {self.right!r})"
+
+    def evaluate(self, df):
+        """Mask of the records matching both filters."""
+        return self.left.evaluate(df) & self.right.evaluate(df)
+
+    def columns(self):
+        """The fields of both filters."""
+        return self.left.columns() + self.right.columns()
+
+    def conjuncts(self):
+        """The filters joined by `&`."""
+        return [
+            c
+            for p in (self.left, self.right)
+            for c in (p.conjuncts() if isinstance(p, _And) else [p])
+        ]
+
+
+class _Or(Predicate):
+    """Records matching either filter."""
+
+    def __init__(self, left, right):
+        """Join two filters."""
+        self.left, self.right = left, right
+
+    def __repr__(self):
+        """The filters joined by `|`."""
+        return f"({self.left!r} | {self.right!r})"
+
+    def evaluate(self, df):
+        """Mask of the records matching either filter."""
+        return self.left.evaluate(df) | self.right.evaluate(df)
+
+    def columns(self):
+        """The fields of both filters."""
+        return self.left.columns() + self.right.columns()
+
+
+class _Not(Predicate):
+    """Records not matching a filter."""
+
+    def __init__(self, inner):
+        """Negate a filter."""
+        self.inner = inner
+
+    def __repr__(self):
+        """The filter prefixed by `~`."""
+        return f"~{self.inner!r}"
+
+    def evaluate(self, df):
+        """Mask of the records not matching the filter."""
+        return ~self.inner.evaluate(df)
+
+    def columns(self):
+        """The fields of the filter."""
+        return self.inner.columns()
+
+    def translate(self):
+        """Excluded flags as the `exclude` parameter."""
+        if isinstance(self.inner, _Contains) and self.inner.name in _FLAGS:
+            return {"exclude": {self.inner.value}}, True
+        return None
+
+
+class OccurrenceQuery:
+    """
+    An occurrence search with pandas-style filters.
+
+    Filters on `depth`, `date_year`, `datasetID` (or `dataset_id`), `flags`
+    and the coordinates (`within`) are pushed down to the API as `startdepth`,
+    `enddepth`, `startdate`, `enddate`, `datasetid`, `flags`, `exclude` and
+    `geometry`, when they are combined with `&`. The other filters (and the
+    pushed down filters which the API parameters only approximate, e.g.
+    strict depth bounds) are evaluated on every page of records as it arrives.
+
+    Usage::
+
+        from pyobis import occurrences
+        from pyobis.occurrences import col
+
+        query = occurrences.query(taxonid=1363).where(
+            (col("depth") > 200)
+            & (col("date_year") >= 2000)
+            & col("datasetID").isin(ids)
+            & (col("basisOfRecord") == "HumanObservation")
+        )
+        query.explain()  # the API parameters and the local filter
+        df = query.execute()
+    """
+
+    def __init__(
+        self,
+        predicate=None,
+        fields=None,
+        max_workers=None,
+        cache=True,
+        **kwargs,
+    ):
+        """
+        Initialise the query.
+
+        :param predicate: Filter of the records, built with `col` and `within`.
+            Default: None (all the records)
+        :param fields: [String] Comma separated list of fields to return, the
+            fields of the local filters are added. Default: all fields
+        :param max_workers: [Fixnum] Maximum number of concurrent searches, when
+            the query is split by dataset. Default: obisutils.DEFAULT_MAX_WORKERS
+        :param cache: [bool, optional] Whether to use caching. Defaults to True.
+        :param kwargs: Filters of `occurrences.search`, e.g. `taxonid`
+        """
+        self.predicate = predicate
+        self.fields = fields
+        self.max_workers = max_workers
+        self.cache = cache
+        self.filters = kwargs
+
+    def where(self, predicate):
+        """
+        Add a filter, combined with the previous ones with `&`.
+
+        :return: A new OccurrenceQuery object
+        """
+        if self.predicate is not None:
+            predicate = self.predicate & predicate
+        return OccurrenceQuery(
+            predicate,
+            fields=self.fields,
+            max_workers=self.max_workers,
+            cache=self.cache,
+            **self.filters,
+        )
+
+    def __plan(self):
+        """
+        Split the filter into the search parameters (one set per dataset
+        for lists of datasets) and the filter evaluated locally.
+        """
+        params = {**self.filters}
+        # lists of the search filters, as sets to combine with the pushed
+        # down filters
+        for name in ("datasetid", "flags", "exclude"):
+            if isinstance(params.get(name), str):
+                params[name] = set(params[name].split(","))
+            elif params.get(name) is not None:
+                params[name] = set(params[name])
+        residual = []
+        if self.predicate is None:
+            conjuncts = []
+        elif isinstance(self.predicate, _And):
+            conjuncts = self.predicate.conjuncts()
+        else:
+            conjuncts = [self.predicate]
+        for predicate in conjuncts:
+            translated = predicate.translate()
+            if translated is None:
+                residual.append(predicate)
+                continue
+            pushed, exact = translated
+            candidate = {**params}
+            if all(_combine(candidate, k, v) for k, v in pushed.items()):
+                params = candidate
+                if exact:
+                    continue
+            residual.append(predicate)
+
+        for name in ("flags", "exclude"):
+            if isinstance(params.get(name), set):
+                params[name] = ",".join(sorted(params[name]))
+        local = None
+        for predicate in residual:
+            local = predicate if local is None else local & predicate
+        if self.fields and local is not None:
+            params["fields"] = ",".join(
+                dict.fromkeys([*self.fields.split(","), "id", *local.columns()]),
+            )
+        elif self.fields:
+            params["fields"] = self.fields
+
+        datasets = params.pop("datasetid", None)
+        if datasets is None:
+            return [params], local
+        return [{**params, "datasetid": d} for d in sorted(datasets)], local
+
+    def explain(self):
+        """
+        Show how the query is run.
+
+        :return: A dictionary with the parameters of the searches, and the
+            filter evaluated locally (None if all the filters are pushed down)
+        """
+        searches, local = self.__plan()
+        return {"searches": searches, "local": repr(local) if local else None}
+
+    def __filter(self, page, local):
+        """Apply the local filter on a page of records."""
+        if local is None or not len(page):
+            return page
+        return page[local.evaluate(page).to_numpy(dtype=bool)].reset_index(drop=True)
+
+    def iter_pages(self):
+        """
+        Fetch the matching records page by page, yielding pandas DataFrames.
+        """
+        searches, local = self.__plan()
+        for params in searches:
+            query = search_occurrences(cache=self.cache, **params)
+            for page in query.iter_pages():
+                yield self.__filter(page, local)
+
+    def execute(self):
+        """
+        Fetch the matching records, running the searches of the datasets
+        concurrently.
+
+        :return: A pandas DataFrame
+        """
+        searches, local = self.__plan()
+
+        def run(params):
+            """Fetch the filtered records of a search."""
+            pages = [
+                self.__filter(page, local)
+                for page in search_occurrences(cache=self.cache, **params).iter_pages()
+            ]
+            return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+        return drop_duplicates(obis_map(run, searches, max_workers=self.max_workers))
@@ -0,0 +1,457 @@
+"""
+Sharded extraction of occurrence records: an extraction plan on shared
+storage, whose partitions are claimed and extracted by any number of workers,
+on any number of machines, without a central service.
+
+Run it from Python, or from the command line::
+
+    python -m pyobis.occurrences create /shared/extraction --max-records 200000 \\
+        --filter taxonid=1363
+    python -m pyobis.occurrences work /shared/extraction  # on every worker
+    python -m pyobis.occurrences status /shared/extraction
+    python -m pyobis.occurrences merge /shared/extraction occurrences.parquet
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from ..obisutils import logger
+from .dedup import drop_duplicates
+from .exporter import RETRY_DELAY
+from .mirror import (
+    MANIFEST,
+    _default_format,
+    _write_atomic,
+    read_partition,
+    write_partition,
+)
+from .planner import DIMENSIONS, ExtractionPlan, plan
+
+# seconds after which the lease of a silent worker expires, and the partition
+# can be claimed by another worker
+LEASE_SECONDS = 600
+
+
+class ShardedExtraction:
+    """
+    An extraction plan on shared storage, extracted by cooperating workers.
+
+    The directory holds the manifest (the plan and the output format), and
+    one file per partition and state:
+
+    - `leases/<partition>.lease`, created exclusively by the worker claiming
+      the partition, and touched regularly while it works. Leases which were
+      not touched for `lease` seconds are taken over by other workers.
+    - `parts/<partition>.<format>`, the extracted records, written atomically.
+    - `done/<partition>.json`, written once the records are complete.
+
+    Workers never rewrite shared files, so only exclusive file creation and
+    atomic renames are needed from the shared file system. A partition is
+    extracted twice at worst, when a worker stalls for longer than its lease,
+    which is harmless as the outputs are replaced atomically.
+
+    Usage::
+
+        from pyobis.occurrences import ShardedExtraction
+
+        ShardedExtraction.create("/shared/extraction", max_records=200000, taxonid=1363)
+
+        # on every worker, in any number of processes and machines
+        ShardedExtraction("/shared/extraction").work()
+
+        # once all the partitions are done
+        ShardedExtraction("/shared/extraction").merge("occurrences.parquet")
+    """
+
+    def __init__(self, path, lease=LEASE_SECONDS):
+        """
+        Open an extraction created with `create`.
+
+        :param path: [String] Directory of the extraction, on storage shared
+            by the workers
+        :param lease: [Fixnum] Seconds after which the partition of a silent
+            worker can be claimed by another worker. Default: 600
+        """
+        self.path = Path(path)
+        self.lease = lease
+        with open(self.path / MANIFEST) as f:
+            manifest = json.load(f)
+        self.plan = ExtractionPlan(**manifest["plan"])
+        self.format = manifest["format"]
+        self.fields = manifest["fields"]
+        self.cache = manifest["cache"]
+
+    @classmethod
+    def create(
+        cls,
+        path,
+        max_records=100000,
+        dimensions=DIMENSIONS,
+        format=None,
+        fields=None,
+        max_workers=None,
+        cache=True,
+        **kwargs,
+    ):
+        """
+        Plan an extraction and write its manifest to a directory.
+
+        Creating an extraction again with the same arguments opens the
+        existing one.
+
+        :param path: [String] Directory of the extraction
+        :param max_records: [Fixnum] Target number of records per partition.
+            Default: 100000
+        :param dimensions: [Array] Dimensions to split, as in `plan`
+        :param format: [String] Partition format, either 'parquet' or 'csv.gz'.
+            Default: 'parquet' if pyarrow is installed, otherwise 'csv.gz'
+        :param fields: [String] Occurrence fields to extract. Default: all fields
+        :param max_workers: [Fixnum] Maximum number of concurrent count requests
+            while planning.
+        :param cache: [bool, optional] Whether the workers use caching.
+            Defaults to True.
+        :param kwargs: Filters of `occurrences.search`, e.g. `taxonid`
+
+        :return: A ShardedExtraction object
+        """
+        path = Path(path)
+        manifest_path = path / MANIFEST
+        if manifest_path.exists():
+            with open(manifest_path) as f:
+                previous = json.load(f)
+            if (
+                previous["plan"]["filters"] != json.loads(json.dumps(kwargs))
+                or previous["plan"]["max_records"] != max_records
+                or previous["plan"].get("dimensions") != list(dimensions)
+                or previous["fields"] != fields
+                or format not in (None, previous["format"])
+            ):
+                raise ValueError(f"{path} holds a different extraction")
+            return cls(path)
+
+        extraction = plan(
+            max_records=max_records,
+            dimensions=dimensions,
+            max_workers=max_workers,
+            cache=cache,
+            **kwargs,
+        )
+        manifest = {
+            "plan": extraction.to_dict(),
+            "format": format or _default_format(),
+            "fields": fields,
+            "cache": cache,
+        }
+        for directory in ("leases", "parts", "done"):
+            (path / directory).mkdir(parents=True, exist_ok=True)
+
+        def write(tmp):
+            with open(tmp, "w") as f:
+                json.dump(manifest, f, indent=1)
+
+        _write_atomic(manifest_path, write)
+        return cls(path)
+
+    def __file(self, directory, index, suffix):
+        """Path of the file of a partition in one of the state directories."""
+        return self.path / directory / f"{index:05d}.{suffix}"
+
+    def __done(self):
+        """Partitions whose records are complete."""
+        return {int(p.name.split(".")[0]) for p in (self.path / "done").glob("*.json")}
+
+    def __claim(self, index, worker):
+        """
+        Try to take the lease of a partition.
+
+        :return: True if the lease was taken
+        """
+        lease = self.__file("leases", index, "lease")
+        try:
+            fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                age = time.time() - lease.stat().st_mtime
+            except FileNotFoundError:
+                return False
+            if age < self.lease:
+                return False
+            # the lease expired, and only one of the workers taking it over
+            # succeeds in renaming it
+            stale = lease.with_name(f"{lease.name}.{worker}.stale")
+            try:
+                os.rename(lease, stale)
+            except OSError:
+                return False
+            stale.unlink()
+            logger.info(f"Lease of partition {index} expired, taking it over.")
+            return self.__claim(index, worker)
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {
+                    "worker": worker,
+                    "claimed": datetime.now(timezone.utc).isoformat(),
+                },
+                f,
+            )
+        return True
+
+    def __owner(self, index):
+        """Worker holding the lease of a partition, if any."""
+        try:
+            with open(self.__file("leases", index, "lease")) as f:
+                return json.load(f)["worker"]
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def __release(self, index, worker):
+        """Remove the lease of a partition, if it is still held by the worker."""
+        if self.__owner(index) == worker:
+            self.__file("leases", index, "lease").unlink(missing_ok=True)
+
+    def __heartbeat(self, index, worker, stop, lost):
+        """Touch the lease until `stop` is set, setting `lost` if it was taken over."""
+        lease = self.__file("leases", index, "lease")
+        while not stop.wait(self.lease / 3):
+            if self.__owner(index) != worker:
+                lost.set()
+                return
+            try:
+                os.utime(lease)
+            except FileNotFoundError:
+                lost.set()
+                return
+
+    def __extract(self, index, worker, retries):
+        """Extract the records of a claimed partition."""
+        stop, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(
+            target=self.__heartbeat,
+            args=(index, worker, stop, lost),
+            daemon=True,
+        )
+        heartbeat.start()
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    df = self.plan.search(
+                        index,
+                        fields=self.fields,
+                        cache=self.cache,
+                    ).execute()
+                    break
+                except Exception as e:
+                    if attempt == retries:
+                        raise
+                    logger.warning(
+                        f"Attempt {attempt + 1} failed for partition {index}: {e}",
+                    )
+                    time.sleep(RETRY_DELAY * 2**attempt)
+        finally:
+            stop.set()
+            heartbeat.join()
+        if lost.is_set():
+            logger.warning(f"Lease of partition {index} was lost, discarding it.")
+            return None
+
+        file = self.__file("parts", index, self.format)
+        write_partition(df, file)
+        done = {
+            "worker": worker,
+            "records": len(df),
+            "file": str(file.relative_to(self.path)),
+            "finished": datetime.now(timezone.utc).isoformat(),
+        }
+
+        def write(tmp):
+            with open(tmp, "w") as f:
+                json.dump(done, f)
+
+        _write_atomic(self.__file("done", index, "json"), write)
+        return len(df)
+
+    def work(self, worker_id=None, max_partitions=None, retries=2):
+        """
+        Claim and extract partitions until none is left.
+
+        Partitions are claimed largest first. The worker stops when every
+        partition is either done or leased by a live worker, so run it again
+        later to take over the partitions of workers which died.
+
+        :param worker_id: [String] Name of the worker. Default: host name and
+            process id
+        :param max_partitions: [Fixnum] Maximum number of partitions to extract.
+            Default: no limit
+        :param retries: [Fixnum] Number of retries of a failing partition. Default: 2
+
+        :return: A dictionary with the number of partitions done and failed
+        """
+        worker = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        counts = {"done": 0, "failed": 0}
+        skipped = set()
+        while max_partitions is None or counts["done"] < max_partitions:
+            done = self.__done()
+            index = next(
+                (
+                    i
+                    for i in range(len(self.plan))
+                    if i not in done and i not in skipped and self.__claim(i, worker)
+                ),
+                None,
+            )
+            if index is None:
+                break
+            try:
+                records = self.__extract(index, worker, retries)
+                if records is not None:
+                    logger.info(f"Partition {index} done ({records} records).")
+                    counts["done"] += 1
+            except Exception as e:
+                logger.warning(f"Partition {index} failed: {e}")
+                counts["failed"] += 1
+                skipped.add(index)
+            finally:
+                self.__release(index, worker)
+        return counts
+
+    def status(self):
+        """
+        Get the state of every partition.
+
+        :return: A pandas DataFrame with one row per partition, holding its
+            estimated records, its state ('pending', 'leased', 'expired' or
+            'done'), the worker holding or having extracted it, and the number
+            of records extracted
+        """
+        rows = []
+        for index, partition in enumerate(self.plan.partitions):
+            row = {
+                "partition": index,
+                "records": partition["records"],
+                "state": "pending",
+                "worker": None,
+                "fetched": None,
+            }
+            done = self.__file("done", index, "json")
+            lease = self.__file("leases", index, "lease")
+            if done.exists():
+                with open(done) as f:
+                    info = json.load(f)
+                row.update(state="done", worker=info["worker"], fetched=info["records"])
+            elif lease.exists():
+                try:
+                    expired = time.time() - lease.stat().st_mtime >= self.lease
+                    row.update(
+                        state="expired" if expired else "leased",
+                        worker=self.__owner(index),
+                    )
+                except FileNotFoundError:
+                    pass
+            rows.append(row)
+        return pd.DataFrame(
+            rows,
+            columns=["partition", "records", "state", "worker", "fetched"],
+        )
+
+    def iter_partitions(self):
+        """
+        Read the extracted partitions one at a time, yielding pandas DataFrames.
+        """
+        for index in sorted(self.__done()):
+            yield read_partition(self.__file("parts", index, self.format))
+
+    def merge(self, output=None):
+        """
+        Combine the extracted partitions, dropping the records found in two
+        partitions (on the depth or tile boundaries).
+
+        :param output: [String] File to write the records to, as Parquet or
+            (gzipped) CSV depending on its extension. Default: None (not written)
+
+        :return: A pandas DataFrame of all the records
+        """
+        missing = len(self.plan) - len(self.__done())
+        if missing:
+            raise ValueError(f"{missing} partitions are not extracted yet")
+        df = drop_duplicates(self.iter_partitions())
+        if output:
+            write_partition(df, output)
+        return df
+
+
+def _filter(text):
+    """Parse a `name=value` filter, with JSON values (numbers, lists)."""
+    name, _, value = text.partition("=")
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def main(argv=None):
+    """
+    Command line interface of sharded extractions.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m pyobis.occurrences",
+        description="Sharded extraction of OBIS occurrence records.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="plan an extraction")
+    create.add_argument("path")
+    create.add_argument("--max-records", type=int, default=100000)
+    create.add_argument("--dimensions", nargs="+", default=list(DIMENSIONS))
+    create.add_argument("--format", choices=["parquet", "csv.gz"])
+    create.add_argument("--fields")
+    create.add_argument(
+        "--filter",
+        type=_filter,
+        action="append",
+        default=[],
+        help="occurrences.search filter, e.g. taxonid=1363",
+    )
+
+    work = commands.add_parser("work", help="extract partitions")
+    work.add_argument("path")
+    work.add_argument("--worker-id")
+    work.add_argument("--max-partitions", type=int)
+    work.add_argument("--lease", type=int, default=LEASE_SECONDS)
+
+    status = commands.add_parser("status", help="show the partitions")
+    status.add_argument("path")
+
+    merge = commands.add_parser("merge", help="combine the partitions")
+    merge.add_argument("path")
+    merge.add_argument("output")
+
+    args = parser.parse_args(argv)
+    if args.command == "create":
+        extraction = ShardedExtraction.create(
+            args.path,
+            max_records=args.max_records,
+            dimensions=args.dimensions,
+            format=args.format,
+            fields=args.fields,
+            **dict(args.filter),
+        )
+        print(f"{len(extraction.plan)} partitions planned in {args.path}")
+    elif args.command == "work":
+        counts = ShardedExtraction(args.path, lease=args.lease).work(
+            worker_id=args.worker_id,
+            max_partitions=args.max_partitions,
+        )
+        print(f"{counts['done']} partitions done, {counts['failed']} failed")
+    elif args.command == "status":
+        print(ShardedExtraction(args.path).status().to_string(index=False))
+    else:
+        df = ShardedExtraction(args.path).merge(args.output)
+        print(f"{len(df)} records written to {args.output}")
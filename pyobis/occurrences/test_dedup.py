@@ -0,0 +1,67 @@
+"""Tests for occurrence id sets"""
+
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from pyobis.occurrences.dedup import IdSet, drop_duplicates
+
+
+def random_ids(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [str(uuid.UUID(bytes=rng.bytes(16))) for _ in range(n)]
+
+
+def test_idset_exact():
+    """
+    IdSet - same answers as a Python set, in 16 bytes per id
+    """
+    ids = random_ids(5000)
+    rng = np.random.default_rng(1)
+    seen, reference = IdSet(), set()
+    for _ in range(40):
+        # batches overlapping each other, and with repeated ids
+        batch = [ids[i] for i in rng.integers(0, len(ids), 300)]
+        expected = []
+        for id in batch:
+            expected.append(id not in reference)
+            reference.add(id)
+        assert seen.add(batch).tolist() == expected
+    assert len(seen) == len(reference)
+    assert seen.nbytes == 16 * len(reference)
+    assert ids[0] in seen or ids[0] not in reference
+    assert str(uuid.uuid4()) not in seen
+
+    # ids which are not UUIDs are hashed
+    other = IdSet()
+    assert other.add(["1", "2", "1", ids[0]]).tolist() == [True, True, False, True]
+    assert other.add([ids[0].upper(), "3"]).tolist() == [False, True]
+
+
+def test_idset_bloom():
+    """
+    IdSet - Bloom filters never keep a duplicate, and rarely drop a new id
+    """
+    ids = random_ids(20000, seed=2)
+    seen = IdSet(capacity=20000, error_rate=0.01)
+    new = seen.add(ids[:10000])
+    assert new.sum() > 10000 * 0.98
+    assert not seen.add(ids[:10000]).any()
+    assert seen.add(ids[10000:]).sum() > 10000 * 0.97
+    assert seen.nbytes < 20000 * 2
+
+
+def test_drop_duplicates():
+    """
+    drop_duplicates - records seen in a previous frame are dropped
+    """
+    ids = random_ids(4)
+    frames = [
+        pd.DataFrame({"id": [ids[0], ids[1], None], "n": [1, 2, 3]}),
+        pd.DataFrame({"id": [ids[1], ids[2], None, ids[2]], "n": [4, 5, 6, 7]}),
+        pd.DataFrame({"n": [8]}),
+    ]
+    df = drop_duplicates(frames)
+    assert df["n"].tolist() == [1, 2, 3, 5, 6, 8]
+    assert drop_duplicates([]).empty
@@ -0,0 +1,103 @@
+"""Tests for the occurrence export"""
+
+from collections import Counter
+
+from pyobis import statistics
+from pyobis.occurrences import export, exporter
+from pyobis.occurrences import occurrences as occ_module
+
+RECORDS = [
+    {"id": "1", "dataset_id": "large", "scientificName": "Abra alba"},
+    {"id": "2", "dataset_id": "large", "scientificName": "Abra alba"},
+    {"id": "3", "dataset_id": "large", "scientificName": "Mola mola"},
+    {"id": "4", "dataset_id": "small", "scientificName": "Abra alba"},
+    {"id": "5", "dataset_id": "broken", "scientificName": "Abra alba"},
+]
+
+
+def matches(record, args):
+    """
+    Whether a record matches the dataset and name parameters
+    """
+    if args.get("datasetid") and record["dataset_id"] != args["datasetid"]:
+        return False
+    return record["scientificName"] == args["scientificname"]
+
+
+def serve(obis_api):
+    """
+    Serve occurrence searches and the dataset counts of the statistics
+    """
+
+    def respond(url, args):
+        """Number of datasets, or the facet of their records."""
+        counts = Counter(r["dataset_id"] for r in RECORDS if matches(r, args))
+        if url.endswith("/facet"):
+            top = counts.most_common(args["top"])
+            facet = [{"key": key, "records": n} for key, n in top]
+            return {"results": {"datasetid": facet}}
+        return {"records": sum(counts.values()), "datasets": len(counts)}
+
+    obis_api.serve(statistics, respond)
+    obis_api.serve_records(occ_module, RECORDS, match=matches)
+
+
+def test_export(tmp_path, monkeypatch, obis_api):
+    """
+    export - one partition per dataset, largest first, failing partitions are
+    retried and fetched again by a later export
+    """
+    serve(obis_api)
+    fake_GET = occ_module.obis_GET
+    failures = []
+
+    def flaky_GET(url, args, ctype, cache=True, **kwargs):
+        """Reset the first connections to the broken dataset."""
+        if args["datasetid"] == "broken" and len(failures) < 3:
+            failures.append(args)
+            raise ConnectionError("reset")
+        return fake_GET(url, args, ctype, cache=cache, **kwargs)
+
+    monkeypatch.setattr(occ_module, "obis_GET", flaky_GET)
+    monkeypatch.setattr(exporter, "RETRY_DELAY", 0)
+
+    result = export(
+        tmp_path / "export",
+        max_workers=1,
+        retries=1,
+        format="csv.gz",
+        scientificname="Abra alba",
+    )
+    assert obis_api.args_of("occurrence")[0]["datasetid"] == "large"
+    result = result.set_index("dataset_id")
+    # the records matching the filters, not the records of the datasets
+    assert result.loc["large", "records"] == result.loc["large", "fetched"] == 2
+    assert result.loc["large", "status"] == "done"
+    assert result.loc["broken", "status"] == "failed"
+    assert result.loc["broken", "attempts"] == 2
+    assert (tmp_path / "export" / "small.csv.gz").exists()
+
+    obis_api.requests.clear()
+    result = export(
+        tmp_path / "export",
+        retries=1,
+        format="csv.gz",
+        scientificname="Abra alba",
+    )
+    assert {a["datasetid"] for a in obis_api.args_of("occurrence")} == {"broken"}
+    assert set(result["status"]) == {"done"}
+
+
+def test_export_datasetid(tmp_path, obis_api):
+    """
+    export - datasetid selects the exported datasets
+    """
+    serve(obis_api)
+    result = export(
+        tmp_path / "export",
+        format="csv.gz",
+        datasetid=["small", "missing"],
+        scientificname="Abra alba",
+    )
+    assert list(result["dataset_id"]) == ["small"]
+    assert {a["datasetid"] for a in obis_api.args_of("occurrence")} == {"small"}
@@ -0,0 +1,59 @@
+"""Tests for the occurrence mirror"""
+
+from pyobis.occurrences.mirror import OccurrenceMirror
+
+
+def test_mirror_sync(tmp_path, obis_api, serve_datasets):
+    """
+    OccurrenceMirror.sync - only changed datasets are fetched again
+    """
+    datasets = [
+        {"id": "a", "updated": "2025-01-01", "records": 2},
+        {"id": "b", "updated": "2025-01-01", "records": 1},
+    ]
+    records = [
+        {"id": "1", "dataset_id": "a", "scientificName": "Mola mola"},
+        {"id": "2", "dataset_id": "a", "scientificName": "Abra alba"},
+        {"id": "3", "dataset_id": "b", "scientificName": "Mola mola"},
+    ]
+    serve_datasets(datasets, records)
+
+    def fetched():
+        """Datasets whose occurrences were requested."""
+        return sorted({a["datasetid"] for a in obis_api.args_of("occurrence")})
+
+    mirror = OccurrenceMirror(tmp_path / "mirror", format="csv.gz", nodeid="x")
+    assert mirror.sync()["added"] == 2
+    assert fetched() == ["a", "b"]
+    assert sorted(mirror.to_pandas()["id"].astype(str)) == ["1", "2", "3"]
+
+    # b is updated, a new dataset c appears, a is unchanged
+    obis_api.requests.clear()
+    datasets[1] = {"id": "b", "updated": "2025-02-01", "records": 2}
+    datasets.append({"id": "c", "updated": "2025-02-01", "records": 1})
+    records += [
+        {"id": "4", "dataset_id": "b", "scientificName": "Abra alba"},
+        {"id": "5", "dataset_id": "c", "scientificName": "Abra alba"},
+    ]
+    mirror = OccurrenceMirror(tmp_path / "mirror", format="csv.gz", nodeid="x")
+    counts = mirror.sync()
+    assert counts == {
+        "added": 1,
+        "updated": 1,
+        "removed": 0,
+        "unchanged": 1,
+        "failed": 0,
+    }
+    assert fetched() == ["b", "c"]
+    assert mirror.manifest["b"]["fetched"] == 2
+    assert sorted(mirror.to_pandas()["id"].astype(str)) == ["1", "2", "3", "4", "5"]
+
+    # a is removed
+    del datasets[0]
+    assert mirror.sync()["removed"] == 1
+    assert sorted(mirror.partitions()) == ["b", "c"]
+    assert sorted(p.name for p in (tmp_path / "mirror").iterdir()) == [
+        "b.csv.gz",
+        "c.csv.gz",
+        "manifest.json",
+    ]
@@ -1,5 +1,6 @@
 """Tests for occurrences module methods"""
 
+import numpy as np
 import pytest
 import requests
 
@@ -275,3 +276,287 @@ def test_occurrences_search_scientific_names_and_taxonids():
 
     # null check on scientific names
     assert df["scientificName"].notna().all()
+
+
+def test_occurrences_centroids(monkeypatch, obis_api):
+    """
+    occurrences.centroids - one row per key, shared requests for the same taxon
+    and per-key failures reported without aborting the batch
+    """
+    from pyobis.occurrences import occurrences as occ_module
+
+    def respond(url, args):
+        """Centroid of the taxon, or a server error for taxon 2."""
+        if args["taxonid"] == 2:
+            raise requests.HTTPError("500 Server Error")
+        return {"lat": 1.0, "lon": float(args["taxonid"])}
+
+    lookup = {"Mola mola": 1, "Mola": 1, "Abra": 2}
+    obis_api.serve(occ_module, respond)
+    monkeypatch.setattr(
+        occ_module,
+        "resolve_taxonids",
+        lambda names, **kwargs: {name: lookup[name] for name in names},
+    )
+
+    df = occurrences.centroids(
+        by="scientificname",
+        values=["Mola mola", "Mola", "Abra", "Mola mola"],
+    )
+    assert sorted(a["taxonid"] for a in obis_api.args) == [1, 2]
+    assert list(df.index) == ["Mola mola", "Mola", "Abra"]
+    assert df.loc["Mola", "lon"] == 1.0
+    assert df.loc["Abra", "error"].startswith("500")
+    assert df["error"].isna().sum() == 2
+
+
+def serve_occurrences(obis_api, records):
+    """
+    Serve occurrence searches from a list of records instead of the OBIS API
+    """
+    from pyobis import spatial
+    from pyobis.occurrences import occurrences as occ_module
+
+    inside = {}
+
+    def match(record, args):
+        """Whether a record is in the geometry and has one of the names."""
+        geometry = args.get("geometry")
+        if geometry and geometry not in inside:
+            mask = spatial.contains(
+                geometry,
+                [r["decimalLongitude"] for r in records],
+                [r["decimalLatitude"] for r in records],
+            )
+            inside[geometry] = {r["id"] for r, m in zip(records, mask) if m}
+        if geometry and record["id"] not in inside[geometry]:
+            return False
+        names = args.get("scientificname")
+        return not names or record["scientificName"] in names.split(",")
+
+    obis_api.serve_records(occ_module, records, match=match)
+
+
+def test_occurrences_search_split_geometry(obis_api):
+    """
+    occurrences.search - split geometries (including antimeridian crossing ones)
+    return the same records as the exact geometry
+    """
+    records = [
+        {
+            "id": f"{i:04d}",
+            "scientificName": "Mola mola",
+            "decimalLongitude": x,
+            "decimalLatitude": y,
+        }
+        for i, (x, y) in enumerate(
+            [(x, y) for x in range(-180, 180, 5) for y in range(-60, 61, 10)],
+        )
+    ]
+    serve_occurrences(obis_api, records)
+    geometry = "POLYGON((150 -40, -120 -40, -120 40, 150 40, 150 -40))"
+
+    df = occurrences.search(geometry=geometry, split_geometry=8).execute()
+    expected = [
+        r["id"]
+        for r in records
+        if (r["decimalLongitude"] >= 150 or r["decimalLongitude"] <= -120)
+        and -40 <= r["decimalLatitude"] <= 40
+    ]
+    assert sorted(df["id"]) == expected
+    assert len({a["geometry"] for a in obis_api.args}) >= 8
+    assert all("150 -40, -120" not in a["geometry"] for a in obis_api.args)
+
+    df = occurrences.search(geometry=geometry, split_geometry=8, size=5).execute()
+    assert len(df) == 5
+    with pytest.raises(ValueError):
+        occurrences.search(geometry=geometry, split_geometry=8, geometry_cover="bbox")
+
+
+def test_occurrences_search_long_name_list(monkeypatch, obis_api):
+    """
+    occurrences.search - long lists of names are fetched as chunked sub-queries
+    """
+    from pyobis import obisutils
+    from pyobis.occurrences import occurrences as occ_module
+
+    names = [f"Species {i:03d}" for i in range(40)]
+    records = [
+        {
+            "id": f"{i:04d}",
+            "scientificName": names[i % 50] if i % 50 < 40 else "Other",
+            "decimalLongitude": 0,
+            "decimalLatitude": 0,
+        }
+        for i in range(200)
+    ]
+    serve_occurrences(obis_api, records)
+    monkeypatch.setattr(occ_module, "resolve_taxonids", lambda names, **kwargs: {})
+    monkeypatch.setattr(obisutils, "MAX_PARAM_LENGTH", 100)
+
+    df = occurrences.search(scientificname=names).execute()
+    assert sorted(df["id"]) == [
+        r["id"] for r in records if r["scientificName"] != "Other"
+    ]
+    assert len({a["scientificname"] for a in obis_api.args}) == 5
+    assert all(len(a["scientificname"]) <= 100 for a in obis_api.args)
+    assert all(a["taxonid"] is None for a in obis_api.args)
+
+
+def test_occurrences_checklist(obis_api):
+    """
+    occurrences.search - checklists are built from the occurrence records
+    """
+    records = [
+        {
+            "id": f"{i:04d}",
+            "scientificName": "Mola mola" if i % 3 else "Abra alba",
+            "aphiaID": 127405 if i % 3 else 141433,
+            "decimalLongitude": 0,
+            "decimalLatitude": 0,
+        }
+        for i in range(30)
+    ]
+    serve_occurrences(obis_api, records)
+    query = occurrences.search(geometry="POLYGON((-1 -1, 1 -1, 1 1, -1 1, -1 -1))")
+    streamed = query.checklist()
+    assert list(streamed["scientificName"]) == ["Mola mola", "Abra alba"]
+    assert list(streamed["records"]) == [20, 10]
+    query.execute()
+    assert query.checklist().equals(streamed)
+
+
+def test_occurrences_search_sample(obis_api):
+    """
+    occurrences.search - samples are allocated across strata by their counts
+    """
+    from pyobis import statistics
+    from pyobis.occurrences import occurrences as occ_module
+
+    records = [
+        {
+            "id": f"{i:05d}",
+            "year": 2000 if i < 9000 else 2001,
+            "datasetid": "a" if i % 4 else "b",
+        }
+        for i in range(10000)
+    ]
+
+    def match(record, args):
+        """Whether a record is in the year and dataset of the parameters."""
+        if args.get("startdate") and record["year"] != int(args["startdate"][:4]):
+            return False
+        return not args.get("datasetid") or record["datasetid"] == args["datasetid"]
+
+    obis_api.serve_records(occ_module, records, match=match)
+    statistics_answers = {
+        "statistics/years": [
+            {"year": 2000, "records": 9000},
+            {"year": 2001, "records": 1000},
+        ],
+        "statistics": {"records": 10000, "datasets": 2},
+        # counts under the filters, the listed totals of the datasets differ
+        "facet": {
+            "results": {
+                "datasetid": [
+                    {"key": "a", "records": 7500},
+                    {"key": "b", "records": 2500},
+                ],
+            },
+        },
+    }
+    obis_api.serve(
+        statistics,
+        lambda url, args: statistics_answers[url.split("/v3/")[-1]],
+    )
+
+    df = occurrences.search(taxonid=1363, sample=100, stratify_by="year").execute()
+    assert len(df) == 100
+    assert (df["year"] == 2000).sum() == 90
+    assert df["id"].is_unique
+    # the pages are fetched without requesting their total first
+    pages = obis_api.args_of("occurrence")
+    assert len(pages) == 2
+    assert all(0 <= a["offset"] <= 9000 - a["size"] for a in pages)
+    # the sample is not the first records of the strata
+    assert df["id"].min() > "00000"
+
+    # larger samples are spread over several pages of a stratum
+    obis_api.requests.clear()
+    df = occurrences.search(sample=2000, stratify_by="year").execute()
+    assert len(df) == 2000
+    assert df["id"].is_unique
+    pages = obis_api.args_of("occurrence")
+    assert all(a["size"] <= 500 for a in pages)
+    assert len([a for a in pages if a["startdate"] == "2000-01-01"]) == 4
+    assert len({a["offset"] for a in pages}) == len(pages)
+
+    # a sample larger than the records fetches all of them
+    # the positions of the pages are drawn with the seed
+    offsets = {a["offset"] for a in pages}
+    for seed, same in ((0, True), (1, False)):
+        obis_api.requests.clear()
+        occurrences.search(sample=2000, stratify_by="year", seed=seed).execute()
+        assert (
+            {a["offset"] for a in obis_api.args_of("occurrence")} == offsets
+        ) == same
+
+    df = occurrences.search(sample=20000).execute()
+    assert len(df) == 10000
+    assert df["id"].is_unique
+
+    df = occurrences.search(sample=20, stratify_by="dataset").execute()
+    assert df["datasetid"].value_counts().to_dict() == {"a": 15, "b": 5}
+
+    with pytest.raises(ValueError):
+        occurrences.search(sample=10, stratify_by="month")
+    with pytest.raises(ValueError):
+        occurrences.search(sample=10, size=10)
+
+
+def test_occurrences_search_sample_geohash(obis_api):
+    """
+    occurrences.search - geohash strata are fetched within the query geometry
+    """
+    from pyobis import spatial
+    from pyobis.occurrences import occurrences as occ_module
+
+    x = np.arange(3000) % 225 / 10
+    y = np.arange(3000) % 56 / 10
+    records = [
+        {"id": f"{i:05d}", "decimalLongitude": x[i], "decimalLatitude": y[i]}
+        for i in range(3000)
+    ]
+    cells = [(0, 0, 11.25, 5.625), (11.25, 0, 22.5, 5.625)]
+    geometry = "POLYGON((1 1, 15 1, 15 4, 1 4, 1 1))"
+
+    def respond(url, args):
+        """Geohash cells, or the records, within the geometry of the request."""
+        inside = spatial.contains(args["geometry"], x, y)
+        if "/grid/" in url:
+            features = []
+            for minx, miny, maxx, maxy in cells:
+                in_cell = (x >= minx) & (x < maxx) & (y >= miny) & (y < maxy)
+                ring = [[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy]]
+                features.append(
+                    {
+                        "geometry": {"coordinates": [ring + ring[:1]]},
+                        "properties": {"n": int((inside & in_cell).sum())},
+                    },
+                )
+            return {"features": features}
+        found = [r for r, keep in zip(records, inside) if keep]
+        offset = args.get("offset") or 0
+        return {"total": len(found), "results": found[offset:][: args["size"]]}
+
+    obis_api.serve(occ_module, respond)
+    query = occurrences.search(geometry=geometry, sample=200, stratify_by="geohash")
+    df = query.execute()
+    # the records of the pages are all within the geometry, none are dropped
+    assert len(df) == 200
+    assert df["id"].is_unique
+    pages = obis_api.args_of("occurrence")
+    assert [spatial.bbox(a["geometry"]) for a in pages] == [
+        (1, 1, 11.25, 4),
+        (11.25, 1, 15, 4),
+    ]
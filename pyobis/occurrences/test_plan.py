@@ -0,0 +1,141 @@
+"""Tests for extraction plans"""
+
+import numpy as np
+import pytest
+
+from pyobis import statistics
+from pyobis.occurrences import ExtractionPlan, plan
+from pyobis.spatial import contains
+
+
+def make_records(n, undated=0, seed=0):
+    """
+    Random records, clustered in time and space like real extractions
+    """
+    rng = np.random.default_rng(seed)
+    days = np.datetime64("2000-01-01") + (rng.pareto(2, n) * 300).astype(int)
+    return {
+        "date": np.concatenate([days, np.full(undated, np.datetime64("NaT"))]),
+        "depth": rng.uniform(0, 200, n + undated),
+        "x": np.concatenate([rng.normal(3, 1, n), rng.uniform(-170, 170, undated)]),
+        "y": rng.uniform(-60, 60, n + undated),
+    }
+
+
+def matches(records, args):
+    """
+    Mask of the records matching the statistics filters
+    """
+    mask = np.ones(len(records["x"]), dtype=bool)
+    if args.get("startdate"):
+        mask &= records["date"] >= np.datetime64(args["startdate"])
+    if args.get("enddate"):
+        mask &= records["date"] <= np.datetime64(args["enddate"])
+    if args.get("startdepth") is not None:
+        mask &= records["depth"] >= args["startdepth"]
+    if args.get("enddepth") is not None:
+        mask &= records["depth"] <= args["enddepth"]
+    if args.get("geometry"):
+        mask &= contains(args["geometry"], records["x"], records["y"])
+    return mask
+
+
+def serve_statistics(obis_api, records):
+    """
+    Count the in-memory records like the statistics endpoints
+    """
+
+    def respond(url, args):
+        """Counts of the matching records, per year for `/years`."""
+        mask = matches(records, args)
+        if url.endswith("/years"):
+            found = records["date"][mask]
+            found = found[~np.isnat(found)].astype("datetime64[Y]").astype(int) + 1970
+            values, counts = np.unique(found, return_counts=True)
+            return [{"year": int(y), "records": int(n)} for y, n in zip(values, counts)]
+        return {"records": int(mask.sum())}
+
+    obis_api.serve(statistics, respond)
+
+
+def covered(records, extraction):
+    """
+    Number of times every record is fetched by the partitions of a plan
+    """
+    times = np.zeros(len(records["x"]), dtype=int)
+    for query in extraction.queries():
+        mask = matches(records, query)
+        if query.get("geometry_cover"):
+            mask &= matches(records, {"geometry": query["geometry_cover"]})
+        times += mask
+    return times
+
+
+def test_plan_balanced(obis_api):
+    """
+    plan - partitions stay under the target and cover every record once
+    """
+    records = make_records(5000)
+    serve_statistics(obis_api, records)
+    extraction = plan(max_records=400, taxonid=1363)
+    assert len(extraction) > 5000 // 400
+    assert all(p["records"] <= 400 for p in extraction.partitions)
+    assert sum(p["records"] for p in extraction.partitions) == 5000
+    assert (covered(records, extraction) == 1).all()
+    # largest partitions first
+    sizes = extraction.to_pandas()["records"].tolist()
+    assert sizes == sorted(sizes, reverse=True)
+    assert all(q["taxonid"] == 1363 for q in extraction.queries())
+
+
+def test_plan_rejects_lossy_splits(obis_api):
+    """
+    plan - date splits are rejected when records have no date
+    """
+    records = make_records(2000, undated=500)
+    serve_statistics(obis_api, records)
+    extraction = plan(max_records=400, dimensions=["date", "depth"])
+    assert all("startdate" not in p["filters"] for p in extraction.partitions)
+    assert (covered(records, extraction) >= 1).all()
+
+    with pytest.raises(ValueError):
+        plan(dimensions=["time"])
+
+
+def test_plan_geometry_and_reuse(obis_api, tmp_path):
+    """
+    plan - tiles of a query geometry are covers, and saved plans are reused
+    """
+    records = make_records(3000)
+    serve_statistics(obis_api, records)
+    geometry = "POLYGON((0 -50, 6 -50, 6 50, 0 50, 0 -50))"
+    path = tmp_path / "plan.json"
+    extraction = plan(
+        max_records=500,
+        dimensions=["geometry"],
+        geometry=geometry,
+        path=path,
+    )
+    inside = matches(records, {"geometry": geometry})
+    assert all(p["records"] <= 500 for p in extraction.partitions)
+    assert (covered(records, extraction)[inside] == 1).all()
+    queries = extraction.queries(fields="id")
+    assert all(q["geometry"] == geometry and q["fields"] == "id" for q in queries)
+    assert all(q["geometry_cover"].startswith("POLYGON") for q in queries)
+
+    obis_api.requests.clear()
+    again = plan(
+        max_records=500,
+        dimensions=["geometry"],
+        geometry=geometry,
+        path=path,
+    )
+    assert not obis_api.requests
+    assert again.partitions == extraction.partitions
+    assert ExtractionPlan.load(path).to_dict() == extraction.to_dict()
+
+    # a plan of other dimensions is not reused
+    other = plan(max_records=500, dimensions=["depth"], geometry=geometry, path=path)
+    assert obis_api.requests
+    assert other.dimensions == ["depth"]
+    assert ExtractionPlan.load(path).dimensions == ["depth"]
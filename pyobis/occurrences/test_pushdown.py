@@ -0,0 +1,138 @@
+"""Tests for occurrence queries with pushed down filters"""
+
+import pandas as pd
+
+from pyobis import occurrences
+from pyobis.occurrences import col
+from pyobis.occurrences import occurrences as occ_module
+from pyobis.occurrences import within
+
+RECORDS = [
+    {
+        "id": f"{i:04d}",
+        "depth": (i * 7) % 400,
+        "date_year": 1990 + i % 20,
+        "datasetID": "abc"[i % 3],
+        "basisOfRecord": "HumanObservation" if i % 4 else "PreservedSpecimen",
+        "flags": ["ON_LAND"] if i % 10 == 0 else [],
+        "decimalLongitude": i % 10,
+        "decimalLatitude": i % 7,
+    }
+    for i in range(300)
+]
+
+
+def matches(record, args):
+    """
+    Whether a record matches the depth, dataset and flag parameters
+    """
+    if args.get("startdepth") is not None and record["depth"] < args["startdepth"]:
+        return False
+    if args.get("datasetid") and record["datasetID"] != args["datasetid"]:
+        return False
+    return not (args.get("exclude") and args["exclude"] in record["flags"])
+
+
+def test_query_explain():
+    """
+    occurrences.query - supported filters are pushed down, others kept local
+    """
+    query = occurrences.query(taxonid=1363, startdepth=100).where(
+        (col("depth") > 200)
+        & (col("date_year") >= 2000)
+        & col("datasetID").isin(["b", "a"])
+        & ~col("flags").contains("ON_LAND"),
+    )
+    query = query.where(col("basisOfRecord") == "HumanObservation")
+    plan = query.explain()
+    assert [s["datasetid"] for s in plan["searches"]] == ["a", "b"]
+    search = plan["searches"][0]
+    assert search["taxonid"] == 1363
+    assert search["startdepth"] == 200
+    assert search["startdate"] == "2000-01-01"
+    assert search["exclude"] == "ON_LAND"
+    # strict depth bounds and years are checked locally, datasets are not
+    assert "depth" in plan["local"] and "date_year" in plan["local"]
+    assert "basisOfRecord" in plan["local"] and "datasetID" not in plan["local"]
+
+    plan = (
+        occurrences.query()
+        .where((col("depth") >= 10) & (col("depth") >= 50) & (col("depth") <= 80))
+        .explain()
+    )
+    assert plan["searches"] == [{"startdepth": 50, "enddepth": 80}]
+    assert plan["local"] is None
+
+    plan = occurrences.query().where((col("depth") >= 10) | within("POLYGON(...)"))
+    assert plan.explain()["searches"] == [{}]
+
+    plan = occurrences.query(datasetid="a").where(col("datasetID") == "b").explain()
+    assert plan["searches"] == []
+
+
+def test_query_search_filters():
+    """
+    occurrences.query - filters of the search are combined with the pushed
+    down ones
+    """
+    query = occurrences.query(
+        startdepth="100",
+        datasetid="a,b",
+        flags="NO_DEPTH,ON_LAND",
+        exclude=["DATE_IN_FUTURE"],
+    ).where(
+        (col("depth") >= 20)
+        & (col("depth") <= 300)
+        & col("datasetID").isin(["b", "c"])
+        & col("flags").contains("DEPTH_EXCEEDS_BATH")
+        & ~col("flags").contains("ZERO_COORD"),
+    )
+    plan = query.explain()
+    assert plan["searches"] == [
+        {
+            "startdepth": "100",
+            "enddepth": 300,
+            "flags": "DEPTH_EXCEEDS_BATH,NO_DEPTH,ON_LAND",
+            "exclude": "DATE_IN_FUTURE,ZERO_COORD",
+            "datasetid": "b",
+        },
+    ]
+    assert plan["local"] is None
+
+    plan = occurrences.query(startdate="2000-01-01").where(col("date_year") >= 1990)
+    assert plan.explain()["searches"] == [{"startdate": "2000-01-01"}]
+
+    # bounds which cannot be compared are checked locally
+    plan = occurrences.query(startdepth="deep").where(col("depth") >= 20).explain()
+    assert plan["searches"] == [{"startdepth": "deep"}]
+    assert "depth" in plan["local"]
+
+
+def test_query_execute(obis_api):
+    """
+    occurrences.query - results match the same filter applied in pandas
+    """
+    obis_api.serve_records(occ_module, RECORDS, match=matches)
+    query = occurrences.query(fields="id,depth").where(
+        (col("depth") >= 200)
+        & col("datasetID").isin(["a", "c"])
+        & (col("basisOfRecord") == "HumanObservation")
+        & ~col("flags").contains("ON_LAND"),
+    )
+    df = query.execute()
+
+    full = pd.DataFrame(RECORDS)
+    expected = full[
+        (full.depth >= 200)
+        & full.datasetID.isin(["a", "c"])
+        & (full.basisOfRecord == "HumanObservation")
+        & ~full["flags"].map(lambda f: "ON_LAND" in f)
+    ]
+    assert sorted(df["id"]) == sorted(expected["id"])
+    pages = [a for a in obis_api.args if a["size"] > 1]
+    assert sorted(a["datasetid"] for a in pages) == ["a", "c"]
+    assert all(a["startdepth"] == 200 for a in pages)
+    assert pages[0]["fields"] == "id,depth,basisOfRecord"
+
+    streamed = pd.concat(query.iter_pages(), ignore_index=True)
+    assert sorted(streamed["id"]) == sorted(df["id"])
@@ -0,0 +1,139 @@
+"""Tests for sharded extractions"""
+
+import json
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from pyobis import statistics
+from pyobis.occurrences import occurrences as occ_module
+from pyobis.occurrences.shard import ShardedExtraction
+
+RECORDS = [
+    {"id": f"{i:05d}", "depth": i % 200 + 0.5, "scientificName": "Mola mola"}
+    for i in range(1000)
+]
+
+
+def matching(args):
+    """
+    Records matching the depth filters
+    """
+    return [
+        r
+        for r in RECORDS
+        if (args.get("startdepth") is None or r["depth"] >= args["startdepth"])
+        and (args.get("enddepth") is None or r["depth"] <= args["enddepth"])
+    ]
+
+
+def fake_occurrence_GET(url, args, ctype, cache=True, **kwargs):
+    """
+    Occurrence searches of the worker processes, which the fixtures of the
+    tests do not reach
+    """
+    results = matching(args)
+    if args.get("after"):
+        results = [r for r in results if r["id"] > args["after"]]
+    return {"total": len(results), "results": results[: args["size"]]}
+
+
+def run_worker(path, worker_id):
+    """
+    A worker process, served by the fake API
+    """
+    occ_module.obis_GET = fake_occurrence_GET
+    ShardedExtraction(path).work(worker_id=worker_id)
+
+
+def serve_statistics(obis_api):
+    """
+    Count the matching records like the statistics endpoint
+    """
+    obis_api.serve(statistics, lambda url, args: {"records": len(matching(args))})
+
+
+def create(path, obis_api, **kwargs):
+    """
+    Create an extraction of the records, counted by the fake statistics
+    """
+    serve_statistics(obis_api)
+    return ShardedExtraction.create(
+        path,
+        max_records=150,
+        dimensions=["depth"],
+        format="csv.gz",
+        **{"taxonid": 1363, **kwargs},
+    )
+
+
+def test_shard_local_processes(tmp_path, obis_api):
+    """
+    ShardedExtraction - worker processes share the partitions of a plan
+    """
+    extraction = create(tmp_path / "extraction", obis_api)
+    assert len(extraction.plan) > 1000 // 150
+
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=run_worker, args=(str(extraction.path), f"w{i}"))
+        for i in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    status = extraction.status()
+    assert (status["state"] == "done").all()
+    assert set(status["worker"]) <= {"w0", "w1", "w2"}
+    assert not [*(extraction.path / "leases").iterdir()]
+
+    df = extraction.merge(tmp_path / "occurrences.csv.gz")
+    assert sorted(df["id"].astype(int)) == list(range(1000))
+    assert (tmp_path / "occurrences.csv.gz").exists()
+
+
+def test_shard_leases(tmp_path, obis_api):
+    """
+    ShardedExtraction - expired leases are taken over, live ones are not
+    """
+    obis_api.serve(occ_module, lambda url, args: fake_occurrence_GET(url, args, None))
+    extraction = create(tmp_path / "extraction", obis_api)
+    leases = extraction.path / "leases"
+    for index, age in ((0, 3600), (1, 0)):
+        lease = leases / f"{index:05d}.lease"
+        lease.write_text(json.dumps({"worker": "dead" if age else "alive"}))
+        os.utime(lease, (time.time() - age, time.time() - age))
+
+    with pytest.raises(ValueError):
+        extraction.merge()
+    counts = extraction.work(worker_id="w")
+    assert counts == {"done": len(extraction.plan) - 1, "failed": 0}
+    status = extraction.status().set_index("partition")
+    assert status.loc[0, "worker"] == "w"
+    assert (status.loc[1, "state"], status.loc[1, "worker"]) == ("leased", "alive")
+
+    # the same extraction is opened again, a different one is refused
+    assert len(create(extraction.path, obis_api).plan) == len(extraction.plan)
+    with pytest.raises(ValueError):
+        create(extraction.path, obis_api, taxonid=1364)
+
+
+def test_shard_plan_cache(tmp_path, obis_api):
+    """
+    ShardedExtraction.create - the plan is counted with the cache setting of
+    the extraction
+    """
+    serve_statistics(obis_api)
+    ShardedExtraction.create(
+        tmp_path / "extraction",
+        max_records=150,
+        dimensions=["depth"],
+        cache=False,
+        taxonid=1363,
+    )
+    assert obis_api.caches and not any(obis_api.caches)
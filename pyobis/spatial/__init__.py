@@ -0,0 +1,21 @@
+from .spatial import (
+    GridIndex,
+    bbox,
+    bbox_wkt,
+    contains,
+    convex_hull_wkt,
+    cover_wkt,
+    parse_wkt,
+    split_wkt,
+)
+
+__all__ = [
+    "GridIndex",
+    "bbox",
+    "bbox_wkt",
+    "contains",
+    "convex_hull_wkt",
+    "cover_wkt",
+    "parse_wkt",
+    "split_wkt",
+]
@@ -0,0 +1,627 @@
+"""
+Client-side geometry helpers for WKT query geometries.
+
+These allow sending a cheaper (and more cacheable) cover of a detailed polygon
+to the API, and applying the exact polygon locally on the returned coordinates.
+"""
+
+import math
+import re
+
+import numpy as np
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+
+
+def parse_wkt(wkt):
+    """
+    Parse a WKT POLYGON or MULTIPOLYGON into its rings.
+
+    Args:
+        wkt (str): Geometry as Well Known Text
+
+    Returns:
+        list: One list of rings per polygon, each ring an (n, 2) numpy array
+            of (longitude, latitude) pairs. The first ring is the exterior.
+    """
+    text = wkt.strip()
+    kind = text.split("(", 1)[0].strip().upper()
+    if kind not in ("POLYGON", "MULTIPOLYGON"):
+        raise ValueError(
+            f"Only POLYGON and MULTIPOLYGON geometries are supported, got {kind!r}",
+        )
+
+    start = text.index("(")
+    body = text[start:]
+    if kind == "POLYGON":
+        body = "(" + body + ")"
+
+    polygons = []
+    # split into polygons (depth 2) and their rings (depth 3) by nesting depth
+    depth = 0
+    polygon, ring_start = None, None
+    for i, char in enumerate(body):
+        if char == "(":
+            depth += 1
+            if depth == 2:
+                polygon = []
+            elif depth == 3:
+                ring_start = i + 1
+        elif char == ")":
+            if depth == 3:
+                ring = [
+                    [float(v) for v in re.findall(_NUMBER, pair)[:2]]
+                    for pair in body[ring_start:i].split(",")
+                ]
+                polygon.append(np.asarray(ring, dtype=float))
+            elif depth == 2:
+                polygons.append(polygon)
+            depth -= 1
+    if depth != 0 or not polygons:
+        raise ValueError("Malformed WKT geometry")
+    return polygons
+
+
+def _unwrap(polygons):
+    """
+    Make polygons crossing the antimeridian continuous in longitude.
+
+    Rings with an edge spanning more than 180 degrees of longitude (between
+    points not lying on the antimeridian itself) are taken to cross the
+    antimeridian. Their negative longitudes are shifted by 360 degrees, so the
+    polygon extends beyond 180 instead of wrapping around.
+    """
+
+    def crosses(ring):
+        x = ring[:, 0]
+        interior = np.abs(x) < 180
+        return ((np.abs(np.diff(x)) > 180) & interior[:-1] & interior[1:]).any()
+
+    unwrapped = []
+    for polygon in polygons:
+        if any(crosses(ring) for ring in polygon):
+            polygon = [
+                np.column_stack(
+                    [np.where(r[:, 0] < 0, r[:, 0] + 360, r[:, 0]), r[:, 1]],
+                )
+                for r in polygon
+            ]
+        unwrapped.append(polygon)
+    return unwrapped
+
+
+def to_wkt(polygons):
+    """
+    Format rings as returned by `parse_wkt` back into WKT.
+    """
+
+    def ring_text(ring):
+        # adding 0.0 turns negative zeros into zeros
+        return "(" + ", ".join(f"{x + 0.0:.10g} {y + 0.0:.10g}" for x, y in ring) + ")"
+
+    parts = ["(" + ", ".join(ring_text(r) for r in p) + ")" for p in polygons]
+    if len(parts) == 1:
+        return "POLYGON" + parts[0]
+    return "MULTIPOLYGON(" + ", ".join(parts) + ")"
+
+
+def bbox(wkt):
+    """
+    Get the bounding box of a WKT geometry as (minx, miny, maxx, maxy).
+    """
+    points = np.concatenate([p[0] for p in parse_wkt(wkt)])
+    return tuple(float(v) for v in (*points.min(axis=0), *points.max(axis=0)))
+
+
+def bbox_wkt(wkt, precision=1):
+    """
+    Get the bounding box of a WKT geometry as a WKT polygon.
+
+    The box is snapped outwards to `precision` decimal places, so that nearby
+    variants of a detailed geometry produce the same (cacheable) query.
+    """
+    factor = 10**precision
+    minx, miny, maxx, maxy = bbox(wkt)
+    minx, miny = math.floor(minx * factor) / factor, math.floor(miny * factor) / factor
+    maxx, maxy = math.ceil(maxx * factor) / factor, math.ceil(maxy * factor) / factor
+    ring = [(minx, miny), (maxx, miny), (maxx, maxy), (minx, maxy), (minx, miny)]
+    return to_wkt([[ring]])
+
+
+def convex_hull_wkt(wkt):
+    """
+    Get the convex hull of the exterior rings of a WKT geometry as a WKT polygon.
+    """
+    points = np.unique(np.concatenate([p[0] for p in parse_wkt(wkt)]), axis=0)
+    if len(points) < 3:
+        raise ValueError("Cannot build the convex hull of fewer than three points")
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    # Andrew's monotone chain, points are already sorted lexicographically
+    lower, upper = [], []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(tuple(p))
+    for p in points[::-1]:
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(tuple(p))
+    hull = lower[:-1] + upper[:-1]
+    return to_wkt([[hull + [hull[0]]]])
+
+
+def cover_wkt(wkt, method="bbox"):
+    """
+    Get a simplified geometry which fully covers a WKT geometry.
+
+    Args:
+        wkt (str): Geometry as Well Known Text
+        method (str): Either `bbox` for the bounding box or `hull` for the
+            convex hull. Defaults to `bbox`.
+    """
+    if method == "bbox":
+        return bbox_wkt(wkt)
+    if method == "hull":
+        return convex_hull_wkt(wkt)
+    raise ValueError("method must be one of 'bbox' or 'hull'")
+
+
+def contains(wkt, x, y):
+    """
+    Vectorized point-in-polygon test of coordinates against a WKT geometry.
+
+    Uses the even-odd rule, so holes of polygons are excluded. Points on the
+    boundary count as inside. Polygons crossing the antimeridian are supported.
+
+    Args:
+        wkt (str): Geometry as Well Known Text
+        x (array-like): Longitudes
+        y (array-like): Latitudes
+
+    Returns:
+        numpy.ndarray: Boolean mask, True where the point lies inside the geometry
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    polygons = _unwrap(parse_wkt(wkt))
+    # polygons extending beyond 180 degrees also cover the wrapped longitudes
+    if any(p[0][:, 0].max() > 180 for p in polygons):
+        return _contains(polygons, x, y) | _contains(polygons, x + 360, y)
+    return _contains(polygons, x, y)
+
+
+# (edge, point) pairs tested at once, which bounds the memory of the tests
+_BLOCK = 2**20
+
+
+def _contains(polygons, x, y):
+    """
+    Even-odd point-in-polygon test of coordinates against parsed polygons.
+    """
+    result = np.zeros(x.shape, dtype=bool)
+    for polygon in polygons:
+        minx, miny = polygon[0].min(axis=0)
+        maxx, maxy = polygon[0].max(axis=0)
+        candidates = np.flatnonzero(
+            (x >= minx) & (x <= maxx) & (y >= miny) & (y <= maxy),
+        )
+        if not len(candidates):
+            continue
+        px, py = x[candidates], y[candidates]
+        inside = np.zeros(len(candidates), dtype=bool)
+        boundary = np.zeros(len(candidates), dtype=bool)
+        for ring in polygon:
+            ring_inside, ring_boundary = _ring_crossings(ring, px, py)
+            inside ^= ring_inside
+            boundary |= ring_boundary
+        result[candidates] |= inside | boundary
+    return result
+
+
+def _ring_crossings(ring, px, py):
+    """
+    Test points against the edges of a ring, all at once.
+
+    Only the points within the latitude band of an edge can cross or touch
+    it. Points are sorted by latitude, so these are a slice of the sort order,
+    and the (edge, point) pairs to test are built without a Python loop.
+
+    Returns:
+        tuple: Boolean masks of the points with an odd number of edges crossing
+            the ray to their right, and of the points lying on an edge
+    """
+    x1, y1 = ring[:-1, 0], ring[:-1, 1]
+    x2, y2 = ring[1:, 0], ring[1:, 1]
+    order = np.argsort(py, kind="stable")
+    sorted_y = py[order]
+    starts = np.searchsorted(sorted_y, np.minimum(y1, y2), "left")
+    counts = np.searchsorted(sorted_y, np.maximum(y1, y2), "right") - starts
+    totals = np.cumsum(counts)
+
+    crossings = np.zeros(len(px), dtype=np.int64)
+    boundary = np.zeros(len(px), dtype=bool)
+    first = 0
+    while first < len(counts):
+        # the following edges with at most _BLOCK pairs (at least one edge)
+        done = totals[first] - counts[first]
+        last = max(first + 1, int(np.searchsorted(totals, done + _BLOCK, "right")))
+        n = counts[first:last]
+        edge = np.repeat(np.arange(first, last), n)
+        rank = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        point = order[starts[edge] + rank]
+        ex1, ey1, ex2, ey2 = x1[edge], y1[edge], x2[edge], y2[edge]
+        bx, by = px[point], py[point]
+        # points on the edge itself count as inside
+        on_edge = (
+            (np.abs((ex2 - ex1) * (by - ey1) - (ey2 - ey1) * (bx - ex1)) <= 1e-12)
+            & (bx >= np.minimum(ex1, ex2))
+            & (bx <= np.maximum(ex1, ex2))
+        )
+        boundary[point[on_edge]] = True
+        crosses = (ey1 > by) != (ey2 > by)
+        # horizontal edges never cross, their division by zero is ignored
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xcross = ex1 + (by - ey1) * (ex2 - ex1) / (ey2 - ey1)
+        crossings += np.bincount(point[crosses & (bx < xcross)], minlength=len(px))
+        first = last
+    return crossings % 2 == 1, boundary
+
+
+def _clip(points, axis, bound, keep_below):
+    """
+    Clip an open ring to a half plane (a Sutherland-Hodgman stage).
+    """
+    if not len(points):
+        return points
+    previous = np.roll(points, 1, axis=0)
+    if keep_below:
+        inside = points[:, axis] <= bound
+    else:
+        inside = points[:, axis] >= bound
+    # the intersection with the bound comes before the point, for edges
+    # entering or leaving the half plane
+    # edges along the bound give no intersection, their NaNs are not kept
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (bound - previous[:, axis]) / (points[:, axis] - previous[:, axis])
+        intersections = previous + t[:, None] * (points - previous)
+    keep = np.column_stack([inside != np.roll(inside, 1), inside])
+    return np.stack([intersections, points], axis=1)[keep]
+
+
+def _clip_ring(ring, box):
+    """
+    Clip a ring to an axis-aligned box.
+    """
+    minx, miny, maxx, maxy = box
+    points = ring[:-1]
+    for axis, bound, keep_below in (
+        (0, minx, False),
+        (0, maxx, True),
+        (1, miny, False),
+        (1, maxy, True),
+    ):
+        points = _clip(points, axis, bound, keep_below)
+    return points.reshape(-1, 2)
+
+
+def _ring_area(points):
+    """
+    Area of an open ring (shoelace formula).
+    """
+    if len(points) < 3:
+        return 0.0
+    x, y = points[:, 0], points[:, 1]
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+def _signed_area(parts):
+    """
+    Area of polygons given as open rings, the first ring being the exterior
+    and the others holes.
+    """
+    return sum(
+        _ring_area(ring) if i == 0 else -_ring_area(ring)
+        for polygon in parts
+        for i, ring in enumerate(polygon)
+    )
+
+
+def _area(polygons, box):
+    """
+    Area (in square degrees) of the polygons lying within an axis-aligned box.
+    """
+    return _signed_area([[_clip_ring(r, box) for r in p] for p in polygons])
+
+
+def _clip_wkt(wkt, box):
+    """
+    Part of a WKT geometry within an axis-aligned box (with longitudes within
+    [-180, 180]), as WKT, or None when they do not overlap.
+
+    Exterior rings are clipped to the box, so the parts of a concave polygon
+    may remain joined by edges along the box. Holes are only kept when they
+    lie within the box, as clipped holes would touch the exterior ring.
+    """
+    minx, miny, maxx, maxy = box
+    parts = []
+    # polygons crossing the antimeridian extend beyond 180 once unwrapped
+    for shift in (0, 360):
+        x0, x1 = minx + shift, maxx + shift
+        for exterior, *holes in _unwrap(parse_wkt(wkt)):
+            clipped = _clip_ring(exterior, (x0, miny, x1, maxy))
+            if _ring_area(clipped) <= 0:
+                continue
+            rings = [np.vstack([clipped, clipped[:1]])]
+            rings += [
+                h
+                for h in holes
+                if (h[:, 0] > x0).all()
+                and (h[:, 0] < x1).all()
+                and (h[:, 1] > miny).all()
+                and (h[:, 1] < maxy).all()
+            ]
+            parts.append([r - (shift, 0) for r in rings])
+    return to_wkt(parts) if parts else None
+
+
+def _box_wkt(box):
+    """
+    Format an axis-aligned box as a WKT polygon.
+    """
+    minx, miny, maxx, maxy = box
+    return to_wkt(
+        [[[(minx, miny), (maxx, miny), (maxx, maxy), (minx, maxy), (minx, miny)]]],
+    )
+
+
+def split_wkt(wkt, tiles=16, precision=2):
+    """
+    Split a WKT geometry into rectangular tiles covering it.
+
+    The bounding box is bisected recursively, always splitting the tile holding
+    the largest part of the geometry along its longer side, at the position
+    dividing that part in two halves. This gives tiles covering roughly equal
+    areas of the geometry. Each tile is then shrunk to the extent of the part of
+    the geometry it holds, tiles not intersecting the geometry are dropped, and
+    tiles crossing the antimeridian are split in two at 180 degrees.
+
+    Args:
+        wkt (str): Geometry as Well Known Text
+        tiles (int): Number of tiles to bisect the geometry into. Defaults to 16.
+        precision (int): Decimal places the tile edges are rounded to, which keeps
+            the tiles of similar geometries identical (and cacheable). Defaults to 2.
+
+    Returns:
+        list: Tiles as WKT polygons, with longitudes within [-180, 180]
+    """
+    polygons = _unwrap(parse_wkt(wkt))
+    points = np.concatenate([p[0] for p in polygons])
+    boxes = [(*points.min(axis=0), *points.max(axis=0))]
+    areas = [_area(polygons, boxes[0])]
+
+    while len(boxes) < tiles:
+        largest = int(np.argmax(areas))
+        minx, miny, maxx, maxy = box = boxes[largest]
+        axis = 0 if maxx - minx >= maxy - miny else 1
+        low, high = box[axis], box[axis + 2]
+        if high - low <= 1e-6 or areas[largest] <= 0:
+            break
+
+        def halves(cut):
+            first = (minx, miny, cut, maxy) if axis == 0 else (minx, miny, maxx, cut)
+            second = (cut, miny, maxx, maxy) if axis == 0 else (minx, cut, maxx, maxy)
+            return first, second
+
+        # bisection on the cut position dividing the area in two halves, the
+        # geometry is clipped to the tile once and then only along the cut
+        parts = [[_clip_ring(r, box) for r in p] for p in polygons]
+        lo, hi = low, high
+        for _ in range(30):
+            cut = (lo + hi) / 2
+            below = [[_clip(r, axis, cut, True) for r in p] for p in parts]
+            if _signed_area(below) < areas[largest] / 2:
+                lo = cut
+            else:
+                hi = cut
+        cut = round((lo + hi) / 2, precision)
+        if not low < cut < high:
+            cut = (lo + hi) / 2
+        first, second = halves(cut)
+        boxes[largest] = first
+        boxes.insert(largest + 1, second)
+        areas[largest] = _area(polygons, first)
+        areas.insert(largest + 1, _area(polygons, second))
+
+    factor = 10**precision
+    result = []
+    for box, area in zip(boxes, areas):
+        if area <= 0:
+            continue
+        # shrink the tile to the part of the geometry it holds
+        clipped = np.concatenate(
+            [_clip_ring(p[0], box) for p in polygons if _area([p[:1]], box) > 0],
+        )
+        # round outwards, ignoring floating point noise below the precision
+        minx, miny = np.floor(np.round(clipped.min(axis=0) * factor, 6)) / factor
+        maxx, maxy = np.ceil(np.round(clipped.max(axis=0) * factor, 6)) / factor
+        if maxx <= minx or maxy <= miny:
+            continue
+        if minx < 180 < maxx:
+            result += [
+                _box_wkt((minx, miny, 180, maxy)),
+                _box_wkt((-180, miny, maxx - 360, maxy)),
+            ]
+        elif minx >= 180:
+            result.append(_box_wkt((minx - 360, miny, maxx - 360, maxy)))
+        else:
+            result.append(_box_wkt((minx, miny, maxx, maxy)))
+    return result
+
+
+class GridIndex:
+    """
+    A uniform grid spatial index over point coordinates.
+
+    Points are bucketed into square cells and sorted by cell, so the points of
+    any run of cells are a contiguous slice of the sort order. Queries return
+    positional row indices into the indexed coordinates, so a DataFrame can be
+    subset with `df.iloc[...]` without building intermediate geometries.
+    """
+
+    def __init__(self, x, y, cell_size=1.0):
+        """
+        Build the index.
+
+        Args:
+            x (array-like): Longitudes
+            y (array-like): Latitudes
+            cell_size (float): Size of the grid cells in degrees. Defaults to 1.
+        """
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.cell_size = cell_size
+        valid = np.flatnonzero(~(np.isnan(self.x) | np.isnan(self.y)))
+
+        self.__ncols = int(np.ceil(360 / cell_size)) + 1
+        self.__nrows = int(np.ceil(180 / cell_size)) + 1
+        cols, rows = self.__cell(self.x[valid], self.y[valid])
+        cells = rows.astype(np.int64) * self.__ncols + cols
+        order = np.argsort(cells, kind="stable")
+        self.__order = valid[order]
+        # only the occupied cells are kept, so fine grids stay small: the
+        # points of cells[i] are the slice starts[i]:starts[i + 1] of the order
+        self.__cells, starts = np.unique(cells[order], return_index=True)
+        self.__starts = np.append(starts, len(order))
+        # cell bounds of the indexed points
+        self.__bounds = (
+            (cols.min(), cols.max(), rows.min(), rows.max()) if len(valid) else None
+        )
+
+    @classmethod
+    def from_frame(cls, df, cell_size=1.0, x="decimalLongitude", y="decimalLatitude"):
+        """
+        Build the index over the coordinate columns of a DataFrame.
+        """
+        return cls(df[x].to_numpy(), df[y].to_numpy(), cell_size=cell_size)
+
+    def __len__(self):
+        """Number of indexed points."""
+        return len(self.__order)
+
+    def __cell(self, x, y):
+        """Column and row of the cells holding the coordinates."""
+        cols = np.clip(((x + 180) // self.cell_size).astype(int), 0, self.__ncols - 1)
+        rows = np.clip(((y + 90) // self.cell_size).astype(int), 0, self.__nrows - 1)
+        return cols, rows
+
+    def __points_in_cells(self, c0, c1, r0, r1):
+        """
+        Indices of the points in rectangles of cells (arrays of bounds,
+        included), with the rectangle holding every point.
+        """
+        nrows = np.maximum(r1 - r0 + 1, 0)
+        rect = np.repeat(np.arange(len(c0)), nrows)
+        # rows of every rectangle, one (rectangle, row) pair each
+        row = (
+            r0[rect] + np.arange(len(rect)) - np.repeat(np.cumsum(nrows) - nrows, nrows)
+        )
+        first = row.astype(np.int64) * self.__ncols
+        lo = self.__starts[np.searchsorted(self.__cells, first + c0[rect])]
+        hi = self.__starts[np.searchsorted(self.__cells, first + c1[rect] + 1)]
+        counts = np.maximum(hi - lo, 0)
+        positions = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(
+            counts.sum(),
+        )
+        return np.repeat(rect, counts), self.__order[positions]
+
+    def __query_box(self, minx, miny, maxx, maxy):
+        """Indices of the points in the cells overlapping a box."""
+        cols, rows = self.__cell(np.array([minx, maxx]), np.array([miny, maxy]))
+        return self.__points_in_cells(cols[:1], cols[1:], rows[:1], rows[1:])[1]
+
+    def within(self, polygons):
+        """
+        Find the points within one or many WKT polygons.
+
+        Args:
+            polygons (str or list): A WKT geometry or a list of them
+
+        Returns:
+            numpy.ndarray or list: Sorted row indices of the points within each
+                polygon, a single array if a single polygon was given
+        """
+        if isinstance(polygons, str):
+            return self.within([polygons])[0]
+
+        result = []
+        for wkt in polygons:
+            points = np.concatenate([p[0] for p in _unwrap(parse_wkt(wkt))])
+            minx, miny = points.min(axis=0)
+            maxx, maxy = points.max(axis=0)
+            boxes = [(minx, miny, maxx, maxy)]
+            # polygons crossing the antimeridian cover both ends of the grid
+            if maxx > 180:
+                boxes = [(minx, miny, 180, maxy), (-180, miny, maxx - 360, maxy)]
+            candidates = np.concatenate([self.__query_box(*b) for b in boxes])
+            mask = contains(wkt, self.x[candidates], self.y[candidates])
+            result.append(np.sort(candidates[mask]))
+        return result
+
+    def nearest(self, x, y):
+        """
+        Find the nearest indexed point to each of the given coordinates.
+
+        Distances are planar, in degrees.
+
+        Args:
+            x (array-like): Longitudes of the query points
+            y (array-like): Latitudes of the query points
+
+        Returns:
+            tuple: Row indices of the nearest points (-1 if the index is empty)
+                and the distances to them
+        """
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        indices = np.full(len(x), -1, dtype=int)
+        distances = np.full(len(x), np.inf)
+        if not len(self):
+            return indices, distances
+
+        # the query points are searched together, in square windows of cells
+        # around them whose radius doubles until their nearest point is found
+        x0, x1, y0, y1 = self.__bounds
+        active = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+        cols, rows = self.__cell(x[active], y[active])
+        radius = 0
+        while len(active):
+            query, candidates = self.__points_in_cells(
+                np.maximum(cols - radius, x0),
+                np.minimum(cols + radius, x1),
+                np.maximum(rows - radius, y0),
+                np.minimum(rows + radius, y1),
+            )
+            d = np.hypot(
+                self.x[candidates] - x[active][query],
+                self.y[candidates] - y[active][query],
+            )
+            # the nearest candidate of every query point
+            best = np.lexsort((d, query))
+            query, candidates, d = query[best], candidates[best], d[best]
+            first = np.r_[True, query[1:] != query[:-1]] if len(query) else []
+            query, candidates, d = query[first], candidates[first], d[first]
+            # points outside the searched cells are at least `radius` cells
+            # away, so the nearest candidate is final
+            covers = (cols - radius <= x0) & (cols + radius >= x1)
+            covers &= (rows - radius <= y0) & (rows + radius >= y1)
+            found = (d <= radius * self.cell_size) | covers[query]
+            indices[active[query[found]]] = candidates[found]
+            distances[active[query[found]]] = d[found]
+            done = np.zeros(len(active), dtype=bool)
+            done[query[found]] = True
+            active, cols, rows = active[~done], cols[~done], rows[~done]
+            radius = 2 * radius or 1
+        return indices, distances
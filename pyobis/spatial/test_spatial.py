@@ -0,0 +1,171 @@
+"""Tests for spatial module"""
+
+import numpy as np
+import pytest
+
+from pyobis import spatial
+
+POLYGON = "POLYGON((30.1 10.1, 10 20, 20 40, 40 40, 30.1 10.1))"
+MULTIPOLYGON = (
+    "MULTIPOLYGON(((0 0, 10 0, 10 10, 0 10, 0 0), (2 2, 8 2, 8 8, 2 8, 2 2)),"
+    " ((20 20, 30 20, 30 30, 20 20)))"
+)
+
+
+def test_parse_wkt():
+    """
+    spatial.parse_wkt - polygons, holes and unsupported geometries
+    """
+    polygons = spatial.parse_wkt(MULTIPOLYGON)
+    assert len(polygons) == 2
+    assert len(polygons[0]) == 2
+    assert polygons[1][0].shape == (4, 2)
+    with pytest.raises(ValueError):
+        spatial.parse_wkt("POINT(1 2)")
+
+
+def test_covers():
+    """
+    spatial.bbox_wkt, spatial.convex_hull_wkt - covers contain the geometry
+    """
+    assert spatial.bbox(POLYGON) == (10.0, 10.1, 40.0, 40.0)
+    assert (
+        spatial.bbox_wkt(POLYGON)
+        == "POLYGON((10 10.1, 40 10.1, 40 40, 10 40, 10 10.1))"
+    )
+    assert spatial.bbox_wkt(
+        "POLYGON((0.123 0.151, 1.17 0.151, 1.17 1.01, 0.123 0.151))",
+    ) == ("POLYGON((0.1 0.1, 1.2 0.1, 1.2 1.1, 0.1 1.1, 0.1 0.1))")
+    hull = spatial.convex_hull_wkt("POLYGON((0 0, 10 0, 5 2, 10 10, 0 10, 0 0))")
+    assert hull == "POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))"
+
+    rng = np.random.default_rng(42)
+    x, y = rng.uniform(0, 50, 1000), rng.uniform(0, 50, 1000)
+    inside = spatial.contains(POLYGON, x, y)
+    for method in ("bbox", "hull"):
+        cover = spatial.cover_wkt(POLYGON, method)
+        assert spatial.contains(cover, x, y)[inside].all()
+
+
+def test_contains():
+    """
+    spatial.contains - vectorized point in polygon with holes
+    """
+    mask = spatial.contains(MULTIPOLYGON, [1, 5, 25, 28, 50], [1, 5, 21, 22, 50])
+    assert mask.tolist() == [True, False, True, True, False]
+
+
+def test_split_wkt():
+    """
+    spatial.split_wkt - balanced tiles, empty tiles and the antimeridian
+    """
+    tiles = spatial.split_wkt("POLYGON((0 0, 40 0, 40 10, 0 10, 0 0))", tiles=4)
+    assert tiles == [
+        "POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))",
+        "POLYGON((10 0, 20 0, 20 10, 10 10, 10 0))",
+        "POLYGON((20 0, 30 0, 30 10, 20 10, 20 0))",
+        "POLYGON((30 0, 40 0, 40 10, 30 10, 30 0))",
+    ]
+    tiles = spatial.split_wkt(
+        "MULTIPOLYGON(((0 0, 1 0, 1 1, 0 1, 0 0)), ((50 50, 51 50, 51 51, 50 51, 50 50)))",
+        tiles=2,
+    )
+    assert tiles[1] == "POLYGON((50 50, 51 50, 51 51, 50 51, 50 50))"
+
+    antimeridian = "POLYGON((170 -10, -170 -10, -170 10, 170 10, 170 -10))"
+    tiles = spatial.split_wkt(antimeridian, tiles=2)
+    assert tiles == [
+        "POLYGON((170 -10, 180 -10, 180 10, 170 10, 170 -10))",
+        "POLYGON((-180 -10, -170 -10, -170 10, -180 10, -180 -10))",
+    ]
+    tiles = spatial.split_wkt(
+        "POLYGON((160 -10, -170 -10, -170 10, 160 10, 160 -10))",
+        tiles=1,
+    )
+    assert tiles == [
+        "POLYGON((160 -10, 180 -10, 180 10, 160 10, 160 -10))",
+        "POLYGON((-180 -10, -170 -10, -170 10, -180 10, -180 -10))",
+    ]
+    assert all(-180 <= b <= 180 for t in tiles for b in spatial.bbox(t))
+    assert spatial.contains(antimeridian, [175, -175, 0], [0, 0, 0]).tolist() == [
+        True,
+        True,
+        False,
+    ]
+
+
+def test_clip_wkt():
+    """
+    spatial._clip_wkt - parts of geometries within boxes, across the antimeridian
+    """
+    from pyobis.spatial.spatial import _clip_wkt
+
+    assert _clip_wkt(MULTIPOLYGON, (-5, -5, 20, 20)) == (
+        "POLYGON((0 0, 10 0, 10 10, 0 10, 0 0), (2 2, 8 2, 8 8, 2 8, 2 2))"
+    )
+    # holes crossing the box are dropped
+    assert (
+        _clip_wkt(MULTIPOLYGON, (5, -5, 20, 5))
+        == "POLYGON((5 5, 5 0, 10 0, 10 5, 5 5))"
+    )
+    assert _clip_wkt(MULTIPOLYGON, (40, 40, 50, 50)) is None
+    antimeridian = "POLYGON((170 -10, -170 -10, -170 10, 170 10, 170 -10))"
+    clipped = _clip_wkt(antimeridian, (-180, 0, -135, 45))
+    assert clipped == "POLYGON((-180 0, -170 0, -170 10, -180 10, -180 0))"
+
+
+def test_grid_index():
+    """
+    spatial.GridIndex - within and nearest agree with brute force
+    """
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(-180, 180, 5000), rng.uniform(-90, 90, 5000)
+    x[0], y[0] = np.nan, np.nan
+    index = spatial.GridIndex(x, y, cell_size=5)
+    assert len(index) == 4999
+
+    polygons = [
+        POLYGON,
+        MULTIPOLYGON,
+        "POLYGON((170 -10, -170 -10, -170 10, 170 10, 170 -10))",
+    ]
+    for wkt, rows in zip(polygons, index.within(polygons)):
+        assert rows.tolist() == np.flatnonzero(spatial.contains(wkt, x, y)).tolist()
+
+    qx, qy = rng.uniform(-180, 180, 50), rng.uniform(-90, 90, 50)
+    rows, distances = index.nearest(qx, qy)
+    for i in range(len(qx)):
+        d = np.hypot(x - qx[i], y - qy[i])
+        assert rows[i] == np.nanargmin(d)
+        assert distances[i] == np.nanmin(d)
+
+    # fine grids only hold the occupied cells
+    fine = spatial.GridIndex(x, y, cell_size=0.001)
+    assert fine.within(POLYGON).tolist() == index.within(POLYGON).tolist()
+    fine_rows, fine_distances = fine.nearest(np.r_[qx, np.nan], np.r_[qy, 0])
+    assert fine_rows[:-1].tolist() == rows.tolist()
+    assert fine_distances[:-1].tolist() == distances.tolist()
+    assert fine_rows[-1] == -1
+
+
+def test_detailed_polygon():
+    """
+    spatial.contains, spatial.split_wkt - polygons with thousands of vertices
+    """
+    angles = np.linspace(0, 2 * np.pi, 5000)
+    ring = ", ".join(f"{10 * np.cos(a):.6f} {10 * np.sin(a):.6f}" for a in angles)
+    circle = f"POLYGON(({ring}))"
+
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(-12, 12, 20000), rng.uniform(-12, 12, 20000)
+    radius = np.hypot(x, y)
+    mask = spatial.contains(circle, x, y)
+    clear = np.abs(radius - 10) > 1e-3
+    assert (mask[clear] == (radius[clear] < 10)).all()
+
+    tiles = spatial.split_wkt(circle, tiles=8)
+    assert len(tiles) == 8
+    covered = np.zeros(len(x), dtype=bool)
+    for tile in tiles:
+        covered |= spatial.contains(tile, x, y)
+    assert covered[mask].all()
@@ -0,0 +1,3 @@
+from .statistics import StatisticsResponse, composition, facet, qc, summary, years
+
+__all__ = ["summary", "years", "qc", "composition", "facet", "StatisticsResponse"]
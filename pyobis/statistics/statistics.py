@@ -0,0 +1,227 @@
+"""
+/statistics/ and /facet/ API endpoints as documented on https://api.obis.org/.
+
+Counts are aggregated on the server, so summaries of millions of records cost
+a single small (and cached) request.
+"""
+
+import pandas as pd
+
+from ..obisutils import (
+    build_api_url,
+    handle_arrint,
+    handle_arrstr,
+    integer_series,
+    obis_baseurl,
+    obis_GET,
+)
+
+
+class StatisticsResponse:
+    """
+    An OBIS Statistics Response Object
+    """
+
+    def __init__(self, url, args, cache=True):
+        """
+        Initialise the object parameters
+        """
+        self.data = None
+        self.api_url = build_api_url(url, args)
+        self.mapper_url = None
+
+        # private members
+        self.__url = url
+        self.__args = args
+        self.__cache = cache
+
+    def execute(self, **kwargs):
+        """
+        Execute or fetch the data based on the query
+        """
+        self.data = obis_GET(
+            self.__url,
+            self.__args,
+            "application/json; charset=utf-8",
+            cache=self.__cache,
+            **kwargs,
+        )
+        return self.data
+
+    def to_pandas(self):
+        """
+        Convert the counts into a typed pandas DataFrame. Facets are returned
+        in long format, with the `facet`, `key` and `records` columns. Integer
+        counts are stored as integers (nullable where missing).
+
+        The query is executed first if needed.
+        """
+        if self.data is None:
+            self.execute()
+        return _typed_frame(_records(self.data))
+
+
+def _records(data):
+    """
+    Flatten the responses of the aggregation endpoints into records
+    """
+    if isinstance(data, dict) and "results" in data:
+        data = data["results"]
+    if isinstance(data, list):
+        return data
+    if (
+        isinstance(data, dict)
+        and data
+        and all(isinstance(v, list) for v in data.values())
+    ):
+        # facets, by facet name
+        return [
+            {"facet": facet, **item} for facet, items in data.items() for item in items
+        ]
+    return [data]
+
+
+def _typed_frame(records):
+    """
+    Build a DataFrame of counts, with integer columns where all the values are
+    whole numbers
+    """
+    df = pd.DataFrame(records)
+    for column in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[column]) or df[column].dtype == bool:
+            continue
+        df[column] = integer_series(df[column])
+    return df
+
+
+def _filter_args(
+    scientificname=None,
+    taxonid=None,
+    nodeid=None,
+    datasetid=None,
+    startdate=None,
+    enddate=None,
+    startdepth=None,
+    enddepth=None,
+    geometry=None,
+    flags=None,
+    hasextensions=None,
+    **kwargs,
+):
+    """
+    Query parameters of the occurrence filters, as in `occurrences.search`
+    """
+    return {
+        "taxonid": handle_arrint(taxonid),
+        "nodeid": nodeid,
+        "datasetid": datasetid,
+        "scientificname": handle_arrstr(scientificname),
+        "startdate": startdate,
+        "enddate": enddate,
+        "startdepth": startdepth,
+        "enddepth": enddepth,
+        "geometry": geometry,
+        "flags": flags,
+        "hasextensions": hasextensions,
+        **kwargs,
+    }
+
+
+def summary(cache=True, **kwargs):
+    """
+    Get the number of records, species, taxa and datasets (and other totals)
+    of the occurrences matching the filters.
+
+    :param kwargs: Occurrence filters, with the same names as in
+        `occurrences.search`: scientificname, taxonid, nodeid, datasetid,
+        startdate, enddate, startdepth, enddepth, geometry, flags, hasextensions
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+
+    :return: A StatisticsResponse object
+
+    Usage::
+
+        from pyobis import statistics
+        statistics.summary(taxonid=1363).to_pandas()
+    """
+    url = obis_baseurl + "statistics"
+    return StatisticsResponse(url, _filter_args(**kwargs), cache=cache)
+
+
+def years(cache=True, **kwargs):
+    """
+    Get the number of records per year of the occurrences matching the filters.
+
+    :param kwargs: Occurrence filters, as in `summary`
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+
+    :return: A StatisticsResponse object
+
+    Usage::
+
+        from pyobis import statistics
+        statistics.years(scientificname="Mola mola").to_pandas()
+    """
+    url = obis_baseurl + "statistics/years"
+    return StatisticsResponse(url, _filter_args(**kwargs), cache=cache)
+
+
+def qc(cache=True, **kwargs):
+    """
+    Get the number of records per quality control flag of the occurrences
+    matching the filters.
+
+    :param kwargs: Occurrence filters, as in `summary`
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+
+    :return: A StatisticsResponse object
+
+    Usage::
+
+        from pyobis import statistics
+        statistics.qc(datasetid="ec9df3b9-3b2b-4d83-881b-27bcbcd57b95").to_pandas()
+    """
+    url = obis_baseurl + "statistics/qc"
+    return StatisticsResponse(url, _filter_args(**kwargs), cache=cache)
+
+
+def composition(cache=True, **kwargs):
+    """
+    Get the taxonomic composition (number of records per taxon) of the
+    occurrences matching the filters.
+
+    :param kwargs: Occurrence filters, as in `summary`
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+
+    :return: A StatisticsResponse object
+
+    Usage::
+
+        from pyobis import statistics
+        statistics.composition(nodeid="4bf79a01-65a9-4db6-b37b-18434f26ddfc").to_pandas()
+    """
+    url = obis_baseurl + "statistics/composition"
+    return StatisticsResponse(url, _filter_args(**kwargs), cache=cache)
+
+
+def facet(facets, top=10, cache=True, **kwargs):
+    """
+    Get the number of records per value of one or more fields (facets) of the
+    occurrences matching the filters.
+
+    :param facets: [String, Array] Fields to count, e.g. 'datasetid', 'year',
+        'originalScientificName' or 'species'
+    :param top: [Fixnum] Number of values per facet, most frequent first. Default: 10
+    :param kwargs: Occurrence filters, as in `summary`
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+
+    :return: A StatisticsResponse object
+
+    Usage::
+
+        from pyobis import statistics
+        statistics.facet(["datasetid", "year"], top=100, taxonid=1363).to_pandas()
+    """
+    url = obis_baseurl + "facet"
+    args = {"facets": handle_arrstr(facets), "top": top, **_filter_args(**kwargs)}
+    return StatisticsResponse(url, args, cache=cache)
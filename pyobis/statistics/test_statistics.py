@@ -0,0 +1,65 @@
+"""Tests for statistics module"""
+
+from pyobis import statistics
+
+
+def serve(obis_api, responses):
+    """
+    Serve the aggregation endpoints from canned responses, by endpoint
+    """
+    obis_api.serve(statistics, lambda url, args: responses[url.split("/v3/")[-1]])
+
+
+def test_statistics_years(obis_api):
+    """
+    statistics.years - typed counts per year, with the occurrence filters
+    """
+    serve(
+        obis_api,
+        {
+            "statistics/years": [
+                {"year": 2001, "records": 5},
+                {"year": 2002, "records": 7.0},
+            ],
+        },
+    )
+    query = statistics.years(scientificname=["Mola mola", "Abra alba"], startdepth=10)
+    assert "scientificname=Mola+mola%2CAbra+alba" in query.api_url
+    df = query.to_pandas()
+    assert list(df["year"]) == [2001, 2002]
+    assert df["records"].dtype == "int64"
+    assert obis_api.args[0]["startdepth"] == 10
+
+
+def test_statistics_summary_and_facets(obis_api):
+    """
+    statistics.summary, statistics.facet - one row of totals, long facets
+    """
+    serve(
+        obis_api,
+        {
+            "statistics": {"records": 100, "species": 3, "datasets": 2, "taxa": None},
+            "facet": {
+                "results": {
+                    "datasetid": [
+                        {"key": "a", "records": 60},
+                        {"key": "b", "records": 40},
+                    ],
+                    "year": [{"key": 2001, "records": 100}],
+                },
+            },
+        },
+    )
+    df = statistics.summary(nodeid="x").to_pandas()
+    assert len(df) == 1
+    assert df.loc[0, "records"] == 100
+
+    query = statistics.facet(["datasetid", "year"], top=5, nodeid="x")
+    assert "facets=datasetid%2Cyear" in query.api_url
+    df = query.to_pandas()
+    assert list(df["facet"]) == ["datasetid", "datasetid", "year"]
+    assert df["records"].dtype == "int64"
+    assert df.groupby("facet")["records"].sum().to_dict() == {
+        "datasetid": 100,
+        "year": 100,
+    }
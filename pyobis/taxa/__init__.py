@@ -1,3 +1,27 @@
-from .taxa import TaxaResponse, annotations, search, taxon
+from .autocomplete import PrefixIndex, get_default_prefix_index
+from .store import TaxonStore, get_default_store
+from .taxa import (
+    TaxaResponse,
+    annotations,
+    annotations_many,
+    resolve_taxonids,
+    search,
+    search_many,
+    taxon,
+    taxon_many,
+)
 
-__all__ = ["search", "taxon", "annotations", "TaxaResponse"]
+__all__ = [
+    "search",
+    "taxon",
+    "annotations",
+    "taxon_many",
+    "search_many",
+    "annotations_many",
+    "resolve_taxonids",
+    "TaxaResponse",
+    "TaxonStore",
+    "get_default_store",
+    "PrefixIndex",
+    "get_default_prefix_index",
+]
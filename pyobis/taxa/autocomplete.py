@@ -0,0 +1,199 @@
+"""
+In-memory prefix index for fast taxon name completion.
+"""
+
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from time import time
+
+from ..cache.cache import _DEFAULT_EXPIRE_AFTER
+from .store import get_default_store
+from .taxa import _complete
+
+# maximum number of matches returned by the taxon/complete endpoint, a shorter
+# answer therefore holds every taxon starting with the prefix
+REMOTE_LIMIT = 10
+# maximum number of complete remote answers kept in memory
+MAX_ANSWERS = 4096
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_prefix_index():
+    """
+    Get the shared prefix index, backed by the default taxon store.
+
+    Returns:
+        PrefixIndex: The default prefix index.
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = PrefixIndex(store=get_default_store())
+        return _default_index
+
+
+class PrefixIndex:
+    """
+    Prefix index over scientific names, kept as a sorted array of lowercased
+    names so completions are a binary search away.
+
+    The remote endpoint ranks its matches by relevance and returns at most
+    `REMOTE_LIMIT` of them, so a completion is only answered locally when the
+    endpoint answered a shorter prefix in full: the answer is then that remote
+    answer, narrowed down to the longer prefix, in the same order and with the
+    same records. Complete answers are kept in memory (the `max_answers` most
+    recently used, until they expire) and in the taxon store, if any, which
+    keeps them across sessions. Otherwise the remote endpoint is asked, and its
+    answer is merged into the index.
+    """
+
+    def __init__(
+        self,
+        records=(),
+        store=None,
+        max_answers=MAX_ANSWERS,
+        expire_after=_DEFAULT_EXPIRE_AFTER,
+    ):
+        """
+        Build the index.
+
+        Args:
+            records (iterable): Taxon records holding `id` and `scientificName`
+            store (TaxonStore, optional): Store keeping the complete remote
+                answers. Defaults to None (answers are only kept in memory).
+            max_answers (int): Maximum number of complete remote answers kept
+                in memory. Defaults to 4096.
+            expire_after (int, optional): Time in seconds after which answers
+                kept in memory are asked again. None keeps them forever.
+                Defaults to 86400 (1 day), as the HTTP cache.
+        """
+        self.__lock = threading.Lock()
+        self.__keys = []
+        self.__records = {}
+        self.store = store
+        self.max_answers = max_answers
+        self.expire_after = expire_after
+        # complete remote answers, by lowercased prefix, least recently used
+        # first, with the time they were received
+        self.__answers = OrderedDict()
+        self.add(records)
+
+    def __len__(self):
+        """Number of indexed names."""
+        return len(self.__keys)
+
+    def add(self, records):
+        """
+        Add taxon records to the index.
+
+        Args:
+            records (iterable): Taxon records holding `id` (or `taxonID`)
+                and `scientificName`
+        """
+        with self.__lock:
+            new = []
+            for record in records:
+                name = record.get("scientificName")
+                taxonid = record.get("id", record.get("taxonID"))
+                if not name or taxonid is None:
+                    continue
+                key = name.lower()
+                if key not in self.__records:
+                    new.append(key)
+                self.__records[key] = {**record, "id": taxonid}
+            if new:
+                # a single sort, which merges the sorted keys with the new ones
+                self.__keys += new
+                self.__keys.sort()
+
+    def local(self, prefix, limit=REMOTE_LIMIT):
+        """
+        Complete a prefix from the indexed names only, e.g. offline.
+
+        Args:
+            prefix (str): Start of a scientific name (case insensitive)
+            limit (int): Maximum number of matches
+
+        Returns:
+            list: Matching taxon records in alphabetical order, which puts an
+                exact match first
+        """
+        key = prefix.lower()
+        with self.__lock:
+            i = bisect_left(self.__keys, key)
+            records = []
+            while i < len(self.__keys) and len(records) < limit:
+                if not self.__keys[i].startswith(key):
+                    break
+                records.append(self.__records[self.__keys[i]])
+                i += 1
+        return records
+
+    def __remember(self, prefix, matches):
+        """Keep a complete remote answer in memory."""
+        with self.__lock:
+            self.__answers[prefix.lower()] = (time(), matches)
+            self.__answers.move_to_end(prefix.lower())
+            while len(self.__answers) > self.max_answers:
+                self.__answers.popitem(last=False)
+
+    def __answer(self, prefix):
+        """
+        Remote answer for a prefix, derived from the complete remote answer of
+        the prefix or a shorter one. None if there is no such answer.
+        """
+        key = prefix.lower()
+        expired = time() - self.expire_after if self.expire_after is not None else 0
+        with self.__lock:
+            for i in range(len(key), 0, -1):
+                if key[:i] not in self.__answers:
+                    continue
+                received, answer = self.__answers[key[:i]]
+                if received < expired:
+                    del self.__answers[key[:i]]
+                    continue
+                self.__answers.move_to_end(key[:i])
+                return [
+                    m for m in answer if m["scientificName"].lower().startswith(key)
+                ]
+        if self.store is None:
+            return None
+        answer = self.store.completion(prefix)
+        if answer is not None:
+            self.__remember(prefix, answer)
+        return answer
+
+    def answerable(self, prefix):
+        """
+        Whether a prefix can be completed without the remote endpoint.
+        """
+        return self.__answer(prefix) is not None
+
+    def complete(self, prefix, limit=REMOTE_LIMIT, cache=True):
+        """
+        Complete a prefix, asking the remote endpoint only if needed.
+
+        Args:
+            prefix (str): Start of a scientific name
+            limit (int): Maximum number of matches
+            cache (bool, optional): Whether to use caching. Without caching the
+                remote endpoint is always asked. Defaults to True.
+
+        Returns:
+            list: Matching taxon records, as returned by the remote endpoint
+        """
+        if cache:
+            answer = self.__answer(prefix)
+            if answer is not None:
+                return answer[:limit]
+
+        matches = _complete(prefix, cache=cache)
+        self.add(matches)
+        if len(matches) < REMOTE_LIMIT:
+            self.__remember(prefix, matches)
+            if cache and self.store is not None:
+                self.store.add_completion(prefix, matches)
+        return matches[:limit]
@@ -0,0 +1,397 @@
+"""
+Persistent local taxon dictionary backed by SQLite.
+
+Taxon records seen in any taxon response are written through to the store, so
+name -> id and id -> record lookups can later be answered without the API,
+until they expire like the HTTP cache. Complete answers of the name completion
+endpoint are kept too, to complete longer prefixes locally.
+"""
+
+import json
+import sqlite3
+import threading
+from itertools import islice
+from pathlib import Path
+from time import time
+
+import pandas as pd
+
+from ..cache.cache import _DEFAULT_CACHE_DIR, _DEFAULT_EXPIRE_AFTER
+
+_CLASSIFICATION_RANKS = [
+    "kingdom",
+    "phylum",
+    "class",
+    "order",
+    "family",
+    "genus",
+    "species",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS taxa (
+    id INTEGER PRIMARY KEY,
+    scientificname TEXT NOT NULL,
+    rank TEXT,
+    status TEXT,
+    accepted_id INTEGER,
+    classification TEXT,
+    record TEXT NOT NULL,
+    full INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS taxa_name ON taxa (scientificname COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS taxa_accepted ON taxa (accepted_id);
+CREATE TABLE IF NOT EXISTS completions (
+    prefix TEXT PRIMARY KEY,
+    matches TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+# fields only known from earlier (fuller) responses are kept while the stored
+# record is fresh (updated after the time given as ?10), expired records are
+# replaced
+_UPSERT = """
+INSERT INTO taxa VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    scientificname = excluded.scientificname,
+    rank = CASE WHEN taxa.updated >= ?10
+        THEN coalesce(excluded.rank, taxa.rank) ELSE excluded.rank END,
+    status = CASE WHEN taxa.updated >= ?10
+        THEN coalesce(excluded.status, taxa.status) ELSE excluded.status END,
+    accepted_id = CASE WHEN taxa.updated >= ?10
+        THEN coalesce(excluded.accepted_id, taxa.accepted_id)
+        ELSE excluded.accepted_id END,
+    classification = CASE WHEN taxa.updated >= ?10
+        THEN json_patch(taxa.classification, excluded.classification)
+        ELSE excluded.classification END,
+    record = CASE WHEN taxa.updated >= ?10
+        THEN json_patch(taxa.record, excluded.record) ELSE excluded.record END,
+    full = CASE WHEN taxa.updated >= ?10
+        THEN max(taxa.full, excluded.full) ELSE excluded.full END,
+    updated = excluded.updated
+"""
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store():
+    """
+    Get the shared taxon store in the pyobis cache directory.
+
+    Returns:
+        TaxonStore: The default taxon store.
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = TaxonStore()
+        return _default_store
+
+
+def _chunks(values, size=500):
+    """Split values into lists staying below the SQLite limit on query parameters."""
+    values = iter(values)
+    while chunk := list(islice(values, size)):
+        yield chunk
+
+
+def _as_int(value):
+    """Convert taxon ids which may be given as strings to integers."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TaxonStore:
+    """
+    Local taxon dictionary holding ids, scientific names, synonyms, ranks and
+    the classification path of taxa, stored in SQLite.
+
+    Taxa are no longer served by `get`, `get_many`, `lookup` and `resolve` once
+    they expire, and are then replaced by the next response holding them.
+    """
+
+    def __init__(self, path=None, expire_after=_DEFAULT_EXPIRE_AFTER):
+        """
+        Open (or create) the store.
+
+        Args:
+            path (str, optional): Path of the SQLite file.
+                Defaults to taxa.sqlite in the pyobis cache directory.
+            expire_after (int, optional): Time in seconds after which stored
+                taxa are no longer served, and are fetched again. None keeps
+                them forever. Defaults to 86400 (1 day), as the HTTP cache.
+        """
+        self.path = Path(path) if path else _DEFAULT_CACHE_DIR / "taxa.sqlite"
+        self.expire_after = expire_after
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.__conn.row_factory = sqlite3.Row
+        with self.__lock, self.__conn:
+            self.__conn.executescript(_SCHEMA)
+
+    def __fresh(self, now=None):
+        """Time of update from which stored taxa have not expired."""
+        if self.expire_after is None:
+            return 0
+        return (now or time()) - self.expire_after
+
+    def add(self, records, full=False):
+        """
+        Add or update taxon records.
+
+        Accepts records of the taxon endpoints (with `taxonID`) as well as name
+        completions (with `id`). Records without an id or name are skipped.
+
+        Args:
+            records (list): Taxon records as dictionaries
+            full (bool): Whether these are complete taxon records, which may be
+                served in place of a `taxa.taxon` request. Defaults to False.
+
+        Returns:
+            int: Number of records stored
+        """
+        rows = []
+        for record in records:
+            taxonid = _as_int(record.get("taxonID", record.get("id")))
+            name = record.get("scientificName")
+            if taxonid is None or not name:
+                continue
+            classification = {
+                rank: record[rank] for rank in _CLASSIFICATION_RANKS if record.get(rank)
+            }
+            rows.append(
+                (
+                    taxonid,
+                    name,
+                    record.get("taxonRank", record.get("rank")),
+                    record.get("taxonomicStatus"),
+                    _as_int(record.get("acceptedNameUsageID")),
+                    json.dumps(classification),
+                    json.dumps(record),
+                    int(full),
+                ),
+            )
+        if not rows:
+            return 0
+
+        now = time()
+        with self.__lock, self.__conn:
+            self.__conn.executemany(
+                _UPSERT,
+                [(*row, now, self.__fresh(now)) for row in rows],
+            )
+        return len(rows)
+
+    def load(self, path):
+        """
+        Bulk-load taxon records from a file.
+
+        Args:
+            path (str): A CSV file, a JSON file holding a list of records (or an
+                API response with `results`), or a JSON lines file (.jsonl)
+
+        Returns:
+            int: Number of records stored
+        """
+        path = Path(path)
+        if path.suffix == ".csv":
+            records = pd.read_csv(path).to_dict(orient="records")
+        elif path.suffix == ".jsonl":
+            records = pd.read_json(path, lines=True).to_dict(orient="records")
+        else:
+            with open(path) as f:
+                records = json.load(f)
+            if isinstance(records, dict):
+                records = records["results"]
+        records = [{k: v for k, v in r.items() if not pd.isna(v)} for r in records]
+        return self.add(records, full=True)
+
+    def get(self, id, full=False):
+        """
+        Get a taxon record by id.
+
+        Args:
+            id (int): Taxon id
+            full (bool): Only return complete taxon records. Defaults to False.
+
+        Returns:
+            dict: The taxon record, or None if the taxon is not in the store
+                (or expired)
+        """
+        return self.get_many([id], full=full).get(_as_int(id))
+
+    def get_many(self, ids, full=False):
+        """
+        Get taxon records by id.
+
+        Args:
+            ids (list): Taxon ids
+            full (bool): Only return complete taxon records. Defaults to False.
+
+        Returns:
+            dict: Records of the taxa found in the store and not expired, by id
+        """
+        ids = [i for i in {_as_int(i) for i in ids} if i is not None]
+        found = {}
+        with self.__lock:
+            for chunk in _chunks(ids):
+                rows = self.__conn.execute(
+                    f"SELECT id, record FROM taxa WHERE id IN ({','.join('?' * len(chunk))})"
+                    " AND updated >= ?" + (" AND full = 1" if full else ""),
+                    [*chunk, self.__fresh()],
+                ).fetchall()
+                found.update({row["id"]: json.loads(row["record"]) for row in rows})
+        return found
+
+    def lookup(self, scientificname):
+        """
+        Get the taxon id for a scientific name (case insensitive).
+
+        Returns:
+            int: The taxon id, or None if the name is not in the store
+        """
+        return self.resolve([scientificname]).get(scientificname)
+
+    def resolve(self, scientificnames):
+        """
+        Get the taxon ids for scientific names (case insensitive).
+
+        Accepted taxa are preferred when a name is shared by several taxa.
+
+        Returns:
+            dict: Taxon ids of the names found in the store and not expired, by name
+        """
+        names = [*dict.fromkeys(scientificnames)]
+        found = {}
+        with self.__lock:
+            for chunk in _chunks(names):
+                rows = self.__conn.execute(
+                    "SELECT scientificname, id FROM taxa WHERE scientificname COLLATE NOCASE"
+                    f" IN ({','.join('?' * len(chunk))}) AND updated >= ?"
+                    " ORDER BY (accepted_id IS NULL OR accepted_id = id) ASC",
+                    [*chunk, self.__fresh()],
+                ).fetchall()
+                # later rows (accepted taxa) take precedence
+                by_name = {row["scientificname"].lower(): row["id"] for row in rows}
+                found.update(
+                    {n: by_name[n.lower()] for n in chunk if n.lower() in by_name},
+                )
+        return found
+
+    def synonyms(self, id):
+        """
+        Get the scientific names of the synonyms of an accepted taxon.
+
+        Returns:
+            list: Scientific names of the taxa whose accepted taxon is `id`
+        """
+        with self.__lock:
+            rows = self.__conn.execute(
+                "SELECT scientificname FROM taxa WHERE accepted_id = ? AND id != ?",
+                (id, id),
+            ).fetchall()
+        return [row["scientificname"] for row in rows]
+
+    def classification(self, id):
+        """
+        Get the classification path (kingdom to species) of a taxon.
+
+        Returns:
+            dict: Names by rank, or None if the taxon is not in the store
+        """
+        with self.__lock:
+            row = self.__conn.execute(
+                "SELECT classification FROM taxa WHERE id = ?",
+                (id,),
+            ).fetchone()
+        return json.loads(row["classification"]) if row else None
+
+    def add_completion(self, prefix, matches):
+        """
+        Store the complete answer of the taxon completion endpoint for a
+        prefix, i.e. an answer holding every taxon starting with the prefix.
+
+        Args:
+            prefix (str): Start of a scientific name (case insensitive)
+            matches (list): Taxon records of the answer, in the remote order
+        """
+        with self.__lock, self.__conn:
+            self.__conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?)",
+                (prefix.lower(), json.dumps(matches), time()),
+            )
+
+    def completion(self, prefix):
+        """
+        Get the taxa starting with a prefix, from the stored complete answer
+        of the prefix or of a shorter one.
+
+        Returns:
+            list: Taxon records in the order of the stored answer, or None if
+                there is no such answer (or it expired)
+        """
+        key = prefix.lower()
+        prefixes = [key[:i] for i in range(1, len(key) + 1)]
+        if not prefixes:
+            return None
+        with self.__lock:
+            row = self.__conn.execute(
+                "SELECT matches FROM completions WHERE prefix IN"
+                f" ({','.join('?' * len(prefixes))}) AND updated >= ?"
+                " ORDER BY length(prefix) DESC LIMIT 1",
+                [*prefixes, self.__fresh()],
+            ).fetchone()
+        if row is None:
+            return None
+        return [
+            m
+            for m in json.loads(row["matches"])
+            if m["scientificName"].lower().startswith(key)
+        ]
+
+    def to_pandas(self):
+        """
+        Get the stored taxa (without the full records) as a pandas DataFrame.
+        """
+        with self.__lock:
+            return pd.read_sql_query(
+                "SELECT id, scientificname, rank, status, accepted_id, classification, updated"
+                " FROM taxa ORDER BY id",
+                self.__conn,
+            )
+
+    def remove_expired(self):
+        """Remove the expired taxa and completions from the store."""
+        fresh = self.__fresh()
+        with self.__lock, self.__conn:
+            self.__conn.execute("DELETE FROM taxa WHERE updated < ?", (fresh,))
+            self.__conn.execute("DELETE FROM completions WHERE updated < ?", (fresh,))
+
+    def clear(self):
+        """Remove all taxa and completions from the store."""
+        with self.__lock, self.__conn:
+            self.__conn.execute("DELETE FROM taxa")
+            self.__conn.execute("DELETE FROM completions")
+
+    def close(self):
+        """Close the database connection."""
+        self.__conn.close()
+
+    def __len__(self):
+        """Number of taxa in the store."""
+        with self.__lock:
+            return self.__conn.execute("SELECT COUNT(*) FROM taxa").fetchone()[0]
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
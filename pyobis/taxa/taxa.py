@@ -2,9 +2,22 @@
 /taxon/ API endpoints as documented on https://api.obis.org/.
 """
 
+from functools import lru_cache
+
 import pandas as pd
 
-from ..obisutils import build_api_url, handle_arrstr, obis_baseurl, obis_GET
+from ..obisutils import (
+    build_api_url,
+    handle_arrstr,
+    logger,
+    obis_baseurl,
+    obis_GET,
+    obis_map,
+)
+from .store import get_default_store
+
+# seconds to wait for the (small) name lookup responses
+LOOKUP_TIMEOUT = 30
 
 
 def search(scientificname=None, cache=True, **kwargs):
@@ -64,7 +77,7 @@ def taxon(id, cache=True, **kwargs):
     url = obis_baseurl + "taxon/" + str(id)
     args = {}
     # return a TaxaResponse Object
-    return TaxaResponse(url, {**args, **kwargs}, cache=cache)
+    return TaxaResponse(url, {**args, **kwargs}, cache=cache, taxonid=id)
 
 
 def annotations(scientificname, cache=True, **kwargs):
@@ -94,12 +107,208 @@ def annotations(scientificname, cache=True, **kwargs):
     return TaxaResponse(url, {**args, **kwargs}, cache=cache)
 
 
+def _run_many(query, keys, max_workers=None):
+    """
+    Execute one query per key concurrently, returning the results per key.
+    Failing keys are logged and left out.
+
+    Every call runs on its own thread pool of at most `max_workers` threads
+    (see `obis_map`), so that bulk calls made from within other concurrent
+    calls cannot starve each other of threads.
+    """
+    responses = obis_map(
+        lambda key: query(key).execute()["results"],
+        keys,
+        max_workers=max_workers,
+        return_exceptions=True,
+    )
+    results = {}
+    for key, res in zip(keys, responses):
+        if isinstance(res, Exception):
+            logger.warning(f"Request failed for {key}: {res}")
+        else:
+            results[key] = res
+    return results
+
+
+def taxon_many(ids, max_workers=None, cache=True):
+    """
+    Get many taxa by ID at once.
+
+    IDs are deduplicated and answered from the local taxon store where
+    possible; the remaining taxa are fetched concurrently.
+
+    :param ids: [Array] OBIS taxon identifiers
+    :param max_workers: [Fixnum] Maximum number of concurrent requests.
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :return: A pandas DataFrame with one row per taxon found
+
+    Usage::
+
+        from pyobis import taxa
+        taxa.taxon_many([545439, 127405, 141433])
+    """
+    ids = [*dict.fromkeys(int(i) for i in ids)]
+    found = get_default_store().get_many(ids, full=True) if cache else {}
+    missing = [i for i in ids if i not in found]
+    for taxonid, results in _run_many(
+        lambda i: taxon(i, cache=cache),
+        missing,
+        max_workers=max_workers,
+    ).items():
+        if results:
+            found[taxonid] = results[0]
+    return pd.DataFrame([found[i] for i in ids if i in found])
+
+
+def search_many(scientificnames, max_workers=None, cache=True):
+    """
+    Get taxon records for many scientific names at once.
+
+    Names are deduplicated and searched concurrently, one request per name.
+
+    :param scientificnames: [Array] Scientific names
+    :param max_workers: [Fixnum] Maximum number of concurrent requests.
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :return: A pandas DataFrame of the taxon records, with the searched
+        name in the `query` column
+
+    Usage::
+
+        from pyobis import taxa
+        taxa.search_many(["Mola mola", "Abra alba"])
+    """
+    names = [*dict.fromkeys(scientificnames)]
+    results = _run_many(
+        lambda name: search(scientificname=name, cache=cache),
+        names,
+        max_workers=max_workers,
+    )
+    return pd.DataFrame(
+        [{"query": name, **r} for name in names for r in results.get(name, [])],
+    )
+
+
+def annotations_many(scientificnames, max_workers=None, cache=True):
+    """
+    Get the WoRMS annotations for many scientific names at once.
+
+    Names are deduplicated and fetched concurrently, one request per name.
+
+    :param scientificnames: [Array] Scientific names
+    :param max_workers: [Fixnum] Maximum number of concurrent requests.
+    :param cache: [bool, optional] Whether to use caching. Defaults to True.
+    :return: A pandas DataFrame of the annotations, with the annotated
+        name in the `query` column
+
+    Usage::
+
+        from pyobis import taxa
+        taxa.annotations_many(["Abra", "Mola mola"])
+    """
+    names = [*dict.fromkeys(scientificnames)]
+    results = _run_many(
+        lambda name: annotations(scientificname=name, cache=cache),
+        names,
+        max_workers=max_workers,
+    )
+    return pd.DataFrame(
+        [{"query": name, **r} for name in names for r in results.get(name, [])],
+    )
+
+
+def _complete(scientificname, cache=True):
+    """
+    Best matching taxon records for a (partial) scientific name.
+    """
+    matches = obis_GET(
+        obis_baseurl + "taxon/complete/" + scientificname,
+        {},
+        "application/json; charset=utf-8",
+        cache=cache,
+        timeout=LOOKUP_TIMEOUT,
+    )
+    if cache:
+        get_default_store().add(matches)
+    return matches
+
+
+def _lookup_taxonid(scientificname, cache=True):
+    """
+    Taxon id of the best match for a scientific name, preferring exact
+    matches over the first completion. None if there is no match.
+    """
+    if cache:
+        taxonid = get_default_store().lookup(scientificname)
+        if taxonid is not None:
+            return taxonid
+    matches = _complete(scientificname, cache=cache)
+    for match in matches:
+        if match["scientificName"].lower() == scientificname.lower():
+            return match["id"]
+    return matches[0]["id"] if len(matches) > 0 else None
+
+
+@lru_cache(maxsize=16384)
+def _lookup_taxonid_memo(scientificname, cache=True):
+    """
+    In-process memo of resolved names, in front of the persistent HTTP cache.
+
+    Names without a match raise LookupError, so that they are not memoized:
+    the miss may be transient, or the taxon added later.
+    """
+    taxonid = _lookup_taxonid(scientificname, cache=cache)
+    if taxonid is None:
+        raise LookupError(scientificname)
+    return taxonid
+
+
+def _lookup_taxonid_memoized(scientificname, cache=True):
+    """
+    Taxon id of a scientific name through the in-process memo, None if
+    there is no match.
+    """
+    try:
+        return _lookup_taxonid_memo(scientificname, cache)
+    except LookupError:
+        return None
+
+
+def resolve_taxonids(scientificnames, max_workers=None, cache=True):
+    """
+    Resolve scientific names to OBIS taxon ids.
+
+    Names are deduplicated and answered from an in-process LRU memo, the local
+    taxon store and the HTTP cache where possible; the remaining names are
+    looked up concurrently.
+
+    :param scientificnames: [String, Array] One or more scientific names, as a
+        list or a comma separated string.
+    :param max_workers: [Fixnum] Maximum number of concurrent lookups.
+    :param cache: [bool, optional] Whether to use caching, including the
+        in-process memo. Defaults to True.
+    :return: A dictionary mapping each distinct name to its taxon id, or to
+        None if the name could not be resolved
+
+    Usage::
+
+        from pyobis import taxa
+        taxa.resolve_taxonids(["Mola mola", "Abra alba", "Mola mola"])
+    """
+    if isinstance(scientificnames, str):
+        scientificnames = scientificnames.split(",")
+    names = [*dict.fromkeys(n.strip() for n in scientificnames if n.strip())]
+    lookup = _lookup_taxonid_memoized if cache else _lookup_taxonid
+    ids = obis_map(lambda name: lookup(name, cache), names, max_workers=max_workers)
+    return dict(zip(names, ids))
+
+
 class TaxaResponse:
     """
     An OBIS Taxa Response Class
     """
 
-    def __init__(self, url, args, cache=True):
+    def __init__(self, url, args, cache=True, taxonid=None):
         """
         Initialise the object parameters
         """
@@ -112,11 +321,19 @@ class TaxaResponse:
         self.__args = args
         self.__url = url
         self.__cache = cache
+        self.__taxonid = taxonid
 
     def execute(self, **kwargs):
         """
         Execute or fetch the data based on the query
         """
+        # taxa.taxon queries are answered from the local taxon store if possible
+        if self.__cache and self.__taxonid is not None and not self.__args:
+            record = get_default_store().get(self.__taxonid, full=True)
+            if record:
+                self.data = {"total": 1, "results": [record]}
+                return self.data
+
         out = obis_GET(
             self.__url,
             self.__args,
@@ -125,6 +342,8 @@ class TaxaResponse:
             **kwargs,
         )
         self.data = out
+        if self.__cache and isinstance(out, dict) and "results" in out:
+            get_default_store().add(out["results"], full=True)
         return self.data
 
     def to_pandas(self):
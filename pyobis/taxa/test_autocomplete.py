@@ -0,0 +1,83 @@
+"""Tests for the taxon name prefix index"""
+
+from pyobis.taxa import autocomplete
+from pyobis.taxa.autocomplete import PrefixIndex
+from pyobis.taxa.store import TaxonStore
+
+
+def test_prefix_index(monkeypatch):
+    """
+    PrefixIndex - local completions, remote fallback and merging remote answers
+    """
+    remote = {
+        "mol": [
+            {"id": 127405, "scientificName": "Mola mola"},
+            {"id": 126237, "scientificName": "Mola"},
+            {"id": 138913, "scientificName": "Molgula"},
+        ],
+        "abr": [{"id": i, "scientificName": f"Abra {i}"} for i in range(20)],
+    }
+    requested = []
+
+    def fake_complete(prefix, cache=True):
+        requested.append(prefix)
+        return remote[prefix.lower()]
+
+    monkeypatch.setattr(autocomplete, "_complete", fake_complete)
+    index = PrefixIndex([{"taxonID": 141433, "scientificName": "Abra alba"}])
+    assert [r["id"] for r in index.local("ABRA")] == [141433]
+
+    # no complete remote answer yet, so the remote endpoint is asked
+    assert len(index.complete("Mol")) == 3
+    assert requested == ["Mol"]
+    # the remote answer was complete, so longer prefixes are answered locally,
+    # in the order and with the records of the remote answer
+    assert index.complete("mola") == remote["mol"][:2]
+    assert index.complete("Molg")[0]["id"] == 138913
+    assert index.complete("Molx") == []
+    assert requested == ["Mol"]
+
+    # a truncated remote answer does not make longer prefixes answerable,
+    # however many local matches there are
+    assert len(index.complete("Abr")) == 10
+    assert len(index.local("Abra")) == 10
+    assert not index.answerable("Abra")
+    assert len(index) == 24
+
+
+def test_prefix_index_store(tmp_path, monkeypatch):
+    """
+    PrefixIndex - complete remote answers are kept in the store, and in
+    memory within a bound
+    """
+    remote = {"mol": [{"id": 127405, "scientificName": "Mola mola"}]}
+    requested = []
+
+    def fake_complete(prefix, cache=True):
+        requested.append(prefix)
+        return remote.get(prefix.lower(), [])
+
+    monkeypatch.setattr(autocomplete, "_complete", fake_complete)
+    with TaxonStore(tmp_path / "taxa.sqlite") as store:
+        index = PrefixIndex(store=store, max_answers=1)
+        assert index.complete("Mol") == remote["mol"]
+        # a new session answers from the store
+        assert PrefixIndex(store=store).complete("Mola") == remote["mol"]
+        assert requested == ["Mol"]
+
+        # only the most recent answers are kept in memory
+        index = PrefixIndex(max_answers=1)
+        index.complete("Mol")
+        index.complete("Abr")
+        assert not index.answerable("Mola")
+        assert index.answerable("Abra")
+
+        # expired answers are asked again
+        index = PrefixIndex(expire_after=-1)
+        index.complete("Mol")
+        assert not index.answerable("Mola")
+        store.expire_after = -1
+        assert store.completion("Mola") is None
+        store.remove_expired()
+        store.expire_after = None
+        assert store.completion("Mola") is None
@@ -0,0 +1,109 @@
+"""Tests for the local taxon store"""
+
+import json
+
+from pyobis.taxa import store as store_module
+from pyobis.taxa.store import TaxonStore
+
+RECORDS = [
+    {
+        "taxonID": 127405,
+        "scientificName": "Mola mola",
+        "taxonRank": "Species",
+        "taxonomicStatus": "accepted",
+        "acceptedNameUsageID": 127405,
+        "kingdom": "Animalia",
+        "phylum": "Chordata",
+        "family": "Molidae",
+        "genus": "Mola",
+        "species": "Mola mola",
+    },
+    {
+        "taxonID": 400964,
+        "scientificName": "Orthagoriscus mola",
+        "taxonRank": "Species",
+        "taxonomicStatus": "unaccepted",
+        "acceptedNameUsageID": 127405,
+    },
+]
+
+
+def test_store_add_and_lookup(tmp_path):
+    """
+    TaxonStore - write-through of taxon and completion records, and lookups
+    """
+    with TaxonStore(tmp_path / "taxa.sqlite") as store:
+        assert store.add(RECORDS, full=True) == 2
+        assert (
+            store.add(
+                [{"id": 141433, "scientificName": "Abra alba", "rank": "Species"}],
+            )
+            == 1
+        )
+        assert store.add([{"scientificName": "no id"}]) == 0
+        assert len(store) == 3
+
+        assert store.lookup("MOLA MOLA") == 127405
+        assert store.resolve(["Abra alba", "Unknown", "Orthagoriscus mola"]) == {
+            "Abra alba": 141433,
+            "Orthagoriscus mola": 400964,
+        }
+        assert store.get(127405)["family"] == "Molidae"
+        assert store.get(141433, full=True) is None
+        assert store.synonyms(127405) == ["Orthagoriscus mola"]
+        assert store.classification(127405)["phylum"] == "Chordata"
+
+        # partial records do not overwrite what is already known
+        store.add([{"id": 127405, "scientificName": "Mola mola", "rank": "Species"}])
+        assert store.get(127405, full=True)["family"] == "Molidae"
+        assert store.classification(127405)["phylum"] == "Chordata"
+
+    # the store persists across processes
+    with TaxonStore(tmp_path / "taxa.sqlite") as store:
+        assert store.lookup("Mola mola") == 127405
+
+
+def test_store_load(tmp_path):
+    """
+    TaxonStore.load - bulk loading from JSON and CSV files
+    """
+    with open(tmp_path / "taxa.json", "w") as f:
+        json.dump({"total": 2, "results": RECORDS}, f)
+    with open(tmp_path / "taxa.csv", "w") as f:
+        f.write("taxonID,scientificName,taxonRank\n141433,Abra alba,Species\n")
+
+    with TaxonStore(tmp_path / "taxa.sqlite") as store:
+        assert store.load(tmp_path / "taxa.json") == 2
+        assert store.load(tmp_path / "taxa.csv") == 1
+        assert store.resolve(["Mola mola", "Abra alba"]) == {
+            "Mola mola": 127405,
+            "Abra alba": 141433,
+        }
+        assert list(store.to_pandas().id) == [127405, 141433, 400964]
+
+
+def test_store_expiry(tmp_path, monkeypatch):
+    """
+    TaxonStore - expired taxa are not served, and are replaced by new responses
+    """
+    now = 1_000_000.0
+    monkeypatch.setattr(store_module, "time", lambda: now)
+    with TaxonStore(tmp_path / "taxa.sqlite", expire_after=60) as store:
+        store.add(RECORDS, full=True)
+        assert store.get(127405, full=True)["family"] == "Molidae"
+
+        now += 61
+        assert store.get(127405) is None
+        assert store.lookup("Mola mola") is None
+        # a partial record does not revive the expired full record
+        store.add([{"id": 127405, "scientificName": "Mola mola", "rank": "Species"}])
+        assert store.get(127405, full=True) is None
+        assert "family" not in store.get(127405)
+        assert store.lookup("Mola mola") == 127405
+
+        store.remove_expired()
+        assert len(store) == 1
+
+    with TaxonStore(tmp_path / "taxa.sqlite", expire_after=None) as store:
+        now += 10**6
+        assert store.lookup("Mola mola") == 127405
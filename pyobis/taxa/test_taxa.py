@@ -134,3 +134,111 @@ def test_cache_parameter_functionality():
     assert query_annotations_no_cache.data is not None
     assert "dict" == query_annotations_cache.data.__class__.__name__
     assert "dict" == query_annotations_no_cache.data.__class__.__name__
+
+
+def test_taxa_resolve_taxonids(monkeypatch, tmp_path, obis_api):
+    """
+    taxa.resolve_taxonids - deduplicated, memoized and exact matches preferred
+    """
+    from pyobis.taxa import taxa as taxa_module
+    from pyobis.taxa.store import TaxonStore
+
+    store = TaxonStore(tmp_path / "taxa.sqlite")
+    monkeypatch.setattr(taxa_module, "get_default_store", lambda: store)
+
+    completions = {
+        "Mola mola": [{"id": 127405, "scientificName": "Mola mola"}],
+        "Mola": [
+            {"id": 127405, "scientificName": "Mola mola"},
+            {"id": 126237, "scientificName": "Mola"},
+        ],
+        "Nonexistus": [],
+    }
+    obis_api.serve(taxa_module, lambda url, args: completions[url.split("/")[-1]])
+    taxa_module._lookup_taxonid_memo.cache_clear()
+
+    resolved = taxa.resolve_taxonids(["Mola mola", "Mola", "Nonexistus", "Mola mola"])
+    assert resolved == {"Mola mola": 127405, "Mola": 126237, "Nonexistus": None}
+    requested = [url.split("/")[-1] for url, _ in obis_api.requests]
+    assert sorted(requested) == ["Mola", "Mola mola", "Nonexistus"]
+
+    assert taxa.resolve_taxonids("Mola,Mola mola") == {
+        "Mola": 126237,
+        "Mola mola": 127405,
+    }
+    assert len(obis_api.requests) == 3
+    taxa.resolve_taxonids("Mola", cache=False)
+    assert len(obis_api.requests) == 4
+    # names without a match are not memoized, and are looked up again
+    assert taxa.resolve_taxonids("Nonexistus") == {"Nonexistus": None}
+    assert len(obis_api.requests) == 5
+
+    # a new process starts with an empty memo, but a warm taxon store
+    taxa_module._lookup_taxonid_memo.cache_clear()
+    assert taxa.resolve_taxonids(["Mola mola", "Mola"]) == {
+        "Mola mola": 127405,
+        "Mola": 126237,
+    }
+    assert len(obis_api.requests) == 5
+    store.close()
+
+
+def test_taxa_bulk(monkeypatch, tmp_path, obis_api):
+    """
+    taxa.taxon_many, taxa.search_many - deduplicated, store first, failures skipped
+    """
+    from pyobis.taxa import taxa as taxa_module
+    from pyobis.taxa.store import TaxonStore
+
+    store = TaxonStore(tmp_path / "taxa.sqlite")
+    store.add([{"taxonID": 1, "scientificName": "Stored taxon"}], full=True)
+    monkeypatch.setattr(taxa_module, "get_default_store", lambda: store)
+
+    def respond(url, args):
+        """Taxon `key`, or a server error for taxon 3."""
+        key = url.split("/")[-1]
+        if key == "3":
+            raise requests.HTTPError("500 Server Error")
+        return {
+            "total": 1,
+            "results": [{"taxonID": int(key), "scientificName": f"Taxon {key}"}],
+        }
+
+    obis_api.serve(taxa_module, respond)
+    df = taxa.taxon_many([2, "1", 3, 2, "2"])
+    assert sorted(url.split("/")[-1] for url, _ in obis_api.requests) == ["2", "3"]
+    assert list(df.taxonID) == [2, 1]
+    assert store.lookup("Taxon 2") == 2
+
+    df = taxa.search_many(["10", "11", "10"])
+    assert list(df["query"]) == ["10", "11"]
+    store.close()
+
+
+def test_annotations_many(obis_api):
+    """
+    taxa.annotations_many - one request per distinct name, failures skipped
+    """
+    from pyobis.taxa import taxa as taxa_module
+
+    def respond(url, args):
+        """Two annotations per name, or a server error for `Broken`."""
+        assert url.endswith("taxon/annotations")
+        name = args["scientificname"]
+        if name == "Broken":
+            raise requests.HTTPError("500 Server Error")
+        return {
+            "total": 2,
+            "results": [
+                {"scientificname": name, "annotation": "misspelled"},
+                {"scientificname": name, "annotation": "unaccepted"},
+            ],
+        }
+
+    obis_api.serve(taxa_module, respond)
+    df = taxa.annotations_many(["Abra", "Broken", "Mola mola", "Abra"])
+    requested = sorted(args["scientificname"] for args in obis_api.args)
+    assert requested == ["Abra", "Broken", "Mola mola"]
+    assert list(df["query"]) == ["Abra", "Abra", "Mola mola", "Mola mola"]
+    assert list(df["annotation"][:2]) == ["misspelled", "unaccepted"]
+    assert taxa.annotations_many([]).empty